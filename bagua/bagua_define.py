@@ -34,11 +34,15 @@ def get_tensor_declaration_bytes(td: TensorDeclaration) -> int:
 class BaguaHyperparameter(BaseModel):
     """
     Structured all bagua hyperparameters
+
+    :attr:`comm_latency` is the latency in seconds of the communication cost model the buckets are
+    partitioned with.
     """
 
     buckets: List[List[TensorDeclaration]] = []
     bucket_size: int = 0
     is_hierarchical_reduce: bool = False
+    comm_latency: float = 0.0
 
     def update(self, param_dict: dict):
         tmp = self.dict()
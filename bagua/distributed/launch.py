@@ -121,6 +121,26 @@ def parse_args():
         action="store_true",
         help="switch of bagua report metrics function",
     )
+    parser.add_argument(
+        "--autotune_service_process",
+        action="store_true",
+        default=False,
+        help="Run the autotune service in a separate process started by the launcher of node 0, "
+        "instead of in a process forked from rank 0",
+    )
+    parser.add_argument(
+        "--autotune_cache_path",
+        type=str,
+        default="",
+        help="File keeping autotune results across jobs, keyed by the model, world size and number of nodes. "
+        "Later jobs start autotune from the cached results. Disabled if empty",
+    )
+    parser.add_argument(
+        "--skip_autotune_if_cached",
+        action="store_true",
+        default=False,
+        help="Use the cached best hyperparameters without tuning, if any",
+    )
     parser.add_argument("--autotune_max_samples", type=int, default=60)
     parser.add_argument("--autotune_sampling_confidence_time", type=float, default=5.0)
     parser.add_argument("--autotune_warmup_time", type=float, default=30.0)
@@ -166,12 +186,22 @@ def set_bagua_env(args, current_env):
     )
     current_env["BAGUA_AUTOTUNE_WARMUP_TIME_S"] = str(args.autotune_warmup_time)
     current_env["BAGUA_IS_OUTPUT_AUTOTUNE_LOG"] = str(int(args.is_output_autotune_log))
+    current_env["BAGUA_AUTOTUNE_CACHE_PATH"] = args.autotune_cache_path
+    current_env["BAGUA_SKIP_AUTOTUNE_IF_CACHED"] = str(
+        int(args.skip_autotune_if_cached)
+    )
 
     if args.autotune_level > 0:
         current_env["AUTO_TUNE_SERVER_ADDR"] = "{}:{}".format(
             args.master_addr, args.bagua_service_port
         )
 
+    if args.autotune_service_process:
+        current_env["BAGUA_AUTOTUNE_SERVICE_MODE"] = "external"
+        current_env["BAGUA_AUTOTUNE_SERVICE_ADDR"] = "{}:{}".format(
+            args.master_addr, args.bagua_service_port
+        )
+
     if args.enable_bagua_net:
         current_env["LD_LIBRARY_PATH"] = "{}:{}".format(
             pkg_resources.resource_filename("bagua_core", ".data/bagua-net"),
@@ -179,6 +209,25 @@ def set_bagua_env(args, current_env):
         )
 
 
+def start_autotune_service(args, current_env, dist_world_size, nnodes):
+    from bagua.service.autotune_service import start_autotune_service_process
+
+    return start_autotune_service_process(
+        world_size=dist_world_size,
+        port=args.bagua_service_port,
+        autotune_level=args.autotune_level,
+        max_samples=args.autotune_max_samples,
+        sampling_confidence_time_s=args.autotune_sampling_confidence_time,
+        warmup_time_s=args.autotune_warmup_time,
+        is_output_autotune_log=args.is_output_autotune_log,
+        default_bucket_size=args.default_bucket_size,
+        num_nodes=nnodes,
+        autotune_cache_path=args.autotune_cache_path,
+        skip_autotune_if_cached=args.skip_autotune_if_cached,
+        env=current_env,
+    )
+
+
 def main():
     logging.basicConfig(
         format="%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s",
@@ -228,6 +277,13 @@ def main():
 
     subprocess_file_handles = []
 
+    # the autotune service is not waited for, it is stopped once the training processes exit
+    autotune_service = None
+    if args.autotune_service_process and args.node_rank == 0:
+        autotune_service = start_autotune_service(
+            args, current_env, dist_world_size, args.nnodes
+        )
+
     for local_rank in range(0, args.nproc_per_node):
         # each process's rank
         dist_rank = args.nproc_per_node * args.node_rank + local_rank
@@ -281,6 +337,8 @@ def main():
         last_return_code = None
 
         def sigkill_handler(signum, frame):
+            if autotune_service is not None:
+                autotune_service.kill()
             for process in processes:
                 print(f"Killing subprocess {process.pid}")
                 try:
@@ -333,6 +391,9 @@ def main():
 
             time.sleep(1)
     finally:
+        if autotune_service is not None and autotune_service.poll() is None:
+            autotune_service.terminate()
+
         # close open file descriptors
         for (stdout_handle, stderr_handle) in subprocess_file_handles:
             stdout_handle.close()
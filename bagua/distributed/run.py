@@ -163,7 +163,7 @@ import os
 import sys
 import uuid
 from argparse import REMAINDER, ArgumentParser
-from typing import Callable, List, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
 
 import torch
 from torch.distributed.argparse_util import check_env, env
@@ -379,6 +379,27 @@ def get_args_parser() -> ArgumentParser:
         help="Bagua automatic hyperparameters search level. The higher the level, the larger the "
         "hyperparameter search space, and the longer time it takes. Currently supported levels are 0 and 1.",
     )
+    parser.add_argument(
+        "--autotune_cache_path",
+        type=str,
+        default="",
+        help="File keeping autotune results across jobs, keyed by the model, world size and number of nodes. "
+        "Later jobs start autotune from the cached results. Disabled if empty",
+    )
+    parser.add_argument(
+        "--skip_autotune_if_cached",
+        action="store_true",
+        default=False,
+        help="Use the cached best hyperparameters without tuning, if any",
+    )
+    parser.add_argument(
+        "--autotune_service_process",
+        action="store_true",
+        default=False,
+        help="Run the autotune service in a separate process started by the agent of node 0, instead of in a "
+        "process forked from rank 0. Only with the static rendezvous backend or --standalone, where node 0 is "
+        "known before the rendezvous. Otherwise rank 0 starts the service in a new interpreter",
+    )
     parser.add_argument("--autotune_max_samples", type=int, default=60)
     parser.add_argument("--autotune_sampling_confidence_time", type=float, default=5.0)
     parser.add_argument("--autotune_warmup_time", type=float, default=30.0)
@@ -587,12 +608,26 @@ def set_bagua_env(args, current_env):
     )
     current_env["BAGUA_AUTOTUNE_WARMUP_TIME_S"] = str(args.autotune_warmup_time)
     current_env["BAGUA_IS_OUTPUT_AUTOTUNE_LOG"] = str(int(args.is_output_autotune_log))
+    current_env["BAGUA_AUTOTUNE_CACHE_PATH"] = args.autotune_cache_path
+    current_env["BAGUA_SKIP_AUTOTUNE_IF_CACHED"] = str(
+        int(args.skip_autotune_if_cached)
+    )
 
     if args.autotune_level > 0:
         current_env["AUTO_TUNE_SERVER_ADDR"] = "{}:{}".format(
             args.master_addr, args.bagua_service_port
         )
 
+    if args.autotune_service_process:
+        host = _autotune_service_host(args)
+        if host is not None:
+            current_env["BAGUA_AUTOTUNE_SERVICE_MODE"] = "external"
+            current_env["BAGUA_AUTOTUNE_SERVICE_ADDR"] = "{}:{}".format(
+                host, args.bagua_service_port
+            )
+        else:
+            current_env["BAGUA_AUTOTUNE_SERVICE_MODE"] = "spawn"
+
     if args.enable_bagua_net:
         current_env["LD_LIBRARY_PATH"] = "{}:{}".format(
             pkg_resources.resource_filename("bagua_core", ".data/bagua-net"),
@@ -603,6 +638,15 @@ def set_bagua_env(args, current_env):
     current_env["FLASK_ENV"] = "development"
 
 
+def _autotune_service_host(args) -> Optional[str]:
+    # the host of the autotune service, if node 0 is known before the rendezvous
+    if args.standalone:
+        return "127.0.0.1"
+    if args.rdzv_backend == "static":
+        return args.master_addr
+    return None
+
+
 def run(args):
     set_bagua_env(args, os.environ)
 
@@ -620,10 +664,31 @@ def run(args):
         )
 
     config, cmd, cmd_args = config_from_args(args)
-    elastic_launch(
-        config=config,
-        entrypoint=cmd,
-    )(*cmd_args)
+
+    # the autotune service outlives restarts of the workers, it is stopped once the job exits
+    autotune_service = None
+    if (
+        args.autotune_service_process
+        and _autotune_service_host(args) is not None
+        and (args.standalone or args.node_rank == 0)
+    ):
+        from bagua.distributed.launch import start_autotune_service
+
+        autotune_service = start_autotune_service(
+            args,
+            os.environ,
+            config.max_nodes * config.nproc_per_node,
+            config.max_nodes,
+        )
+
+    try:
+        elastic_launch(
+            config=config,
+            entrypoint=cmd,
+        )(*cmd_args)
+    finally:
+        if autotune_service is not None and autotune_service.poll() is None:
+            autotune_service.terminate()
 
 
 def main(args=None):
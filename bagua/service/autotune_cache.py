@@ -0,0 +1,117 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from bagua.bagua_define import TensorDeclaration, BaguaHyperparameter
+
+
+def model_signature(
+    tensor_list: List[TensorDeclaration], world_size: int, num_nodes: int
+) -> str:
+    """
+    Signature of an autotune task, identifying jobs training the same model on the same number of processes
+    and nodes, for which the same hyperparameters are expected to perform the same.
+    """
+    key = json.dumps(
+        {
+            "tensors": [
+                [td["name"], td["num_elements"], td["dtype"]] for td in tensor_list
+            ],
+            "world_size": world_size,
+            "num_nodes": num_nodes,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class AutotuneResultCache:
+    """
+    A JSON file keeping, for each model signature, the best hyperparameters found by autotune along with their
+    score, and the (params, score) history observed by the Bayesian optimizer, so that later jobs can start from
+    them.
+    """
+
+    MAX_HISTORY = 200
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as err:
+            logging.warning(
+                "Ignore corrupted autotune cache {}, err={}".format(self.path, err)
+            )
+            return {}
+
+    def load(self, signature: str) -> Optional[Dict]:
+        """
+        Returns the cached entry of :attr:`signature`, a dict with ``"best_hyperparameter"``, a
+        :class:`BaguaHyperparameter`, ``"best_score"`` and ``"history"``, a list of (params, score) pairs, or
+        ``None`` if there is no such entry.
+        """
+
+        entry = self._read().get(signature)
+        if entry is None:
+            return None
+
+        return {
+            "best_hyperparameter": BaguaHyperparameter().update(
+                entry["best_hyperparameter"]
+            ),
+            "best_score": entry["best_score"],
+            "history": [(params, score) for params, score in entry["history"]],
+        }
+
+    def save(
+        self,
+        signature: str,
+        best_hyperparameter: BaguaHyperparameter,
+        best_score: float,
+        history: List[Tuple[Dict, float]],
+    ):
+        """
+        Saves the results of :attr:`signature`, keeping the cached best hyperparameters if their score is higher.
+        """
+
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(dirname, exist_ok=True)
+
+        # jobs sharing the cache save their results one after another, so that none of them is lost
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cache = self._read()
+                entry = cache.get(signature)
+                if entry is not None and entry["best_score"] > best_score:
+                    best_hyperparameter = BaguaHyperparameter().update(
+                        entry["best_hyperparameter"]
+                    )
+                    best_score = entry["best_score"]
+
+                cache[signature] = {
+                    "best_hyperparameter": best_hyperparameter.dict(),
+                    "best_score": best_score,
+                    "history": [
+                        [params, score]
+                        for params, score in history[-self.MAX_HISTORY :]
+                    ],
+                }
+
+                # write to a temporary file first, so that a crash never leaves a truncated cache
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=dirname, prefix=".bagua_autotune_cache_"
+                )
+                with os.fdopen(fd, "w") as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
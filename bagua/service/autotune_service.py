@@ -1,12 +1,14 @@
 import copy
 import requests
 import os
+import subprocess
+import sys
 import time
 import threading
 import json
 import logging
-import multiprocessing
 from .autotune_task_manager import AutotuneTaskManager
+from .autotune_cache import AutotuneResultCache, model_signature
 from bagua.bagua_define import (
     TensorDtype,
     TensorDeclaration,
@@ -15,7 +17,7 @@ from bagua.bagua_define import (
 )
 from flask import request
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 
 class NpEncoder(json.JSONEncoder):
@@ -43,6 +45,34 @@ class AutotuneServiceTaskManager:
         self.check_board = [-1] * world_size
         self.time_hp_last_granted = time.time()
         self.hyperparameter = BaguaHyperparameter()
+        # version of the recommended hyperparameters, increased whenever they change, and the hyperparameters of
+        # each version, so that ranks only need to report the version they train with
+        self.version = 0
+        self.hyperparameter_versions: Dict[int, BaguaHyperparameter] = {
+            0: self.hyperparameter
+        }
+        # tensor name -> position of the tensor in the registered tensor list
+        self.tensor_ids: Dict[str, int] = {}
+        # signature of the registered tensors and best hyperparameters cached by previous jobs
+        self.signature: Optional[str] = None
+        self.cached_hyperparameter: Optional[BaguaHyperparameter] = None
+        # best score and history length last saved to the autotune cache
+        self.saved_results: Optional[Tuple[float, int]] = None
+
+    def set_hyperparameter(self, hp: BaguaHyperparameter):
+        if hp.dict() != self.hyperparameter.dict():
+            self.version += 1
+            self.hyperparameter_versions[self.version] = hp
+        self.hyperparameter = hp
+
+    def compact_hyperparameter(self) -> dict:
+        """Returns the recommended hyperparameters, with tensors in buckets given by their ids."""
+
+        hp = self.hyperparameter.dict()
+        hp["buckets"] = [
+            [self.tensor_ids[td["name"]] for td in bucket] for bucket in hp["buckets"]
+        ]
+        return hp
 
 
 class AutotuneService:
@@ -57,6 +87,9 @@ class AutotuneService:
         warmup_time_s=30,
         is_output_autotune_log=False,
         default_bucket_size=10 * 1024 ** 2,
+        num_nodes=1,
+        autotune_cache_path: Optional[str] = None,
+        skip_autotune_if_cached=False,
     ):
         self.autotune_level = autotune_level
         self.world_size = world_size
@@ -69,11 +102,21 @@ class AutotuneService:
         self.model_dict: Dict[str, AutotuneServiceTaskManager] = {}
         self.model_dict_mutex = threading.Lock()
 
+        # results of previous jobs with the same model signature
+        self.num_nodes = num_nodes
+        self.autotune_cache = (
+            AutotuneResultCache(autotune_cache_path) if autotune_cache_path else None
+        )
+        self.skip_autotune_if_cached = skip_autotune_if_cached
+
         # bagua-core trace and obtain tensor calculation partial order
         self.trace_info_dict = {}
         self.tensor_partial_order = {}
         self.tensor_partial_order_fixed = False
         self.tensor_partial_order_lock = threading.Lock()
+        # seconds between the first tensor of an iteration and each tensor being ready for communication, averaged
+        # over iterations
+        self.tensor_ready_times: Dict[str, float] = {}
 
     def autotune(
         self,
@@ -81,6 +124,7 @@ class AutotuneService:
         rank: int,
         train_iter: int,
         tensor_partial_order: Dict[str, int] = {},
+        tensor_ready_times: Dict[str, float] = {},
     ):
         if hp_manager.sampling_count > self.max_samples:
             return
@@ -142,14 +186,147 @@ class AutotuneService:
             )
         )
         recommended_bagua_hp = hp_manager.inner.ask_hyperparmeter(
-            train_iter, tensor_partial_order
+            train_iter, tensor_partial_order, tensor_ready_times
         )
         if hp_manager.sampling_count < self.max_samples:
-            hp_manager.hyperparameter = recommended_bagua_hp
+            hp_manager.set_hyperparameter(recommended_bagua_hp)
         else:
-            hp_manager.hyperparameter = hp_manager.inner.best_hyperparameter()
+            hp_manager.set_hyperparameter(hp_manager.inner.best_hyperparameter())
 
         hp_manager.sampling_count += 1
+        self._save_cached_results(hp_manager)
+
+    def _load_cached_results(
+        self,
+        hp_manager: AutotuneServiceTaskManager,
+        tensor_list: List[TensorDeclaration],
+    ) -> Optional[BaguaHyperparameter]:
+        # each rank registers the same tensors, only look them up once
+        signature = model_signature(tensor_list, self.world_size, self.num_nodes)
+        if signature == hp_manager.signature:
+            return hp_manager.cached_hyperparameter
+
+        hp_manager.signature = signature
+        hp_manager.cached_hyperparameter = None
+        entry = self.autotune_cache.load(signature)
+        if entry is None:
+            return None
+
+        logging.info(
+            "Found cached autotune results, best_score={}, hyperparameters={}".format(
+                entry["best_score"], entry["best_hyperparameter"]
+            )
+        )
+        hp_manager.inner.warm_start(entry["history"])
+        hp_manager.cached_hyperparameter = entry["best_hyperparameter"]
+        if self.skip_autotune_if_cached:
+            hp_manager.sampling_count = self.max_samples + 1
+
+        return hp_manager.cached_hyperparameter
+
+    def _save_cached_results(self, hp_manager: AutotuneServiceTaskManager):
+        if self.autotune_cache is None or hp_manager.signature is None:
+            return
+
+        (_, best_hp, best_score) = max(
+            hp_manager.inner.record_deque, key=lambda record: record[2]
+        )
+        history = hp_manager.inner.bayesian_optimizer.history
+        if best_score == float("-inf") or hp_manager.saved_results == (
+            best_score,
+            len(history),
+        ):
+            return
+
+        try:
+            self.autotune_cache.save(hp_manager.signature, best_hp, best_score, history)
+            hp_manager.saved_results = (best_score, len(history))
+        except OSError as err:
+            logging.warning("Failed to save autotune results, err={}".format(err))
+
+    def _report_metrics(
+        self,
+        hp_manager: AutotuneServiceTaskManager,
+        rank: int,
+        train_iter: int,
+        hyperparameter: BaguaHyperparameter,
+        speed: float,
+    ):
+        # Only consider the rank of the first report metrics now.
+        with hp_manager.lock:
+            (last_report_train_iter, _, _) = hp_manager.inner.tail_record()
+            if train_iter <= last_report_train_iter:
+                return
+
+            logging.debug(
+                "rank={}, train_iter={}, speed={}, "
+                "hyperparameters={}".format(
+                    rank,
+                    train_iter,
+                    speed,
+                    hyperparameter,
+                )
+            )
+            hp_manager.inner.report_metrics(
+                train_iter=train_iter,
+                hyperparameter=hyperparameter,
+                system_efficiency_score=speed,
+            )
+
+    def _ask_hyperparameters(
+        self, hp_manager: AutotuneServiceTaskManager, rank: int, train_iter: int
+    ):
+        tensor_partial_order = {}
+        with self.tensor_partial_order_lock:
+            tensor_partial_order = copy.deepcopy(self.tensor_partial_order)
+            tensor_ready_times = copy.deepcopy(self.tensor_ready_times)
+
+        logging.debug("tensor_partial_order={}".format(tensor_partial_order))
+
+        # Autotune conditions:
+        # 1. autotune_level >= 1.
+        # 2. The bagua process is not in the process of hyperparameter update. (self.check_board.count(self.check_board[0])
+        #   == len(self.check_board))
+        # 3. Only execute autotune at most once in an iteration. (self.check_board[rank] < train_iter)
+        check_board = hp_manager.check_board
+        if (
+            self.autotune_level >= 1
+            and check_board.count(check_board[0])  # noqa: W503
+            == len(check_board)  # noqa: W503
+            and check_board[rank] < train_iter  # noqa: W503
+        ):
+            self.autotune(
+                hp_manager, rank, train_iter, tensor_partial_order, tensor_ready_times
+            )
+
+        check_board[rank] = train_iter
+
+    def _record_tensor_ready_times(self, spans: List[BaguaCoreTelemetrySpan]):
+        # Split the spans, sorted by start time, into iterations, a new iteration starting when a tensor is ready
+        # again. The first and last iterations may be cut by the boundaries of the batch of spans, only the other
+        # ones are recorded.
+        iterations = [[]]
+        seen = set()
+        for span in spans:
+            if span["action"] != "tensor_ready":
+                continue
+            if span["tensor_name"] in seen:
+                iterations.append([])
+                seen.clear()
+            iterations[-1].append(span)
+            seen.add(span["tensor_name"])
+
+        for iteration in iterations[1:-1]:
+            iteration_start_time = iteration[0]["start_time"]
+            for span in iteration:
+                # start time is in milliseconds
+                ready_time = (span["start_time"] - iteration_start_time) / 1000.0
+                tensor_name = span["tensor_name"]
+                if tensor_name in self.tensor_ready_times:
+                    ready_time = (
+                        0.9 * self.tensor_ready_times[tensor_name] + 0.1 * ready_time
+                    )
+                self.tensor_ready_times[tensor_name] = ready_time
 
     def setup_app(self, app):
         @app.route("/api/v1/register_tensors", methods=["POST"])
@@ -180,11 +357,18 @@ class AutotuneService:
                     ),
                     bucket_size=bucket_size,
                 )
+                if self.autotune_cache is not None and whether_to_bucket:
+                    hp = self._load_cached_results(hp_manager, tensor_list) or hp
+
                 hp_manager.time_hp_last_granted = time.time()
-                hp_manager.hyperparameter = hp
+                hp_manager.tensor_ids = {
+                    td["name"]: i for i, td in enumerate(tensor_list)
+                }
+                hp_manager.set_hyperparameter(hp)
                 return json.dumps(
                     {
                         "recommended_hyperparameters": hp.dict(),
+                        "version": hp_manager.version,
                     }
                 )
 
@@ -201,27 +385,13 @@ class AutotuneService:
                 return "Service not ready for report_metrics!", 405
 
             hp_manager = self.model_dict[model_name]
-
-            # Only consider the rank of the first report metrics now.
-            with hp_manager.lock:
-                (last_report_train_iter, _, _) = hp_manager.inner.tail_record()
-                if train_iter <= last_report_train_iter:
-                    return json.dumps({})
-
-                logging.debug(
-                    "rank={}, train_iter={}, speed={}, "
-                    "hyperparameters={}".format(
-                        rank,
-                        train_iter,
-                        speed,
-                        hyperparameters,
-                    )
-                )
-                hp_manager.inner.report_metrics(
-                    train_iter=train_iter,
-                    hyperparameter=BaguaHyperparameter().update(hyperparameters),
-                    system_efficiency_score=speed,
-                )
+            self._report_metrics(
+                hp_manager,
+                rank,
+                train_iter,
+                BaguaHyperparameter().update(hyperparameters),
+                speed,
+            )
 
             return json.dumps({})
 
@@ -240,32 +410,56 @@ class AutotuneService:
 
             hp_manager = self.model_dict[model_name]
 
-            tensor_partial_order = {}
-            with self.tensor_partial_order_lock:
-                tensor_partial_order = copy.deepcopy(self.tensor_partial_order)
+            with hp_manager.lock:
+                self._ask_hyperparameters(hp_manager, rank, train_iter)
 
-            logging.debug("tensor_partial_order={}".format(tensor_partial_order))
+                return json.dumps(
+                    {
+                        "recommended_hyperparameters": hp_manager.hyperparameter.dict(),
+                        "version": hp_manager.version,
+                        "is_autotune_completed": hp_manager.sampling_count
+                        > self.max_samples,  # noqa: W503
+                    }
+                )
+
+        @app.route("/api/v1/report_and_ask", methods=["POST"])
+        def report_and_ask():
+            """
+            report_metrics and ask_hyperparameters in a single request. The hyperparameters the metrics were measured
+            with are given by their version. The recommended hyperparameters are only returned if their version
+            differs, with tensors in buckets given by their position in the registered tensor list.
+            """
+            req: dict = request.get_json(force=True)
+            model_name: str = req["model_name"]
+            rank: int = req["rank"]
+            train_iter: int = req["train_iter"]
+            speed: float = req["speed"]
+            version: int = req["version"]
+
+            if model_name not in self.model_dict:
+                return "Service not ready for report_and_ask!", 405
+
+            hp_manager = self.model_dict[model_name]
+            if version not in hp_manager.hyperparameter_versions:
+                return "Unknown hyperparameters version {}!".format(version), 400
+
+            self._report_metrics(
+                hp_manager,
+                rank,
+                train_iter,
+                hp_manager.hyperparameter_versions[version],
+                speed,
+            )
 
             with hp_manager.lock:
-                # Autotune conditions:
-                # 1. autotune_level >= 1.
-                # 2. The bagua process is not in the process of hyperparameter update. (self.check_board.count(self.check_board[0])
-                #   == len(self.check_board))
-                # 3. Only execute autotune at most once in an iteration. (self.check_board[rank] < train_iter)
-                check_board = hp_manager.check_board
-                if (
-                    self.autotune_level >= 1
-                    and check_board.count(check_board[0])  # noqa: W503
-                    == len(check_board)  # noqa: W503
-                    and check_board[rank] < train_iter  # noqa: W503
-                ):
-                    self.autotune(hp_manager, rank, train_iter, tensor_partial_order)
-
-                check_board[rank] = train_iter
+                self._ask_hyperparameters(hp_manager, rank, train_iter)
 
                 return json.dumps(
                     {
-                        "recommended_hyperparameters": hp_manager.hyperparameter.dict(),
+                        "recommended_hyperparameters": hp_manager.compact_hyperparameter()
+                        if hp_manager.version != version
+                        else None,
+                        "version": hp_manager.version,
                         "is_autotune_completed": hp_manager.sampling_count
                         > self.max_samples,  # noqa: W503
                     }
@@ -291,6 +485,8 @@ class AutotuneService:
                             self.tensor_partial_order
                         )
 
+                self._record_tensor_ready_times(spans)
+
             return json.dumps({})
 
         @app.route("/api/v1/health_check", methods=["GET"])
@@ -404,6 +600,28 @@ class AutotuneClient:
         )
         return rsp
 
+    @reset_error_retry
+    def report_and_ask(
+        self,
+        model_name: str,
+        rank: int,
+        train_iter: int,
+        speed: float,
+        version: int,
+    ) -> requests.Response:
+        rsp = self.session.post(
+            "http://{}/api/v1/report_and_ask".format(self.autotune_service_addr),
+            json={
+                "model_name": model_name,
+                "rank": rank,
+                "train_iter": train_iter,
+                "speed": speed,
+                "version": version,
+            },
+            proxies=self.proxies,
+        )
+        return rsp
+
     @reset_error_retry
     def report_tensor_execution_order(
         self,
@@ -434,27 +652,114 @@ class AutotuneClient:
         except requests.exceptions.ConnectionError:
             return False
 
-if __name__ == "__main__":
+
+def start_autotune_service_process(
+    world_size: int,
+    port: int,
+    autotune_level: int = 0,
+    max_samples: int = 60,
+    sampling_confidence_time_s: float = 5.0,
+    warmup_time_s: float = 30.0,
+    is_output_autotune_log: bool = False,
+    default_bucket_size: int = 10 * 1024 ** 2,
+    num_nodes: int = 1,
+    autotune_cache_path: str = "",
+    skip_autotune_if_cached: bool = False,
+    env: Optional[Dict[str, str]] = None,
+) -> subprocess.Popen:
+    """
+    Starts the autotune service in a new interpreter running :func:`main`, with a lower CPU priority than the
+    training processes. Arguments are those of :class:`AutotuneService`, :attr:`env` is the environment of the
+    new process.
+    """
+    cmd = [
+        sys.executable,
+        "-u",
+        "-m",
+        "bagua.service.autotune_service",
+        "--nprocs={}".format(world_size),
+        "--port={}".format(port),
+        "--autotune_level={}".format(autotune_level),
+        "--max_samples={}".format(max_samples),
+        "--sampling_confidence_time={}".format(sampling_confidence_time_s),
+        "--warmup_time={}".format(warmup_time_s),
+        "--default_bucket_size={}".format(default_bucket_size),
+        "--nnodes={}".format(num_nodes),
+        "--autotune_cache_path={}".format(autotune_cache_path),
+        "--nice=10",
+    ]
+    if is_output_autotune_log:
+        cmd.append("--is_output_autotune_log")
+    if skip_autotune_if_cached:
+        cmd.append("--skip_autotune_if_cached")
+
+    return subprocess.Popen(cmd, env=env)
+
+
+def main():
+    """
+    Runs the autotune service in its own process, e.g. started by the launcher before the training processes, or
+    by rank 0 with ``BAGUA_AUTOTUNE_SERVICE_MODE=spawn``.
+    """
     import argparse
     from flask import Flask
+    from gevent.pywsgi import WSGIServer
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--nprocs", type=int, default=8)
+    parser = argparse.ArgumentParser(description="Bagua autotune service")
+    parser.add_argument("--nprocs", type=int, default=8, help="world size of the job")
     parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--autotune_level", type=int, default=0)
+    parser.add_argument("--max_samples", type=int, default=60)
+    parser.add_argument("--sampling_confidence_time", type=float, default=5.0)
+    parser.add_argument("--warmup_time", type=float, default=30.0)
+    parser.add_argument("--is_output_autotune_log", action="store_true")
+    parser.add_argument("--default_bucket_size", type=int, default=10 * 1024 ** 2)
+    parser.add_argument("--nnodes", type=int, default=1)
+    parser.add_argument(
+        "--autotune_cache_path",
+        type=str,
+        default="",
+        help="file keeping autotune results across jobs, disabled if empty",
+    )
+    parser.add_argument(
+        "--skip_autotune_if_cached",
+        action="store_true",
+        help="use cached hyperparameters without tuning, if any",
+    )
+    parser.add_argument(
+        "--nice",
+        type=int,
+        default=0,
+        help="niceness increment of the service, so that it yields the CPU to training processes",
+    )
 
     args = parser.parse_args()
-
-    autotune_service = AutotuneService(args.nproc)
+    if args.nice > 0:
+        os.nice(args.nice)
+
+    os.environ["WERKZEUG_RUN_MAIN"] = "true"
+    autotune_service = AutotuneService(
+        world_size=args.nprocs,
+        autotune_level=args.autotune_level,
+        max_samples=args.max_samples,
+        sampling_confidence_time_s=args.sampling_confidence_time,
+        warmup_time_s=args.warmup_time,
+        is_output_autotune_log=args.is_output_autotune_log,
+        default_bucket_size=args.default_bucket_size,
+        num_nodes=args.nnodes,
+        autotune_cache_path=args.autotune_cache_path,
+        skip_autotune_if_cached=args.skip_autotune_if_cached,
+    )
     app = Flask(__name__)
     app = autotune_service.setup_app(app)
 
-    server = multiprocessing.Process(
-        target=app.run,
-        kwargs={
-            "host": "0.0.0.0",
-            "port": args.port,
-        },
+    http_server = WSGIServer(
+        listener=("0.0.0.0", args.port),
+        application=app,
+        log=None,
     )
-    server.daemon = True
-    server.start()
-    server.join()
+    http_server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
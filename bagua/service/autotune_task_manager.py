@@ -4,10 +4,12 @@ import copy
 import math
 import logging
 import csv
+import numpy as np
 from typing import Tuple, List, Dict
 
 from .bayesian_optimizer import (
     IntParam,
+    FloatParam,
     BoolParam,
     BayesianOptimizer,
 )
@@ -18,8 +20,44 @@ from bagua.bagua_define import (
 )
 
 
+def partition_by_cost_model(
+    ready_times: List[float], sizes: List[int], latency: float, bandwidth: float
+) -> List[int]:
+    """
+    Partitions tensors, sorted by the time they are ready for communication, into contiguous buckets, minimizing
+    the time at which the communication of the last bucket finishes. Buckets are communicated one after another,
+    each once its last tensor is ready, in ``latency + bytes / bandwidth`` seconds.
+
+    Returns the end positions of the buckets.
+    """
+    n = len(sizes)
+    offsets = np.concatenate([[0.0], np.cumsum(sizes, dtype=np.float64)])
+
+    # finish[b] is the earliest time the communication of tensors [0, b) can finish, with the last bucket of
+    # an optimal partition of them starting at tensor start[b]
+    finish = np.full(n + 1, -np.inf)
+    start = np.zeros(n + 1, dtype=np.int64)
+    for b in range(1, n + 1):
+        candidates = (
+            np.maximum(finish[:b], ready_times[b - 1])
+            + latency
+            + (offsets[b] - offsets[:b]) / bandwidth
+        )
+        start[b] = np.argmin(candidates)
+        finish[b] = candidates[start[b]]
+
+    ends = []
+    b = n
+    while b > 0:
+        ends.append(b)
+        b = start[b]
+    return ends[::-1]
+
+
 class AutotuneTaskManager:
     RECORD_MAX_NUM = 1000
+    # communication latency assumed for hyperparameters not partitioned with the cost model
+    DEFAULT_COMM_LATENCY = 1e-4
 
     def __init__(
         self,
@@ -45,9 +83,18 @@ class AutotuneTaskManager:
         else:
             self.autotune_logfile_path = None
 
+        # parameters of the communication cost model, the bandwidth being given by the number of bytes
+        # transferred in the time of the latency, i.e. the bucket size when tensor ready times are unknown
         self.bayesian_optimizer = BayesianOptimizer(
             {
-                "bucket_size_2p": IntParam(  # bucket_size = 2 ^ bucket_size_2p
+                "comm_latency_log10": FloatParam(  # latency = 10 ^ comm_latency_log10 seconds
+                    val=-4.0,
+                    space_dimension=(  # 1us ~ 10ms
+                        -6.0,
+                        -2.0,
+                    ),
+                ),
+                "bucket_size_2p": IntParam(  # latency * bandwidth = 2 ^ bucket_size_2p
                     val=13,
                     space_dimension=(  # 1KB ~ 2GB
                         10,
@@ -118,6 +165,45 @@ class AutotuneTaskManager:
 
         return buckets
 
+    @staticmethod
+    def split_bucket_by_cost_model(
+        tensor_list: List[TensorDeclaration],
+        tensor_ready_times: Dict[str, float],
+        latency: float,
+        bandwidth: float,
+    ):
+        """
+        Splits tensors into buckets minimizing the communication time left after the last tensor is ready,
+        according to :func:`partition_by_cost_model`. Tensors of each dtype are partitioned separately, as
+        buckets only hold tensors of the same dtype, and buckets are ordered by the time they are ready.
+        """
+        dtype_unit_size = {
+            TensorDtype.F32.value: 4,
+            TensorDtype.F16.value: 2,
+            TensorDtype.U8.value: 1,
+        }
+
+        buckets = []
+        for (dtype, unit_size) in sorted(dtype_unit_size.items()):
+            tensors = sorted(
+                [x for x in tensor_list if x["dtype"] == dtype],
+                key=lambda td: tensor_ready_times.get(td["name"], 0.0),
+            )
+            if len(tensors) == 0:
+                continue
+
+            ready_times = [tensor_ready_times.get(td["name"], 0.0) for td in tensors]
+            ends = partition_by_cost_model(
+                ready_times,
+                [td["num_elements"] * unit_size for td in tensors],
+                latency,
+                bandwidth,
+            )
+            for begin, end in zip([0] + ends[:-1], ends):
+                buckets.append((ready_times[end - 1], tensors[begin:end]))
+
+        return [bucket for _, bucket in sorted(buckets, key=lambda x: x[0])]
+
     def tail_record(self) -> Tuple[int, BaguaHyperparameter, float]:
         return self.record_deque[-1]
 
@@ -143,19 +229,38 @@ class AutotuneTaskManager:
             )
         )
 
+    def warm_start(self, history: List[Tuple[dict, float]]) -> None:
+        """Tells the optimizer the (params, score) history of previous jobs, before asking for hyperparameters."""
+        param_names = set(self.bayesian_optimizer.param_declaration.keys())
+        # skip params of another search space
+        history = [
+            (params, score)
+            for params, score in history
+            if set(params.keys()) == param_names
+        ]
+        self.bayesian_optimizer.tell_many(
+            [params for params, _ in history], [score for _, score in history]
+        )
+
     def ask_hyperparmeter(
         self,
         train_iter: int,
         tensor_partial_order: Dict[str, int] = {},  # tensor_name -> rank
+        tensor_ready_times: Dict[str, float] = {},  # tensor_name -> seconds
     ) -> BaguaHyperparameter:
         (_, hp, system_efficiency_score) = self.tail_record()
+        comm_latency = (
+            hp.comm_latency if hp.comm_latency > 0 else self.DEFAULT_COMM_LATENCY
+        )
         optimizer_params = {
+            "comm_latency_log10": math.log10(comm_latency),
             "bucket_size_2p": int(math.log(hp.bucket_size, 2)),
             "is_hierarchical_reduce": hp.is_hierarchical_reduce,
         }
         self.bayesian_optimizer.tell(optimizer_params, system_efficiency_score)
         recommend_param = self.bayesian_optimizer.ask()
         recommend_bucket_size = 2 ** recommend_param["bucket_size_2p"]
+        recommend_comm_latency = 10 ** recommend_param["comm_latency_log10"]
 
         if self.autotune_logfile_path:
             AutotuneTaskManager.record_autotune_log(
@@ -171,15 +276,30 @@ class AutotuneTaskManager:
             tensor_list, key=lambda td: tensor_partial_order.get(td["name"], -1)
         )
 
-        recommend_buckets = AutotuneTaskManager.split_bucket_by_bucket_size(
-            tensor_list,
-            recommend_bucket_size,
-        )
+        # partition buckets with the cost model once the ready times of the tensors have been measured
+        tensor_ready_times = {
+            td["name"]: tensor_ready_times[td["name"]]
+            for td in tensor_list
+            if td["name"] in tensor_ready_times
+        }
+        if len(tensor_ready_times) > 0:
+            recommend_buckets = AutotuneTaskManager.split_bucket_by_cost_model(
+                tensor_list,
+                tensor_ready_times,
+                recommend_comm_latency,
+                recommend_bucket_size / recommend_comm_latency,
+            )
+        else:
+            recommend_buckets = AutotuneTaskManager.split_bucket_by_bucket_size(
+                tensor_list,
+                recommend_bucket_size,
+            )
 
         recommend_hp = BaguaHyperparameter(
             buckets=recommend_buckets,
             bucket_size=recommend_bucket_size,
             is_hierarchical_reduce=bool(recommend_param["is_hierarchical_reduce"]),
+            comm_latency=recommend_comm_latency,
         )
 
         return recommend_hp
@@ -1,7 +1,7 @@
 import collections
 import logging
 import skopt
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 
 
 class IntParam:
@@ -55,6 +55,8 @@ class BayesianOptimizer:
             n_jobs=-1,
             random_state=random_state,
         )
+        #: (params, score) pairs told to the optimizer
+        self.history = []
 
     def tell(self, param_dict: dict, score: float) -> None:
         param_v = [
@@ -63,6 +65,7 @@ class BayesianOptimizer:
         ]
         try:
             self.bayesian_optimizer.tell(param_v, -score)
+            self.history.append((dict(param_dict), score))
         except ValueError as err:
             logging.warning(
                 "Maybe sklearn's division by 0 bug, skip it. err={}, param_v={}".format(
@@ -70,6 +73,28 @@ class BayesianOptimizer:
                 )
             )
 
+    def tell_many(self, param_dicts: List[dict], scores: List[float]) -> None:
+        """Tells multiple (params, score) pairs at once, fitting the model only once."""
+        if len(param_dicts) == 0:
+            return
+
+        param_vs = [
+            [float(param_dict[name]) for name in self.param_declaration.keys()]
+            for param_dict in param_dicts
+        ]
+        try:
+            self.bayesian_optimizer.tell(param_vs, [-score for score in scores])
+            self.history.extend(
+                (dict(param_dict), score)
+                for param_dict, score in zip(param_dicts, scores)
+            )
+        except ValueError as err:
+            logging.warning(
+                "Maybe sklearn's division by 0 bug, skip it. err={}, param_vs={}".format(
+                    err, param_vs
+                )
+            )
+
     def ask(self) -> dict:
         param_v = self.bayesian_optimizer.ask()
         param_dict = {}
@@ -3,6 +3,7 @@ import time
 import io
 import pickle
 import multiprocessing
+import atexit
 import bagua_core as B
 from bagua.service import AutotuneService
 from . import env
@@ -11,17 +12,23 @@ from .env import (
     get_world_size,
     get_rank,
     get_local_rank,
+    get_local_size,
     get_node_rank,
     get_default_bucket_size,
     get_bagua_service_port,
     get_autotune_server_wait_time,
+    get_autotune_service_mode,
+    get_autotune_service_addr,
     find_free_network_port,
 )
 from enum import IntEnum
 from .utils import flatten, unflatten
 import torch
 import torch.distributed as dist
-from bagua.service.autotune_service import AutotuneClient
+from bagua.service.autotune_service import (
+    AutotuneClient,
+    start_autotune_service_process,
+)
 from functools import lru_cache
 from datetime import timedelta
 from typing import Optional, List
@@ -395,6 +402,9 @@ def run_flask_app(port):
         warmup_time_s=env.get_autotune_warmup_time_s(),
         is_output_autotune_log=env.get_is_output_autotune_log(),
         default_bucket_size=get_default_bucket_size(),
+        num_nodes=get_world_size() // get_local_size(),
+        autotune_cache_path=env.get_autotune_cache_path(),
+        skip_autotune_if_cached=env.get_skip_autotune_if_cached(),
     )
     app = Flask(__name__)
     app = autotune_service.setup_app(app)
@@ -408,13 +418,40 @@ def run_flask_app(port):
 
 
 _autotune_server = None
+_autotune_service_addr = None
 _autotune_service_port = None
 
 
+def _stop_autotune_server():
+    if _autotune_server is not None and _autotune_server.poll() is None:
+        _autotune_server.terminate()
+
+
 def start_autotune_server(service_port: int):
-    """Starts autotune server in background."""
+    """Starts autotune server in background.
+
+    With ``BAGUA_AUTOTUNE_SERVICE_MODE=spawn``, the server runs in a new interpreter with a lower CPU priority,
+    sharing nothing with the training process. Otherwise it runs in a process forked from the training process.
+    """
     global _autotune_server
 
+    if get_autotune_service_mode() == "spawn":
+        _autotune_server = start_autotune_service_process(
+            world_size=get_world_size(),
+            port=service_port,
+            autotune_level=env.get_autotune_level(),
+            max_samples=env.get_autotune_max_samples(),
+            sampling_confidence_time_s=env.get_autotune_sampling_confidence_time_s(),
+            warmup_time_s=env.get_autotune_warmup_time_s(),
+            is_output_autotune_log=env.get_is_output_autotune_log(),
+            default_bucket_size=get_default_bucket_size(),
+            num_nodes=get_world_size() // get_local_size(),
+            autotune_cache_path=env.get_autotune_cache_path(),
+            skip_autotune_if_cached=env.get_skip_autotune_if_cached(),
+        )
+        atexit.register(_stop_autotune_server)
+        return
+
     _autotune_server = multiprocessing.Process(target=run_flask_app, args=(service_port, ))
     _autotune_server.daemon = True
     _autotune_server.start()
@@ -422,13 +459,47 @@ def start_autotune_server(service_port: int):
 
 @lru_cache(maxsize=None)
 def get_hyperparameters_service_client():
-    global _autotune_service_port
     hyperparameters_service_client = AutotuneClient(
-        get_master_addr(), _autotune_service_port
+        _autotune_service_addr, _autotune_service_port
     )
     return hyperparameters_service_client
 
 
+def _setup_autotune_service(store):
+    # rank 0 starts the service, or finds an existing one, and publishes its address in the store
+    global _autotune_service_addr
+    global _autotune_service_port
+
+    if get_rank() == 0:
+        mode = get_autotune_service_mode()
+        if mode == "external":
+            addr = get_autotune_service_addr()
+            if addr == "":
+                raise ValueError(
+                    "BAGUA_AUTOTUNE_SERVICE_ADDR should be set to the address of the autotune service, "
+                    "as host:port, with BAGUA_AUTOTUNE_SERVICE_MODE=external"
+                )
+            host, port = addr.rsplit(":", 1)
+            _autotune_service_addr, _autotune_service_port = host, int(port)
+        elif mode in ("fork", "spawn"):
+            _autotune_service_addr = get_master_addr()
+            _autotune_service_port = _find_free_bagua_service_port(store)
+            start_autotune_server(_autotune_service_port)
+        else:
+            raise ValueError(
+                "Invalid BAGUA_AUTOTUNE_SERVICE_MODE {}, should be one of "
+                "\"fork\", \"spawn\" and \"external\"".format(mode)
+            )
+
+        store.set(
+            "bagua_autotune_service_addr",
+            "{}:{}".format(_autotune_service_addr, _autotune_service_port),
+        )
+    else:
+        host, port = str(store.get("bagua_autotune_service_addr"), encoding="utf-8").rsplit(":", 1)
+        _autotune_service_addr, _autotune_service_port = host, int(port)
+
+
 def _find_free_bagua_service_port(store) -> int:
     service_port = get_bagua_service_port()
     if service_port > 0:
@@ -485,7 +556,6 @@ def init_process_group(store: Optional[torch.distributed.Store] = None, rank: in
 
     global _default_pg
     global _default_store
-    global _autotune_service_port
 
     if _default_pg is not None:
         raise RuntimeError("trying to initialize the default process group twice!")
@@ -511,12 +581,7 @@ def init_process_group(store: Optional[torch.distributed.Store] = None, rank: in
         _default_store = store
 
     if _autotune_service_port is None:
-        if get_rank() == 0:
-            _autotune_service_port = _find_free_bagua_service_port(_default_store)
-            store.set("bagua_autotune_service_port", str(_autotune_service_port))
-            start_autotune_server(_autotune_service_port)
-        else:
-            _autotune_service_port = int(store.get("bagua_autotune_service_port"))
+        _setup_autotune_service(_default_store)
 
     AUTOTUNE_SERVER_WAIT_TIME = 30
     wait_time = get_autotune_server_wait_time()
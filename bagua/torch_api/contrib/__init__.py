@@ -3,5 +3,8 @@ from .load_balancing_data_loader import (  # noqa: F401
     LoadBalancingDistributedSampler,
     LoadBalancingDistributedBatchSampler,
 )
+from .load_balancing_iterable_dataset import (  # noqa: F401
+    LoadBalancingDistributedIterableDataset,
+)
 from .cache_loader import CacheLoader  # noqa: F401
 from .cached_dataset import CachedDataset  # noqa: F401
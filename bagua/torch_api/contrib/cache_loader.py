@@ -1,25 +1,32 @@
-import pickle
-from collections import defaultdict
-from typing import Callable
+import logging
+import multiprocessing.util
+import os
+import threading
+import time
+from collections import defaultdict, OrderedDict
+from typing import Any, Callable, List, Optional
+from .utils.admission import AdmissionPolicy
+from .utils.cache_stats import CacheStats
+from .utils.compressor import Compressor
+from .utils.serializer import Serializer, TensorSerializer
 
 
 __all__ = ["CacheLoader"]
 
 
-def serialize(input):
-    return pickle.dumps(input)
-
-
-def deserialize(input):
-    return pickle.loads(input)
-
-
 class CacheLoader:
     def __init__(
         self,
         backend: str = "redis",
         dataset_name: str = "",
         writer_buffer_size: int = 1,
+        local_cache_capacity: int = 0,
+        reader_buffer_size: int = 100,
+        serializer: Optional[Serializer] = None,
+        compressor: Optional[Compressor] = None,
+        write_behind: bool = False,
+        max_pending_writes: int = 10000,
+        admission_policy: Optional[AdmissionPolicy] = None,
         **kwargs,
     ):
         """
@@ -33,11 +40,41 @@ class CacheLoader:
         supports using a list of existing redis servers or spawning new redis servers. Parameters for :class:`~bagua.torch_api.contrib.utils.redis_store.RedisStore` can be provided here in
         ``**kwargs``.
 
+        With ``backend="shm"``, cache loader uses :class:`~bagua.torch_api.contrib.utils.shm_store.SharedMemoryStore` instead, which
+        keeps the cache in the shared memory of each node and does not require Redis. Parameters for
+        :class:`~bagua.torch_api.contrib.utils.shm_store.SharedMemoryStore` can be provided here in ``**kwargs``.
+
+        With ``backend="disk"``, cache loader uses :class:`~bagua.torch_api.contrib.utils.disk_store.DiskStore`, which keeps
+        the cache in a file on each node. The file is kept after the job exits, so that later jobs can reuse the cache.
+        Parameters for :class:`~bagua.torch_api.contrib.utils.disk_store.DiskStore` can be provided here in ``**kwargs``.
+
         Args:
-            backend(str): Backend distributed key-value store implementation. Can be ``"redis"``.
+            backend(str): Backend distributed key-value store implementation. Can be ``"redis"``, ``"shm"`` or ``"disk"``.
             dataset_name(str): Name of the dataset. Default ``""``.
             writer_buffer_size(int): Number of samples to collect before writing to the backend key-value store.
                 Useful for improving the backend throughput.
+            local_cache_capacity(int): Maximum memory in bytes of the in-process local cache sitting in front of the
+                backend key-value store. Entries are measured by their serialized size and evicted in least recently
+                used order. Default ``0``, which disables the local cache.
+            reader_buffer_size(int): Maximum number of keys to retrieve from the backend key-value store in a single
+                request when prefetching with :meth:`prefetch`. Default ``100``.
+            serializer(Serializer): Serializer converting values to bytes to be saved in the backend key-value store.
+                Default :class:`~bagua.torch_api.contrib.utils.serializer.TensorSerializer`, which saves tensors and
+                numpy arrays as raw buffers and pickles other objects. Use
+                :class:`~bagua.torch_api.contrib.utils.serializer.PickleSerializer` to pickle every value.
+            compressor(Compressor, optional): If set, serialized values are compressed with it before being written
+                to the backend key-value store, and decompressed after being read. Default ``None``.
+            write_behind(bool): If ``True``, values are written to the backend key-value store by a background thread
+                in batches of at least :attr:`writer_buffer_size` values, instead of on the thread calling :meth:`get`.
+                Default ``False``.
+            max_pending_writes(int): Maximum number of values waiting to be written by the background thread if
+                :attr:`write_behind` is ``True``. Once the limit is reached, :meth:`get` blocks on writing new values
+                until the background thread catches up. Default ``10000``.
+            admission_policy(AdmissionPolicy, optional): If set, values loaded on cache misses are only written to
+                the backend key-value store if admitted by the policy, e.g. a
+                :class:`~bagua.torch_api.contrib.utils.admission.CostAwareAdmissionPolicy` keeping the cache for
+                the values that are slowest to load per byte when it cannot hold the whole dataset. Default ``None``,
+                which writes every loaded value.
 
         Example::
             To use a list of existing redis servers for the "redis" backend:
@@ -54,23 +91,97 @@ class CacheLoader:
 
             >>> loader = CacheLoader(backend="redis", hosts=None, cluster_mode=True, capacity_per_node=100000000)
 
+            To keep the samples read by each node in the redis server spawned on that node, as long as each rank
+            reads a stable subset of samples:
+
+            >>> loader = CacheLoader(backend="redis", hosts=None, cluster_mode=True, placement="local")
+
+            To cache values in the shared memory of each node, with a maximum memory limit of 100000000 bytes:
+
+            >>> loader = CacheLoader(backend="shm", capacity_per_node=100000000)
+
+            To cache values in a file on local disk, which can be reused by later jobs:
+
+            >>> loader = CacheLoader(backend="disk", path="/mnt/ssd/imagenet.cache", dataset_name="imagenet")
+
+            To additionally keep up to 1GB of deserialized values in the local process:
+
+            >>> loader = CacheLoader(backend="redis", hosts=None, local_cache_capacity=1024 ** 3)
+
+            To compress values larger than 4KB with zstd on 4 threads, fitting more of them into the backend store:
+
+            >>> from bagua.torch_api.contrib.utils.compressor import Compressor
+            >>> loader = CacheLoader(
+            ...     backend="redis",
+            ...     hosts=None,
+            ...     compressor=Compressor("zstd", threshold=4096, num_threads=4),
+            ... )
+
         .. note::
             Cache loaders with the same :attr:`dataset_name` will reuse and overwrite each other's cache.
             Use a different :attr:`dataset_name` if this is not desired.
 
+        .. note::
+            Values served from the local cache are the same objects on every hit, modifying them in place
+            will also modify the cached copy. The local cache is private to each process, so each DataLoader
+            worker keeps its own one.
+
+        .. note::
+            Hits, misses, latencies and bytes transferred are collected in :attr:`stats`, a
+            :class:`~bagua.torch_api.contrib.utils.cache_stats.CacheStats`, which can be exported with
+            ``loader.stats.to_dict()`` or ``loader.stats.to_prometheus()``.
+
+        .. note::
+            With :attr:`write_behind`, pending values are written to the backend key-value store when the process
+            exits, or when calling :meth:`flush`.
+
         """
 
         self.backend = backend
         self.dataset_name = dataset_name
+        self.serializer = serializer if serializer is not None else TensorSerializer()
 
         if backend == "redis":
             from .utils.redis_store import RedisStore
 
             self.store = RedisStore(**kwargs)
-        else:
-            raise ValueError('Invalid backend, only support "redis" currently')
+        elif backend == "shm":
+            from .utils.shm_store import SharedMemoryStore
+
+            self.store = SharedMemoryStore(**kwargs)
+        elif backend == "disk":
+            from .utils.disk_store import DiskStore
 
-        self.fetcher = BatchFetcher(self.store, 1, writer_buffer_size)
+            self.store = DiskStore(**kwargs)
+        else:
+            raise ValueError(
+                'Invalid backend, only support "redis", "shm" and "disk" currently'
+            )
+
+        self.admission_policy = admission_policy
+        if admission_policy is not None:
+            admission_policy.attach(self.store)
+        self.stats = CacheStats(self.store)
+        if write_behind:
+            self.fetcher = WriteBehindBatchFetcher(
+                self.store,
+                reader_buffer_size,
+                writer_buffer_size,
+                compressor,
+                self.stats,
+                max_pending_writes,
+            )
+        else:
+            self.fetcher = BatchFetcher(
+                self.store,
+                reader_buffer_size,
+                writer_buffer_size,
+                compressor,
+                self.stats,
+            )
+        self.local_cache = (
+            LRUCache(local_cache_capacity) if local_cache_capacity > 0 else None
+        )
 
     def get(self, key: str, load_fn: Callable[[str], None]):
         """
@@ -79,27 +190,128 @@ class CacheLoader:
         be cached.
         """
 
-        cache_key = "{}_{}".format(self.dataset_name, key)
-        ret = self.fetcher.read(cache_key)
+        cache_key = self._cache_key(key)
+        if self.admission_policy is not None:
+            self.admission_policy.record_access(cache_key)
+
+        if self.local_cache is not None:
+            ret = self.local_cache.get(cache_key)
+            if ret is not None:
+                self.stats.record_local_hit()
+                return ret
 
-        if ret is None:
+        buf = self.fetcher.read(cache_key)
+
+        if buf is None:
+            start = time.perf_counter()
             ret = load_fn(key)
-            # write to store
-            self.fetcher.write(cache_key, ret)
+            load_seconds = time.perf_counter() - start
+            self.stats.record_miss(load_seconds)
+
+            buf = self.serializer.serialize(ret)
+            if self.admission_policy is None or self.admission_policy.admit(
+                cache_key, load_seconds, len(buf)
+            ):
+                # write to store
+                self.fetcher.write(cache_key, buf)
+            else:
+                self.stats.record_rejection()
+        else:
+            self.stats.record_hit()
+            ret = self.serializer.deserialize(buf)
+
+        if self.local_cache is not None:
+            self.local_cache.set(cache_key, ret, len(buf))
         return ret
 
+    def prefetch(self, keys: List[str]):
+        """
+        Retrieves the values associated with :attr:`keys` from the backend key-value store in batches of at most
+        :attr:`reader_buffer_size` keys, so that the following :meth:`get` calls on these keys are served without
+        a request to the backend store each.
+
+        Prefetched values are kept until they are retrieved by :meth:`get` or until the next call of this method.
+        """
+
+        cache_keys = [self._cache_key(key) for key in keys]
+        if self.local_cache is not None:
+            cache_keys = [k for k in cache_keys if k not in self.local_cache]
+
+        self.fetcher.prefetch(cache_keys)
+
+    def flush(self):
+        """Writes all buffered values to the backend key-value store, and waits until they are written."""
+
+        self.fetcher.flush()
+
     def num_keys(self):
         """Returns the number of keys in the cache."""
 
         return self.store.num_keys()
 
+    def _cache_key(self, key) -> str:
+        return "{}_{}".format(self.dataset_name, key)
+
+
+class LRUCache:
+    """
+    An in-process cache bounded by the total size in bytes of its entries, evicting the least recently used
+    entries first.
+
+    Args:
+        capacity(int): Maximum total size in bytes of the cached entries.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def set(self, key: str, value: Any, nbytes: int):
+        if nbytes > self.capacity:
+            return
+
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+
+        self.entries[key] = (value, nbytes)
+        self.size += nbytes
+
+        while self.size > self.capacity:
+            _, (_, evicted_nbytes) = self.entries.popitem(last=False)
+            self.size -= evicted_nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
 
 class BatchFetcher:
-    def __init__(self, store, read_buffer_size, writer_buffer_size):
+    def __init__(
+        self, store, read_buffer_size, writer_buffer_size, compressor=None, stats=None
+    ):
         self.store = store
+        self.compressor = compressor
+        self.stats = stats if stats is not None else CacheStats()
         self.read_buffer_size = max(1, read_buffer_size)
         self.writer_buffer_size = max(1, writer_buffer_size)
 
+        self.read_map = {}
         self.write_map = defaultdict()
         self.write_cnt = 0
         self.read_cnt = 0
@@ -109,21 +321,53 @@ class BatchFetcher:
     def read(self, key):
         self.read_cnt += 1
 
+        if key in self.read_map:
+            self.write_post_read()
+            return self.read_map.pop(key)
+
+        start = time.perf_counter()
         try:
             ret = self.store.get(key)
         except Exception:
+            self.stats.record_read_failure()
             ret = None
         else:
+            self.stats.record_get(
+                time.perf_counter() - start, len(ret) if ret is not None else 0
+            )
             self.write_post_read()
 
-        if ret is not None:
-            return deserialize(ret)
+        if ret is not None and self.compressor is not None:
+            ret = self.compressor.decompress(ret)
         return ret
 
+    def prefetch(self, keys):
+        self.read_map.clear()
+
+        for i in range(0, len(keys), self.read_buffer_size):
+            window = keys[i : i + self.read_buffer_size]
+            start = time.perf_counter()
+            try:
+                values = self.store.mget(window)
+            except Exception:
+                self.stats.record_read_failure()
+                continue
+
+            self.stats.record_get(
+                time.perf_counter() - start,
+                sum(len(v) for v in values if v is not None),
+            )
+
+            self.read_map.update(zip(window, values))
+
+        if self.compressor is not None:
+            values = self.compressor.decompress_many(list(self.read_map.values()))
+            self.read_map = dict(zip(self.read_map.keys(), values))
+
     def write(self, key, value):
         self.write_cnt += 1
 
-        self.write_map[key] = serialize(value)
+        self.write_map[key] = value
         if self.write_cnt % self.writer_buffer_size == 0:
             self.flush_write_map()
 
@@ -132,9 +376,175 @@ class BatchFetcher:
             self.flush_write_map()
 
     def flush_write_map(self):
+        if self._mset(self.write_map):
+            self.write_map.clear()
+
+    def flush(self):
+        if len(self.write_map) > 0:
+            self.flush_write_map()
+
+    def _mset(self, write_map) -> bool:
+        if self.compressor is not None:
+            values = self.compressor.compress_many(list(write_map.values()))
+            write_map = dict(zip(write_map.keys(), values))
+
+        start = time.perf_counter()
         try:
-            self.store.mset(self.write_map)
+            self.store.mset(write_map)
         except Exception:
-            pass
-        else:
-            self.write_map.clear()
+            self.stats.record_write_failure()
+            return False
+
+        self.stats.record_mset(
+            time.perf_counter() - start, sum(len(v) for v in write_map.values())
+        )
+        return True
+
+
+class WriteBehindBatchFetcher(BatchFetcher):
+    """
+    A batch fetcher writing values to the store on a background thread. Values waiting to be written are coalesced
+    by key, and written in batches of at least :attr:`writer_buffer_size` values, or of all pending values when
+    they have waited for :attr:`flush_interval` seconds. :meth:`write` blocks while :attr:`max_pending_writes`
+    values are waiting. Values which fail to be compressed are dropped, and the error is raised by the next
+    :meth:`flush`.
+    """
+
+    def __init__(
+        self,
+        store,
+        read_buffer_size,
+        writer_buffer_size,
+        compressor=None,
+        stats=None,
+        max_pending_writes=10000,
+        flush_interval=1.0,
+    ):
+        super(WriteBehindBatchFetcher, self).__init__(
+            store, read_buffer_size, writer_buffer_size, compressor, stats
+        )
+        self.max_pending_writes = max(max_pending_writes, self.writer_buffer_size)
+        self.flush_interval = flush_interval
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in [
+            "_cond",
+            "_thread",
+            "_in_flight",
+            "_flush_requested",
+            "_closed",
+            "_error",
+        ]:
+            state.pop(key, None)
+        state["write_map"] = {}
+        state["_pid"] = None
+        return state
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+
+        # threads do not survive forking, e.g. into DataLoader workers, start a new one in each process
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._in_flight = {}
+        self._flush_requested = False
+        self._closed = False
+        self._error = None
+        self.write_map = {}
+
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+
+    def read(self, key):
+        self._start()
+        with self._cond:
+            value = self.write_map.get(key, self._in_flight.get(key))
+
+        if value is not None:
+            self.read_cnt += 1
+            return value
+        return super(WriteBehindBatchFetcher, self).read(key)
+
+    def write(self, key, value):
+        self._start()
+        with self._cond:
+            while (
+                len(self.write_map) >= self.max_pending_writes
+                and key not in self.write_map
+            ):
+                self._cond.wait()
+
+            self.write_cnt += 1
+            self.write_map[key] = value
+            if len(self.write_map) >= self.writer_buffer_size:
+                self._cond.notify_all()
+
+    def write_post_read(self):
+        pass
+
+    def flush_write_map(self):
+        self.flush()
+
+    def flush(self):
+        self._start()
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while len(self.write_map) > 0 or len(self._in_flight) > 0:
+                self._cond.wait()
+            self._flush_requested = False
+
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                timed_out = False
+                while not (
+                    len(self.write_map) > 0
+                    and (
+                        len(self.write_map) >= self.writer_buffer_size
+                        or self._flush_requested
+                        or self._closed
+                        or timed_out
+                    )
+                ):
+                    if self._closed:
+                        return
+                    timed_out = not self._cond.wait(self.flush_interval)
+
+                batch, self.write_map = self.write_map, {}
+                self._in_flight = batch
+                self._cond.notify_all()
+
+            error = None
+            try:
+                if not self._mset(batch):
+                    logging.debug(
+                        "Failed to write {} values to store".format(len(batch))
+                    )
+            except Exception as e:
+                # e.g. failing to compress, keep the thread alive and raise it on flush
+                logging.exception("Failed to write {} values".format(len(batch)))
+                error = e
+
+            with self._cond:
+                if error is not None:
+                    self._error = error
+                self._in_flight = {}
+                self._cond.notify_all()
@@ -0,0 +1,236 @@
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional
+from bagua.torch_api.env import get_rank, get_world_size
+from .cached_dataset import CachedDataset
+
+
+__all__ = ["warm_up"]
+
+
+def _split(indices: List[int], num_parts: int, part: int) -> List[int]:
+    # contiguous ranges, the first `len % num_parts` ones being one index longer
+    size, rest = divmod(len(indices), num_parts)
+    start = part * size + min(part, rest)
+    return indices[start : start + size + (1 if part < rest else 0)]
+
+
+def _warm_up_range(
+    cached_dataset: CachedDataset, indices: List[int], batch_size: int, counters
+):
+    loader = cached_dataset.cache_loader
+
+    for i in range(0, len(indices), batch_size):
+        batch = indices[i : i + batch_size]
+        keys = [loader._cache_key(idx) for idx in batch]
+
+        # skip samples already in the store, e.g. written by an interrupted warm-up
+        present = loader.store.mget(keys)
+        write_map = {
+            key: loader.serializer.serialize(cached_dataset.dataset[idx])
+            for idx, key, value in zip(batch, keys, present)
+            if value is None
+        }
+
+        if len(write_map) > 0 and not loader.fetcher._mset(write_map):
+            raise RuntimeError(
+                "Failed to write {} samples to the cache".format(len(write_map))
+            )
+
+        with counters.get_lock():
+            counters[0] += len(write_map)
+            counters[1] += len(batch) - len(write_map)
+
+
+def warm_up(
+    cached_dataset: CachedDataset,
+    indices: Optional[List[int]] = None,
+    num_workers: Optional[int] = None,
+    batch_size: int = 256,
+    rank: Optional[int] = None,
+    world_size: Optional[int] = None,
+    progress: bool = True,
+) -> Dict[str, int]:
+    """
+    Fills the cache of a cached dataset before training, by loading its samples in parallel from a pool of processes
+    and writing them to the backend key-value store in large batches.
+
+    The samples are split into :attr:`world_size` contiguous ranges, of which this process warms up the
+    :attr:`rank`-th, which is in turn split among :attr:`num_workers` worker processes. Samples already in the cache
+    are skipped, so that an interrupted warm-up can be resumed by running it again.
+
+    Args:
+        cached_dataset(CachedDataset): The cached dataset to warm up.
+        indices(List[int], optional): Indices of the samples to warm up. Default is all samples of the dataset.
+        num_workers(int, optional): Number of worker processes loading samples. Default is the number of CPUs.
+            ``0`` loads samples in the calling process.
+        batch_size(int): Number of samples checked and written to the backend key-value store in a single request.
+            Default ``256``.
+        rank(int, optional): Index of the range of samples warmed up by this process. Default is the rank
+            of the current process.
+        world_size(int, optional): Number of processes warming up the cache together. Default is the world size
+            of the default process group.
+        progress(bool): Whether to display a progress bar. Default ``True``.
+
+    Returns:
+        A dict with the number of samples ``"loaded"`` and written to the cache, and the number of samples
+        ``"skipped"`` since they were already in the cache.
+
+    Example::
+
+        >>> from bagua.torch_api.contrib import CachedDataset
+        >>> from bagua.torch_api.contrib.cache_warmup import warm_up
+        >>> cache_dataset = CachedDataset(dataset, backend="redis", dataset_name="ds")
+        >>> warm_up(cache_dataset, num_workers=32)
+
+        Or from the command line, on CPU nodes before training, where ``my_module.build_dataset`` is a function
+        without arguments returning the dataset to wrap:
+
+        .. code-block:: bash
+
+            python -m bagua.torch_api.contrib.cache_warmup --dataset my_module:build_dataset \\
+                --backend redis --dataset-name ds --store-kwargs '{"hosts": [{"host": "192.168.1.0", "port": "7000"}]}' \\
+                --rank 0 --world-size 2
+
+    .. note::
+        Worker processes are forked, so this is only supported on platforms supporting the ``"fork"`` start method.
+        The samples are serialized and compressed in the same way as by :attr:`cached_dataset` itself, so the
+        cached dataset used in training must be created with the same :attr:`dataset_name`, serializer and
+        compressor.
+
+    .. note::
+        The command line tool needs a backend store outliving it, i.e. existing Redis servers given in ``hosts``,
+        or the ``"disk"`` backend. Redis servers spawned with ``hosts=None`` and shared memory stores are removed
+        when the tool exits.
+    """
+
+    if indices is None:
+        indices = list(range(len(cached_dataset)))
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    rank = rank if rank is not None else get_rank()
+    world_size = world_size if world_size is not None else get_world_size()
+
+    indices = _split(list(indices), world_size, rank)
+    logging.info(
+        "Warming up cache with {} samples on {} workers".format(
+            len(indices), num_workers
+        )
+    )
+
+    ctx = multiprocessing.get_context("fork")
+    # number of samples loaded and skipped
+    counters = ctx.Array("q", 2)
+
+    if num_workers == 0:
+        _warm_up_range(cached_dataset, indices, batch_size, counters)
+        return {"loaded": counters[0], "skipped": counters[1]}
+
+    processes = [
+        ctx.Process(
+            target=_warm_up_range,
+            args=(
+                cached_dataset,
+                _split(indices, num_workers, i),
+                batch_size,
+                counters,
+            ),
+            daemon=True,
+        )
+        for i in range(num_workers)
+    ]
+    for p in processes:
+        p.start()
+
+    pbar = None
+    if progress:
+        from tqdm import tqdm
+
+        pbar = tqdm(total=len(indices), unit="sample")
+
+    try:
+        while any(p.is_alive() for p in processes):
+            time.sleep(0.5)
+            if pbar is not None:
+                pbar.update(counters[0] + counters[1] - pbar.n)
+    finally:
+        for p in processes:
+            p.join()
+        if pbar is not None:
+            pbar.update(counters[0] + counters[1] - pbar.n)
+            pbar.close()
+
+    failed = [i for i, p in enumerate(processes) if p.exitcode != 0]
+    if len(failed) > 0:
+        raise RuntimeError("Cache warm-up workers {} failed".format(failed))
+
+    return {"loaded": counters[0], "skipped": counters[1]}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Fill the cache of a CachedDataset before training."
+    )
+    parser.add_argument(
+        "--dataset",
+        type=str,
+        required=True,
+        help='function returning the dataset to cache, as "module:function"',
+    )
+    parser.add_argument("--backend", type=str, default="redis")
+    parser.add_argument("--dataset-name", type=str, default="")
+    parser.add_argument(
+        "--store-kwargs",
+        type=json.loads,
+        default={},
+        help="arguments of the backend store, in JSON",
+    )
+    parser.add_argument(
+        "--compressor",
+        type=str,
+        default=None,
+        help='compression codec, "zstd", "lz4" or "zlib", if the cache is compressed',
+    )
+    parser.add_argument("--num-workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--rank", type=int, default=None)
+    parser.add_argument("--world-size", type=int, default=None)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    module_name, fn_name = args.dataset.split(":")
+    dataset = getattr(importlib.import_module(module_name), fn_name)()
+
+    kwargs = dict(args.store_kwargs)
+    if args.compressor is not None:
+        from .utils.compressor import Compressor
+
+        kwargs["compressor"] = Compressor(args.compressor)
+
+    cached_dataset = CachedDataset(
+        dataset, backend=args.backend, dataset_name=args.dataset_name, **kwargs
+    )
+    ret = warm_up(
+        cached_dataset,
+        num_workers=args.num_workers,
+        batch_size=args.batch_size,
+        rank=args.rank,
+        world_size=args.world_size,
+    )
+    cached_dataset.cache_loader.flush()
+    logging.info(
+        "Cache warmed up, {} samples loaded, {} samples skipped".format(
+            ret["loaded"], ret["skipped"]
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
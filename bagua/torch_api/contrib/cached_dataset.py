@@ -1,4 +1,5 @@
 from torch.utils.data.dataset import Dataset
+from typing import List
 from .cache_loader import CacheLoader
 
 __all__ = ["CachedDataset"]
@@ -11,6 +12,8 @@ class CachedDataset(Dataset):
         backend: str = "redis",
         dataset_name: str = "",
         writer_buffer_size: int = 20,
+        local_cache_capacity: int = 0,
+        reader_buffer_size: int = 100,
         **kwargs,
     ):
         """
@@ -25,10 +28,14 @@ class CachedDataset(Dataset):
 
         Args:
             dataset: PyTorch dataset to be wrapped.
-            backend(str): Backend distributed key-value store implementation. Can be ``"redis"``.
+            backend(str): Backend distributed key-value store implementation. Can be ``"redis"``, ``"shm"`` or ``"disk"``.
             dataset_name(str): Name of the dataset. Default ``""``.
             writer_buffer_size(int): Number of samples to collect before writing to the backend key-value store.
                 Useful for improving the backend throughput.
+            local_cache_capacity(int): Maximum memory in bytes of the in-process local cache sitting in front of the
+                backend key-value store. Default ``0``, which disables the local cache.
+            reader_buffer_size(int): Maximum number of samples to retrieve from the backend key-value store in a
+                single request when fetching a batch of samples. Default ``100``.
 
         Example::
 
@@ -37,8 +44,18 @@ class CachedDataset(Dataset):
             >>> dataloader = torch.utils.data.DataLoader(cached_dataset)
 
         .. note::
-            Cached dataset is a special case of cache loader. Parameter :attr:`backend` and :attr:`writer_buffer_size` in
-            initializing a cached dataset have the same meanings as those in initializing a cache loader. You can
+            When used with a `DataLoader <https://pytorch.org/docs/stable/data.html?highlight=dataloader#torch.utils.data.DataLoader>`_
+            with automatic batching (PyTorch 2.0 or above), the indices of each batch produced by the sampler are
+            retrieved from the backend key-value store together via :meth:`__getitems__`, in requests of at most
+            :attr:`reader_buffer_size` samples, instead of one request per sample.
+
+        .. note::
+            The first epoch runs at the speed of loading samples from :attr:`dataset`. Use
+            :func:`~bagua.torch_api.contrib.cache_warmup.warm_up` to fill the cache in parallel before training.
+
+        .. note::
+            Cached dataset is a special case of cache loader. Parameter :attr:`backend`, :attr:`writer_buffer_size`,
+            :attr:`local_cache_capacity` and :attr:`reader_buffer_size` in initializing a cached dataset have the same meanings as those in initializing a cache loader. You can
             provide the arguments for cache loader here in ``**kwargs``. See also :class:`~bagua.torch_api.contrib.cache_loader.CacheLoader`.
 
         """
@@ -49,6 +66,8 @@ class CachedDataset(Dataset):
             backend,
             dataset_name,
             writer_buffer_size,
+            local_cache_capacity,
+            reader_buffer_size,
             **kwargs,
         )
         """
@@ -58,5 +77,16 @@ class CachedDataset(Dataset):
     def __getitem__(self, item):
         return self.cache_loader.get(item, lambda x: self.dataset[x])
 
+    def __getitems__(self, items: List[int]) -> List:
+        self.prefetch(items)
+        return [self[item] for item in items]
+
+    def prefetch(self, items: List[int]):
+        """
+        Retrieves the samples with indices :attr:`items` from the backend key-value store in batches, so that
+        accessing them afterwards does not need a request to the backend store per sample.
+        """
+        self.cache_loader.prefetch(items)
+
     def __len__(self):
         return len(self.dataset)
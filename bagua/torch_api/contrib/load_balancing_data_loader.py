@@ -1,13 +1,122 @@
+import logging
+import multiprocessing
+import os
+from collections import deque
+import numpy as np
 import torch
 import math
 import torch.distributed as dist
 from torch.utils.data.sampler import Sampler
 from torch.utils.data.dataset import Dataset
-from typing import Optional, Iterator, Callable
-from collections import OrderedDict
+from typing import Any, Dict, Optional, Iterator, Callable, List, Tuple
 
 __all__ = ["LoadBalancingDistributedSampler", "LoadBalancingDistributedBatchSampler"]
 
+# dataset and complexity function inherited by forked workers computing complexities
+_complexity_task = None
+
+
+def _compute_complexity_range(item_range: Tuple[int, int]) -> np.ndarray:
+    dataset, complexity_fn = _complexity_task
+    return np.asarray([complexity_fn(dataset[i]) for i in range(*item_range)])
+
+
+def _compute_complexities(
+    dataset: Dataset, complexity_fn: Callable[..., int], num_workers: int
+) -> np.ndarray:
+    global _complexity_task
+
+    dataset_len = len(dataset)  # type: ignore
+
+    # split among ranks if possible, then among local worker processes
+    rank, world_size = 0, 1
+    if num_workers > 0 and dist.is_available() and dist.is_initialized():
+        rank, world_size = dist.get_rank(), dist.get_world_size()
+
+    start = dataset_len * rank // world_size
+    end = dataset_len * (rank + 1) // world_size
+
+    _complexity_task = (dataset, complexity_fn)
+    try:
+        if num_workers > 0:
+            ranges = [
+                (
+                    start + (end - start) * i // num_workers,
+                    start + (end - start) * (i + 1) // num_workers,
+                )
+                for i in range(num_workers)
+            ]
+            with multiprocessing.get_context("fork").Pool(num_workers) as pool:
+                parts = pool.map(_compute_complexity_range, ranges)
+            complexities = np.concatenate(parts)
+        else:
+            complexities = _compute_complexity_range((start, end))
+    finally:
+        _complexity_task = None
+
+    if world_size > 1:
+        parts = [None] * world_size
+        dist.all_gather_object(parts, complexities)
+        complexities = np.concatenate(parts)
+
+    return complexities
+
+
+def _load_complexities(
+    path: str,
+    dataset: Dataset,
+    complexity_fn: Callable[..., int],
+    num_workers: int,
+) -> np.ndarray:
+    dataset_len = len(dataset)  # type: ignore
+    distributed = dist.is_available() and dist.is_initialized()
+    rank = dist.get_rank() if distributed else 0
+
+    # rank 0 validates the index and sends its shape and dtype to the other ranks, so that all ranks agree on
+    # whether to compute the complexities, which takes collectives
+    meta = [None]  # type: List[Optional[Tuple[Tuple[int, ...], str]]]
+    if rank == 0 and os.path.exists(path):
+        complexities = np.load(path, mmap_mode="r")
+        if len(complexities) == dataset_len:
+            meta[0] = (complexities.shape, complexities.dtype.str)
+        else:
+            logging.warning(
+                "Complexity index {} has {} items while the dataset has {}, rebuilding it".format(
+                    path, len(complexities), dataset_len
+                )
+            )
+    if distributed:
+        dist.broadcast_object_list(meta, src=0)
+
+    if meta[0] is not None:
+        # each rank maps the index itself, rank 0 only sends it to the ranks which cannot see the same file
+        loaded = None
+        if os.path.exists(path):
+            complexities = np.load(path, mmap_mode="r")
+            if (complexities.shape, complexities.dtype.str) == meta[0]:
+                loaded = complexities
+        if distributed:
+            visible = [None] * dist.get_world_size()
+            dist.all_gather_object(visible, loaded is not None)
+            if not all(visible):
+                sent = [np.asarray(loaded) if rank == 0 else None]
+                dist.broadcast_object_list(sent, src=0)
+                if loaded is None:
+                    loaded = sent[0]
+        return loaded
+
+    complexities = _compute_complexities(dataset, complexity_fn, num_workers)
+
+    if rank == 0:
+        # write to a temporary file first so that readers never see a partial index
+        tmp_path = "{}.{}.tmp.npy".format(path, os.getpid())
+        np.save(tmp_path, complexities)
+        os.replace(tmp_path, path)
+    if distributed:
+        dist.barrier()
+
+    return complexities
+
 
 class LoadBalancingDistributedSampler(Sampler):
     r"""Sampler that restricts data loading to a subset of the dataset.
@@ -45,6 +154,22 @@ class LoadBalancingDistributedSampler(Sampler):
             the data evenly divisible across the replicas. Default: ``False``.
         random_level (float, optional): A float varies from 0 and 1 that controls the extent
             of load balance. 0 means the best load balance, while 1 means the opposite.
+        complexity_index_path (str, optional): Path of a ``.npy`` file caching the complexities of all samples,
+            e.g. next to the dataset. If the file exists and has an entry per sample, the complexities are memory-mapped
+            from it instead of calling :attr:`complexity_fn` on each sample. Otherwise the complexities are
+            computed and saved to it. Only rank 0 validates and writes the file if the default process group is
+            initialized. Every rank memory-maps the file if it is on storage shared by all ranks, otherwise rank 0
+            sends the complexities to the other ranks. Delete the file if the dataset or :attr:`complexity_fn`
+            changes.
+        num_workers (int, optional): If positive, number of worker processes calling :attr:`complexity_fn` in
+            parallel. The samples are then also split among all ranks if the default process group is initialized,
+            and their complexities gathered afterwards, so all ranks should create the sampler at the same time.
+            Default: ``0``, which calls :attr:`complexity_fn` on every sample in the current process.
+        cost_feedback (bool, optional): If ``True``, the compute time of mini-batches reported with
+            :meth:`record_batch_time` is used to fit a model of the cost of a sample as a function of its
+            complexity, :math:`w_0 + w_1 c + w_2 c^2` with non-negative weights. Samples are then balanced on their
+            predicted costs from the next :meth:`set_epoch` on, which then gathers the reports of all ranks and
+            should be called on all of them. Default: ``False``.
 
     .. warning::
         In distributed mode, calling the :meth:`set_epoch` method at
@@ -73,6 +198,15 @@ class LoadBalancingDistributedSampler(Sampler):
         ...     if is_distributed:
         ...         sampler.set_epoch(epoch)
         ...     train(loader)
+
+        To balance samples on their measured costs with :attr:`cost_feedback=True`, report the compute time of
+        each mini-batch, here with a dataset returning the index of each sample along with it:
+
+        >>> for indices, inputs in loader:
+        ...     start = time.time()
+        ...     model(inputs).backward()
+        ...     torch.cuda.synchronize()
+        ...     sampler.record_batch_time(indices.tolist(), time.time() - start)
     """
 
     def __init__(
@@ -85,6 +219,9 @@ class LoadBalancingDistributedSampler(Sampler):
         seed: int = 0,
         drop_last: bool = False,
         random_level: float = 0,
+        complexity_index_path: Optional[str] = None,
+        num_workers: int = 0,
+        cost_feedback: bool = False,
     ) -> None:
         if num_replicas is None:
             if not dist.is_available():
@@ -124,17 +261,18 @@ class LoadBalancingDistributedSampler(Sampler):
         self.shuffle = shuffle
         self.seed = seed
 
-        self.item_complexity_map = dict()
-        for item_index in range(dataset_len):
-            self.item_complexity_map[item_index] = complexity_fn(
-                self.dataset[item_index]
+        if complexity_index_path is not None:
+            self.item_complexities = _load_complexities(
+                complexity_index_path, self.dataset, complexity_fn, num_workers
             )
-
-        self.ordered_item_complexity_map = OrderedDict(
-            sorted(self.item_complexity_map.items(), key=lambda t: t[1])
-        )
-        max_complexity = max(self.item_complexity_map.values())
-        min_complexity = min(self.item_complexity_map.values())
+        else:
+            self.item_complexities = _compute_complexities(
+                self.dataset, complexity_fn, num_workers
+            )
+        # a stable sort, so that items of equal complexity are ordered by their indices
+        self.sorted_indices = np.argsort(self.item_complexities, kind="stable")
+        max_complexity = self.item_complexities.max()
+        min_complexity = self.item_complexities.min()
 
         if random_level < 0.0 or random_level > 1.0:
             raise ValueError(
@@ -144,79 +282,127 @@ class LoadBalancingDistributedSampler(Sampler):
             )
 
         self.random_number = int((max_complexity - min_complexity) * random_level + 1)
+        self.random_level = random_level
+
+        self.cost_feedback = cost_feedback
+        # features `(num_samples, sum of complexities, sum of squared complexities)` and compute time
+        # of the last reported mini-batches
+        self.cost_observations = deque(maxlen=10000)
+        self.cost_coefficients = None  # type: Optional[np.ndarray]
+        self.item_costs = None  # type: Optional[np.ndarray]
+
+        # number of indices yielded in the current epoch, where the next iteration starts, and where the current
+        # epoch was resumed from
+        self.consumed = 0
+        self.resume_offset = 0
+        self.epoch_start = 0
+
+    def shuffle_chunks(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the indices sorted by complexity in chunks of :attr:`num_replicas` items, as an array of shape
+        ``(num_chunks, num_replicas)``, and the array of the chunks to iterate over, in order. The
+        :attr:`rank`-th item of each of these chunks are the indices sampled by the :attr:`rank`-th replica.
+        """
 
-    def shuffle_chunks(self):
-        def chunks_wrap_padding(lst, n):
-            """Yield successive n-sized chunks from lst."""
-            num_chunks = max(1, self.num_samples)
-            num_elements = num_chunks * n
-            current_lst = []
-            for i in range(num_elements):
-                current_lst.append(lst[i % len(lst)])
-                if len(current_lst) == n:
-                    yield current_lst
-                    current_lst = []
+        # `num_samples` chunks of `num_replicas` items, wrapping around to the first items if
+        # there are not enough
+        num_chunks = max(1, self.num_samples)
 
         if self.shuffle:
             # deterministically shuffle based on epoch and seed
             g = torch.Generator()
             g.manual_seed(self.seed + self.epoch)
 
-            if self.random_number > 0:
-                item_complexity_map = self.item_complexity_map.copy()
+            if self.item_costs is not None:
+                cost_range = self.item_costs.max() - self.item_costs.min()
+                cost_random_floats = torch.rand(
+                    len(self.item_costs), generator=g, dtype=torch.float64
+                ).numpy()
+                sorted_indices = np.argsort(
+                    self.item_costs
+                    + cost_random_floats * cost_range * self.random_level,
+                    kind="stable",
+                )
+            elif self.random_number > 0:
                 complexity_random_ints = torch.randint(
-                    self.random_number, (len(item_complexity_map),), generator=g
-                ).tolist()
-
-                for k, v in zip(item_complexity_map, complexity_random_ints):
-                    item_complexity_map[k] += v
-
-                ordered_item_complexity_map = OrderedDict(
-                    sorted(item_complexity_map.items(), key=lambda t: t[1])
+                    self.random_number, (len(self.item_complexities),), generator=g
+                ).numpy()
+                sorted_indices = np.argsort(
+                    self.item_complexities + complexity_random_ints, kind="stable"
                 )
             else:
-                ordered_item_complexity_map = self.ordered_item_complexity_map
-
-            index_chunks = list(
-                chunks_wrap_padding(
-                    list(ordered_item_complexity_map.keys()), self.num_replicas
-                )
-            )
+                sorted_indices = self.sorted_indices
 
-            chunk_indices = torch.randperm(len(index_chunks), generator=g).tolist()  # type: ignore
+            chunk_indices = torch.randperm(num_chunks, generator=g).numpy()
         else:
-            index_chunks = list(
-                chunks_wrap_padding(
-                    list(self.ordered_item_complexity_map.keys()), self.num_replicas
-                )
-            )
-            chunk_indices = list(range(len(index_chunks)))  # type: ignore
+            sorted_indices = self.sorted_indices
+            chunk_indices = np.arange(num_chunks)
 
-        if not self.drop_last:
-            # add extra samples to make it evenly divisible
-            padding_size = self.num_samples - len(chunk_indices)
-            if padding_size <= len(chunk_indices):
-                chunk_indices += chunk_indices[:padding_size]
-            else:
-                chunk_indices += (
-                    chunk_indices * math.ceil(padding_size / len(chunk_indices))
-                )[:padding_size]
-        else:
-            # remove tail of data to make it evenly divisible.
-            chunk_indices = chunk_indices[: self.num_samples]
-        assert len(chunk_indices) == self.num_samples
+        index_chunks = np.resize(sorted_indices, (num_chunks, self.num_replicas))
+
+        # repeat the chunks to make it evenly divisible, or remove the tail of them
+        chunk_indices = np.resize(chunk_indices, self.num_samples)
         return index_chunks, chunk_indices
 
     def __iter__(self) -> Iterator:
         index_chunks, chunk_indices = self.shuffle_chunks()
-        # subsample
-        indices = [index_chunks[i][self.rank] for i in chunk_indices]
-        assert len(indices) == self.num_samples
+        # subsample, skipping indices consumed before resuming
+        start, self.resume_offset = self.resume_offset, 0
+        self.epoch_start = start
+        indices = index_chunks[chunk_indices[start:], self.rank].tolist()
+        assert start + len(indices) == self.num_samples
+
+        return self._count_consumed(indices, start)
 
-        return iter(indices)
+    def _count_consumed(self, indices: List[int], start: int) -> Iterator:
+        self.consumed = start
+        for index in indices:
+            self.consumed += 1
+            yield index
 
     def __len__(self) -> int:
-        return self.num_samples
+        return self.num_samples - self.epoch_start
+
+    def state_dict(self) -> Dict[str, Any]:
+        r"""
+        Returns the state of the sampler, from which :meth:`load_state_dict` resumes sampling in the middle
+        of an epoch.
+
+        The state holds the epoch, the seed, the number of indices consumed in the epoch, and the
+        cost model fitted with :attr:`cost_feedback`.
+
+        .. note::
+            The number of consumed indices counts the indices yielded by the sampler, including those of mini-batches
+            prefetched by a DataLoader but not trained on yet. Set ``"consumed"`` to the number of indices trained on
+            in the epoch to resume exactly after them.
+        """
+        return {
+            "epoch": self.epoch,
+            "seed": self.seed,
+            "consumed": self.consumed,
+            "cost_coefficients": (
+                self.cost_coefficients.tolist()
+                if self.cost_coefficients is not None
+                else None
+            ),
+        }
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        r"""
+        Restores the state returned by :meth:`state_dict`, so that the next iteration starts right after the
+        consumed indices of the saved epoch, without generating the skipped indices.
+
+        Args:
+            state_dict (dict): The sampler state.
+        """
+        self.epoch = state_dict["epoch"]
+        self.seed = state_dict["seed"]
+        self.consumed = state_dict["consumed"]
+        self.resume_offset = state_dict["consumed"]
+        self.epoch_start = state_dict["consumed"]
+
+        if state_dict.get("cost_coefficients") is not None:
+            self._set_cost_coefficients(np.asarray(state_dict["cost_coefficients"]))
 
     def set_epoch(self, epoch: int) -> None:
         r"""
@@ -227,23 +413,93 @@ class LoadBalancingDistributedSampler(Sampler):
         Args:
             epoch (int): Epoch number.
         """
+        # do not start over, nor change the order of samples, when resuming the epoch of a loaded state
+        resuming = self.resume_offset > 0 and epoch == self.epoch
+        if not resuming:
+            self.resume_offset = 0
+            self.epoch_start = 0
+
         self.epoch = epoch
 
+        if self.cost_feedback and not resuming:
+            self.fit_cost_model()
+
+    def record_batch_time(self, indices: List[int], seconds: float) -> None:
+        r"""
+        Reports the measured compute time of a mini-batch, if :attr:`cost_feedback=True`.
+
+        Args:
+            indices (List[int]): Indices of the samples in the mini-batch.
+            seconds (float): Time in seconds of the forward and backward pass of the mini-batch, excluding the
+                time waiting for other ranks.
+        """
+        if not self.cost_feedback or len(indices) == 0:
+            return
+
+        c = np.asarray(self.item_complexities[indices], dtype=np.float64)
+        self.cost_observations.append((len(c), c.sum(), (c * c).sum(), seconds))
+
+    def fit_cost_model(self) -> None:
+        r"""
+        Fits the cost model on the mini-batch compute times reported by all ranks so far, and balances the samples
+        on their predicted costs. Called by :meth:`set_epoch` if :attr:`cost_feedback=True`.
+        """
+        observations = [np.asarray(self.cost_observations, dtype=np.float64)]
+        if dist.is_available() and dist.is_initialized():
+            observations = [None] * dist.get_world_size()
+            dist.all_gather_object(observations, list(self.cost_observations))
+            observations = [np.asarray(o, dtype=np.float64) for o in observations]
+
+        observations = [o for o in observations if len(o) > 0]
+        if sum(len(o) for o in observations) < 10:
+            # too few to fit the model
+            return
+
+        from scipy.optimize import nnls
+
+        observations = np.concatenate(observations)
+        features, seconds = observations[:, :3], observations[:, 3]
+        # normalize the features, whose magnitudes differ by orders
+        scales = np.maximum(features.max(axis=0), 1e-12)
+        weights, _ = nnls(features / scales, seconds)
+        weights = weights / scales
+
+        if np.any(weights > 0):
+            self._set_cost_coefficients(weights)
+
+    def _set_cost_coefficients(self, weights: np.ndarray) -> None:
+        c = np.asarray(self.item_complexities, dtype=np.float64)
+        self.cost_coefficients = weights
+        self.item_costs = weights[0] + weights[1] * c + weights[2] * c * c
+        self.sorted_indices = np.argsort(self.item_costs, kind="stable")
+
 
 class LoadBalancingDistributedBatchSampler(Sampler):
     r"""Wraps another load balance sampler to yield variable sized mini-batches.
 
     Args:
         sampler (LoadBalancingDistributedSampler): Load balance sampler.
-        batch_fn (Callable): Callable to yield mini-batch indices.
+        batch_fn (Callable, optional): Callable to yield mini-batch indices. Either :attr:`batch_fn` or
+            :attr:`max_tokens` should be set.
         drop_last (bool): If ``True``, the sampler will drop the last few batches exceeding
             the least number of batches among replicas, otherwise, the number of batches
             on each replica will be padded to the same.
+        max_tokens (int, optional): If set, samples are packed into mini-batches whose cost is at most
+            :attr:`max_tokens`, where the complexity of a sample is taken as its number of tokens. A sample
+            exceeding the budget on its own gets a mini-batch of its own.
+        padded (bool): If ``True``, the cost of a mini-batch is its size times the largest complexity in it, i.e.
+            the number of tokens after padding all samples to the longest one. Otherwise, it is the sum of the
+            complexities in it. Only used with :attr:`max_tokens`. Default: ``True``.
 
     :attr:`batch_fn` will have the signature of::
 
         def batch_fn(indices: List[int]) -> List[List[int]]
 
+    With :attr:`max_tokens`, samples of similar complexity are packed together, in decreasing order of
+    complexity, and the mini-batches are shuffled if the sampler shuffles. The :math:`k`-th mini-batch of every
+    replica holds the same number of samples of about the same complexities, so that the number of mini-batches
+    is the same on all replicas and each step takes about the same time on all of them.
+
 
     Example::
         >>> from bagua.torch_api.contrib import LoadBalancingDistributedSampler, \
@@ -257,13 +513,21 @@ class LoadBalancingDistributedBatchSampler(Sampler):
         ...     batch_sampler.set_epoch(epoch)
         ...     train(loader)
 
+        To pack samples into mini-batches of at most 4096 tokens including padding, with the number of
+        tokens of each sample as its complexity:
+
+        >>> sampler = LoadBalancingDistributedSampler(dataset, complexity_fn=lambda x: len(x["input_ids"]))
+        >>> batch_sampler = LoadBalancingDistributedBatchSampler(sampler, max_tokens=4096)
+
     """
 
     def __init__(
         self,
         sampler: LoadBalancingDistributedSampler,
-        batch_fn,
+        batch_fn=None,
         drop_last: bool = False,
+        max_tokens: Optional[int] = None,
+        padded: bool = True,
     ) -> None:
         if not isinstance(sampler, LoadBalancingDistributedSampler):
             raise ValueError(
@@ -273,22 +537,82 @@ class LoadBalancingDistributedBatchSampler(Sampler):
         if sampler.drop_last:
             raise ValueError("drop_last of sampler should be False")
 
+        if (batch_fn is None) == (max_tokens is None):
+            raise ValueError("Exactly one of batch_fn and max_tokens should be set.")
+
         self.sampler = sampler
         self.batch_fn = batch_fn
         self.drop_last = drop_last
+        self.max_tokens = max_tokens
+        self.padded = padded
 
         self.num_replicas = self.sampler.num_replicas
         self.rank = self.sampler.rank
 
+        # number of mini-batches yielded in the current epoch, where the next iteration starts, and where the
+        # current epoch was resumed from
+        self.consumed = 0
+        self.resume_offset = 0
+        self.epoch_start = 0
+
         self.generate_batches()
 
-    def generate_batches(self):
+    def _pack_chunks(self, chunk_costs: np.ndarray) -> List[np.ndarray]:
+        """
+        Packs chunks into mini-batches whose cost is at most :attr:`max_tokens`, in decreasing order of
+        :attr:`chunk_costs`, and returns the positions of the chunks in each mini-batch.
+        """
+
+        order = np.argsort(-chunk_costs, kind="stable")
+        costs = chunk_costs[order].tolist()
+
+        bounds = [0]
+        batch_cost = 0
+        for i, cost in enumerate(costs):
+            size = i - bounds[-1]
+            # in decreasing order, the first cost of a mini-batch is its largest one
+            new_cost = (
+                (size + 1) * costs[bounds[-1]] if self.padded else batch_cost + cost
+            )
+            if size > 0 and new_cost > self.max_tokens:
+                bounds.append(i)
+                new_cost = cost
+            batch_cost = new_cost
+        bounds.append(len(costs))
+
+        return [order[bounds[i] : bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+    def _generate_token_budget_batches(self) -> List[List[List[int]]]:
         index_chunks, chunk_indices = self.sampler.shuffle_chunks()
 
-        batches = []
-        for rank in range(self.num_replicas):
-            sub_indices = [index_chunks[i][rank] for i in chunk_indices]
-            batches.append(self.batch_fn(sub_indices))
+        # each chunk holds samples of about the same complexity, one for each replica, pack whole chunks
+        # so that the mini-batches are balanced across replicas
+        sampled_chunks = index_chunks[chunk_indices]
+        chunk_costs = self.sampler.item_complexities[sampled_chunks].max(axis=1)
+        packed = self._pack_chunks(np.asarray(chunk_costs))
+
+        if self.sampler.shuffle:
+            g = torch.Generator()
+            g.manual_seed(self.sampler.seed + self.sampler.epoch)
+            packed = [
+                packed[i] for i in torch.randperm(len(packed), generator=g).tolist()
+            ]
+
+        return [
+            [sampled_chunks[positions, rank].tolist() for positions in packed]
+            for rank in range(self.num_replicas)
+        ]
+
+    def generate_batches(self):
+        if self.max_tokens is not None:
+            batches = self._generate_token_budget_batches()
+        else:
+            index_chunks, chunk_indices = self.sampler.shuffle_chunks()
+
+            batches = []
+            for rank in range(self.num_replicas):
+                sub_indices = index_chunks[chunk_indices, rank].tolist()
+                batches.append(self.batch_fn(sub_indices))
 
         self.total_batch = (
             max([len(b) for b in batches])
@@ -306,10 +630,42 @@ class LoadBalancingDistributedBatchSampler(Sampler):
         ]
 
     def __iter__(self):
-        return iter(self.padded_batches[self.rank])
+        start, self.resume_offset = self.resume_offset, 0
+        self.epoch_start = start
+        return self._count_consumed(self.padded_batches[self.rank][start:], start)
+
+    def _count_consumed(self, batches: List[List[int]], start: int) -> Iterator:
+        self.consumed = start
+        for batch in batches:
+            self.consumed += 1
+            yield batch
 
     def __len__(self):
-        return self.total_batch
+        return self.total_batch - self.epoch_start
+
+    def state_dict(self) -> Dict[str, Any]:
+        r"""
+        Returns the state of the sampler, from which :meth:`load_state_dict` resumes sampling in the middle
+        of an epoch. It is the state of the wrapped sampler, see
+        :meth:`LoadBalancingDistributedSampler.state_dict`, with ``"consumed"`` counting mini-batches.
+        """
+        state = self.sampler.state_dict()
+        state["consumed"] = self.consumed
+        return state
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        r"""
+        Restores the state returned by :meth:`state_dict`, so that the next iteration starts right after the
+        consumed mini-batches of the saved epoch.
+
+        Args:
+            state_dict (dict): The sampler state.
+        """
+        self.sampler.load_state_dict(dict(state_dict, consumed=0))
+        self.generate_batches()
+        self.consumed = state_dict["consumed"]
+        self.resume_offset = state_dict["consumed"]
+        self.epoch_start = state_dict["consumed"]
 
     def set_epoch(self, epoch: int) -> None:
         r"""
@@ -320,5 +676,11 @@ class LoadBalancingDistributedBatchSampler(Sampler):
         Args:
             epoch (int): Epoch number.
         """
+        if self.resume_offset > 0 and epoch == self.sampler.epoch:
+            # resuming the epoch of a loaded state, the mini-batches are already generated
+            return
+
+        self.resume_offset = 0
+        self.epoch_start = 0
         self.sampler.set_epoch(epoch)
         self.generate_batches()
@@ -0,0 +1,229 @@
+import heapq
+import itertools
+import random
+import numpy as np
+import torch
+import torch.distributed as dist
+from torch.utils.data.dataset import IterableDataset
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+__all__ = ["LoadBalancingDistributedIterableDataset"]
+
+
+def _assign(shards: List[int], weights: np.ndarray, num_bins: int) -> List[List[int]]:
+    # assign each shard in the given order to the bin with the least total weight so far
+    heap = [(0, 0, b) for b in range(num_bins)]
+    assigned = [[] for _ in range(num_bins)]  # type: List[List[int]]
+    for shard in shards:
+        weight, num_shards, b = heapq.heappop(heap)
+        assigned[b].append(shard)
+        heapq.heappush(heap, (weight + weights[shard], num_shards + 1, b))
+    return assigned
+
+
+class LoadBalancingDistributedIterableDataset(IterableDataset):
+    r"""An iterable dataset streaming samples from shards, which are assigned to the processes of distributed
+    training such that each process gets a similar total computational complexity.
+
+    This is the streaming counterpart of :class:`~bagua.torch_api.contrib.LoadBalancingDistributedSampler`, for
+    datasets stored as many shard files which are too large to be indexed sample by sample. Shards are balanced
+    by their complexities, e.g. the total number of tokens in each shard, known from metadata without reading them.
+
+    Each process streams the samples of its shards, in a random order of shards, through a shuffle buffer of
+    bounded size. All processes yield the same number of samples, so that they run the same number of steps.
+
+    Args:
+        shards (List): Shards of the dataset, e.g. paths of the shard files.
+        read_fn (Callable): A function taking a shard and returning an iterator over its samples.
+        shard_complexities (List): Computational complexity of each shard, e.g. its total number of tokens.
+        shard_num_samples (List[int]): Number of samples in each shard.
+        num_replicas (int, optional): Number of processes participating in
+            distributed training. By default, :attr:`world_size` is retrieved from the
+            current distributed group.
+        rank (int, optional): Rank of the current process within :attr:`num_replicas`.
+            By default, :attr:`rank` is retrieved from the current distributed
+            group.
+        shuffle (bool, optional): If ``True`` (default), the shards and the samples are shuffled.
+        seed (int, optional): Random seed used to shuffle if :attr:`shuffle=True`. This number should be identical
+            across all processes in the distributed group. Default: ``0``.
+        drop_last (bool, optional): If ``True``, each process yields as many samples as the process with the fewest
+            samples in its shards, dropping the rest. Otherwise, each process yields as many samples as the process
+            with the most samples, streaming its shards again from the beginning to catch up. Default: ``False``.
+        shuffle_buffer_size (int, optional): Number of samples held in the shuffle buffer of each DataLoader worker
+            if :attr:`shuffle=True`. Default: ``1000``.
+
+    .. note::
+        The samples of each process are split among its DataLoader workers in consecutive ranges of the same
+        size. A worker skips the samples before its range in the first shard it reads.
+
+    .. warning::
+        Calling the :meth:`set_epoch` method at the beginning of each epoch **before** creating the DataLoader
+        iterator is necessary to shuffle differently across epochs.
+
+    Example::
+
+        >>> dataset = LoadBalancingDistributedIterableDataset(
+        ...     shards=["part-00000.jsonl", "part-00001.jsonl", ...],
+        ...     read_fn=lambda path: map(json.loads, open(path)),
+        ...     shard_complexities=[12000560, 11843021, ...],
+        ...     shard_num_samples=[10000, 10000, ...],
+        ... )
+        >>> loader = torch.utils.data.DataLoader(dataset, batch_size=32, num_workers=4)
+        >>>
+        >>> for epoch in range(start_epoch, n_epochs):
+        ...     dataset.set_epoch(epoch)
+        ...     train(loader)
+    """
+
+    def __init__(
+        self,
+        shards: Sequence[Any],
+        read_fn: Callable[[Any], Iterator],
+        shard_complexities: Sequence[float],
+        shard_num_samples: Sequence[int],
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+        shuffle: bool = True,
+        seed: int = 0,
+        drop_last: bool = False,
+        shuffle_buffer_size: int = 1000,
+    ) -> None:
+        if num_replicas is None:
+            if not dist.is_available():
+                raise RuntimeError("Requires distributed package to be available")
+            num_replicas = dist.get_world_size()
+        if rank is None:
+            if not dist.is_available():
+                raise RuntimeError("Requires distributed package to be available")
+            rank = dist.get_rank()
+        if rank >= num_replicas or rank < 0:
+            raise ValueError(
+                "Invalid rank {}, rank should be in the interval"
+                " [0, {}]".format(rank, num_replicas - 1)
+            )
+        if not len(shards) == len(shard_complexities) == len(shard_num_samples):
+            raise ValueError(
+                "shards, shard_complexities and shard_num_samples should be of the same length"
+            )
+        if len(shards) < num_replicas:
+            raise ValueError(
+                "Number of shards {} should be at least the number of replicas {}".format(
+                    len(shards), num_replicas
+                )
+            )
+
+        self.shards = list(shards)
+        self.read_fn = read_fn
+        self.shard_complexities = np.asarray(shard_complexities)
+        self.shard_num_samples = np.asarray(shard_num_samples, dtype=np.int64)
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self.epoch = 0
+
+        self.assign_shards()
+
+    def assign_shards(self) -> None:
+        """
+        Assigns the shards to processes, each shard in decreasing order of complexity to the process with the
+        least total complexity so far. Called on :meth:`set_epoch`.
+        """
+
+        order = np.arange(len(self.shards))
+        if self.shuffle:
+            # break ties between shards of equal complexity differently in each epoch
+            g = torch.Generator()
+            g.manual_seed(self.seed + self.epoch)
+            order = torch.randperm(len(self.shards), generator=g).numpy()
+        order = order[np.argsort(-self.shard_complexities[order], kind="stable")]
+
+        self.assigned_shards = _assign(
+            order.tolist(), self.shard_complexities, self.num_replicas
+        )
+        rank_num_samples = [
+            int(self.shard_num_samples[s].sum()) for s in self.assigned_shards
+        ]
+        self.num_samples = (
+            min(rank_num_samples) if self.drop_last else max(rank_num_samples)
+        )
+
+    def _worker_shards_and_range(self):
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id, num_workers = (
+            (worker_info.id, worker_info.num_workers)
+            if worker_info is not None
+            else (0, 1)
+        )
+
+        shards = list(self.assigned_shards[self.rank])
+        if self.shuffle:
+            random.Random(self.seed + self.epoch + self.rank).shuffle(shards)
+
+        # all workers yield the same number of samples, taken from consecutive ranges of the samples of the shards
+        quota, remainder = divmod(self.num_samples, num_workers)
+        start = worker_id * quota + min(worker_id, remainder)
+        stop = start + quota + (1 if worker_id < remainder else 0)
+        return shards, start, stop
+
+    def _stream(self, shards, start: int, stop: int) -> Iterator:
+        sizes = self.shard_num_samples[shards]
+        total = int(sizes.sum())
+        if total == 0:
+            return
+
+        # stream the shards again from the beginning past the last sample
+        ends = np.cumsum(sizes)
+        pos = start
+        while pos < stop:
+            k = int(np.searchsorted(ends, pos % total, side="right"))
+            skip = pos % total - int(ends[k] - sizes[k])
+            n = min(int(ends[k]) - pos % total, stop - pos)
+            yield from itertools.islice(
+                self.read_fn(self.shards[shards[k]]), skip, skip + n
+            )
+            pos += n
+
+    def __iter__(self) -> Iterator:
+        shards, start, stop = self._worker_shards_and_range()
+        samples = self._stream(shards, start, stop)
+        if not self.shuffle or self.shuffle_buffer_size <= 1:
+            return samples
+        return self._shuffle(samples)
+
+    def _shuffle(self, samples: Iterator) -> Iterator:
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id = worker_info.id if worker_info is not None else 0
+        rng = random.Random(
+            (self.seed + self.epoch) * 1_000_003 + self.rank * 1009 + worker_id
+        )
+
+        buffer = []
+        for sample in samples:
+            if len(buffer) < self.shuffle_buffer_size:
+                buffer.append(sample)
+                continue
+
+            i = rng.randrange(len(buffer))
+            buffer[i], sample = sample, buffer[i]
+            yield sample
+
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def __len__(self) -> int:
+        return self.num_samples
+
+    def set_epoch(self, epoch: int) -> None:
+        r"""
+        Sets the epoch for this dataset. When :attr:`shuffle=True`, this ensures all replicas
+        use a different random ordering for each epoch. Otherwise, the next iteration of this
+        dataset will yield the same ordering.
+
+        Args:
+            epoch (int): Epoch number.
+        """
+        self.epoch = epoch
+        self.assign_shards()
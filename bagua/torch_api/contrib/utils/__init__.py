@@ -1 +1,10 @@
-__all__ = ["redis_store", "store"]
+__all__ = [
+    "admission",
+    "cache_stats",
+    "compressor",
+    "disk_store",
+    "redis_store",
+    "serializer",
+    "shm_store",
+    "store",
+]
@@ -0,0 +1,202 @@
+import random
+import numpy as np
+from typing import Optional
+from .store import Store
+
+__all__ = ["AdmissionPolicy", "CostAwareAdmissionPolicy"]
+
+
+class AdmissionPolicy:
+    """
+    Base class for admission policies, which decide whether a value freshly loaded on a cache miss is worth
+    writing to the backend key-value store of a :class:`~bagua.torch_api.contrib.CacheLoader`.
+    """
+
+    def record_access(self, key: str):
+        """Records an access to :attr:`key`, whether it is a hit or a miss."""
+        pass
+
+    def admit(self, key: str, load_seconds: float, nbytes: int) -> bool:
+        """
+        Returns whether the value of :attr:`key`, which took :attr:`load_seconds` seconds to load and is
+        :attr:`nbytes` bytes large once serialized, should be written to the backend key-value store.
+        """
+        return True
+
+    def attach(self, store: Store):
+        """
+        Called by the :class:`~bagua.torch_api.contrib.CacheLoader` using the policy with its backend key-value
+        store, so that the policy can observe the store.
+        """
+        pass
+
+
+class _CountMinSketch:
+    """
+    A count-min sketch with 4 rows of counters saturating at 15, updated conservatively and halved
+    every :attr:`sample_size` increments, so that estimated frequencies favor recent accesses.
+    """
+
+    def __init__(self, num_counters: int, sample_size: int):
+        import xxhash
+
+        self.xxh128 = xxhash.xxh128_intdigest
+        self.width = 1 << max(1, (num_counters - 1).bit_length())
+        self.mask = self.width - 1
+        self.rows = [bytearray(self.width) for _ in range(4)]
+        self.sample_size = sample_size
+        self.num_increments = 0
+
+    def _indices(self, key: str):
+        h = self.xxh128(key.encode())
+        return [(h >> (32 * i)) & self.mask for i in range(4)]
+
+    def increment(self, key: str):
+        indices = self._indices(key)
+        counts = [row[i] for row, i in zip(self.rows, indices)]
+        m = min(counts)
+        if m >= 15:
+            return
+
+        for row, i, c in zip(self.rows, indices, counts):
+            if c == m:
+                row[i] = m + 1
+
+        self.num_increments += 1
+        if self.num_increments >= self.sample_size:
+            self._age()
+
+    def _age(self):
+        for row in self.rows:
+            counters = np.frombuffer(row, dtype=np.uint8)
+            counters >>= 1
+        self.num_increments //= 2
+
+    def estimate(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self.rows, self._indices(key)))
+
+
+class CostAwareAdmissionPolicy(AdmissionPolicy):
+    """
+    An admission policy favoring values which save the most loading time per byte of cache memory.
+
+    Access frequencies are estimated with a `TinyLFU <https://arxiv.org/abs/1512.00727>`_-style sketch, in which
+    frequencies decay over time. A value is scored by its estimated frequency times the time it took to load,
+    divided by its size. A freshly loaded value is admitted as long as the cache has room for it. Once the cache
+    is full, admitting it evicts another value, so it is only admitted if it scores higher than a victim, the
+    lowest scoring of :attr:`num_victim_samples` values sampled among those admitted so far.
+
+    Args:
+        capacity(int): Number of bytes the backend key-value store can hold.
+        num_counters(int): Number of counters in each row of the frequency sketch, which should be larger than
+            the number of distinct keys accessed. Default ``1048576``, taking 4MB of memory.
+        num_victim_samples(int): Number of admitted values a freshly loaded value is compared with once the
+            cache is full. Default ``5``.
+        probe_interval(int): Number of loaded values after which the occupancy of the backend key-value store
+            is probed again. Default ``1000``.
+
+    .. note::
+        The policy is kept per process, so each DataLoader worker makes its decisions based on the accesses
+        it has seen and the values it has admitted. When used by a :class:`~bagua.torch_api.contrib.CacheLoader`,
+        the occupancy of the cache is estimated from the number of keys in the backend key-value store, which
+        accounts for the values written by other processes and for the values evicted or expired. Otherwise,
+        it is the size of the values admitted by the current process and not evicted by a later admission.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        num_counters: int = 1_048_576,
+        num_victim_samples: int = 5,
+        probe_interval: int = 1000,
+    ):
+        assert capacity > 0, "capacity should be positive"
+        assert num_victim_samples > 0, "num_victim_samples should be positive"
+
+        self.capacity = capacity
+        self.num_victim_samples = num_victim_samples
+        self.probe_interval = probe_interval
+        self.sketch = _CountMinSketch(num_counters, sample_size=10 * num_counters)
+        self.store = None
+
+        # admitted values, kept in a list as well to sample victims in O(1)
+        self.max_residents = num_counters
+        self.residents = {}
+        self.resident_keys = []
+        self.resident_bytes = 0
+
+        self.used_bytes = 0
+        self.num_admitted = 0
+        self.admitted_bytes = 0
+        self.num_loads = 0
+        self._random = random.Random(0)
+
+    def attach(self, store: Store):
+        self.store = store
+
+    def record_access(self, key: str):
+        self.sketch.increment(key)
+
+    def _score(self, key: str, load_seconds: float, nbytes: int) -> float:
+        return self.sketch.estimate(key) * load_seconds / max(nbytes, 1)
+
+    def _add_resident(self, key: str, load_seconds: float, nbytes: int):
+        if key in self.residents:
+            self._remove_resident(key)
+        if len(self.resident_keys) >= self.max_residents:
+            self._remove_resident(self._random.choice(self.resident_keys))
+
+        self.residents[key] = (len(self.resident_keys), load_seconds, nbytes)
+        self.resident_keys.append(key)
+        self.resident_bytes += nbytes
+
+    def _remove_resident(self, key: str):
+        idx, _, nbytes = self.residents.pop(key)
+        last = self.resident_keys.pop()
+        if last != key:
+            self.resident_keys[idx] = last
+            self.residents[last] = (idx,) + self.residents[last][1:]
+        self.resident_bytes -= nbytes
+
+    def _probe(self, nbytes: int):
+        if self.store is None:
+            self.used_bytes = self.resident_bytes
+            return
+
+        # values in the store are assumed as large as those admitted so far on average
+        if self.num_admitted > 0:
+            nbytes = self.admitted_bytes // self.num_admitted
+        self.used_bytes = self.store.num_keys() * nbytes
+
+    def _find_victim(self) -> Optional[str]:
+        victim, victim_score = None, None
+        for _ in range(min(self.num_victim_samples, len(self.resident_keys))):
+            key = self._random.choice(self.resident_keys)
+            _, load_seconds, nbytes = self.residents[key]
+            score = self._score(key, load_seconds, nbytes)
+            if victim is None or score < victim_score:
+                victim, victim_score = key, score
+        return victim
+
+    def admit(self, key: str, load_seconds: float, nbytes: int) -> bool:
+        if self.num_loads % self.probe_interval == 0:
+            self._probe(nbytes)
+        self.num_loads += 1
+
+        if self.used_bytes + nbytes > self.capacity:
+            victim = self._find_victim()
+            if victim is not None:
+                _, victim_seconds, victim_nbytes = self.residents[victim]
+                if self._score(key, load_seconds, nbytes) <= self._score(
+                    victim, victim_seconds, victim_nbytes
+                ):
+                    return False
+
+                self._remove_resident(victim)
+                self.used_bytes -= victim_nbytes
+
+        self._add_resident(key, load_seconds, nbytes)
+        self.used_bytes += nbytes
+        self.num_admitted += 1
+        self.admitted_bytes += nbytes
+        return True
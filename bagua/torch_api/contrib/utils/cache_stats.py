@@ -0,0 +1,249 @@
+import bisect
+import threading
+from typing import Dict, List, Optional
+from .store import Store
+
+
+__all__ = ["CacheStats"]
+
+# upper bounds in seconds, from sub-millisecond shared memory reads to slow remote loads
+_LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class _Histogram:
+    def __init__(self, buckets=_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        # the last count is for values larger than all buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def cumulative_buckets(self) -> List:
+        ret, total = [], 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += count
+            ret.append((bound, total))
+        return ret
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative_buckets()),
+        }
+
+
+class CacheStats:
+    """
+    Statistics of a :class:`~bagua.torch_api.contrib.CacheLoader`, collected with a few counter increments per
+    access, so that they can be left on in production.
+
+    The statistics can be exported as a dict with :meth:`to_dict`, or in the Prometheus text exposition format
+    with :meth:`to_prometheus`. A :class:`CacheStats` is also a `prometheus_client <https://github.com/prometheus/client_python>`_
+    collector, and can be registered to a Prometheus registry with ``registry.register(stats)``.
+
+    Args:
+        store(Store, optional): The backend key-value store of the cache loader. If set, the number of keys in each
+            shard of the store is reported, which calls :meth:`~bagua.torch_api.contrib.utils.store.Store.num_keys`
+            on each shard on export.
+
+    .. note::
+        Statistics are kept per process. Each DataLoader worker collects statistics for the samples it loads,
+        which are not reflected in the statistics of the main process.
+    """
+
+    def __init__(self, store: Optional[Store] = None):
+        self.store = store
+        self._lock = threading.Lock()
+
+        self.load_seconds = _Histogram()
+        self.store_get_seconds = _Histogram()
+        self.store_mset_seconds = _Histogram()
+        self.reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Resets all statistics to zero."""
+
+        with self._lock:
+            self.local_hits = 0
+            self.hits = 0
+            self.misses = 0
+            self.rejections = 0
+            self.bytes_read = 0
+            self.bytes_written = 0
+            self.read_failures = 0
+            self.write_failures = 0
+
+            self.load_seconds.reset()
+            self.store_get_seconds.reset()
+            self.store_mset_seconds.reset()
+
+    # hits are only recorded by the thread calling `CacheLoader.get`, other counters may also be updated by
+    # the write-behind thread
+    def record_local_hit(self):
+        self.local_hits += 1
+
+    def record_hit(self):
+        self.hits += 1
+
+    def record_miss(self, load_seconds: float):
+        with self._lock:
+            self.misses += 1
+            self.load_seconds.observe(load_seconds)
+
+    def record_rejection(self):
+        self.rejections += 1
+
+    def record_get(self, seconds: float, nbytes: int):
+        with self._lock:
+            self.store_get_seconds.observe(seconds)
+            self.bytes_read += nbytes
+
+    def record_mset(self, seconds: float, nbytes: int):
+        with self._lock:
+            self.store_mset_seconds.observe(seconds)
+            self.bytes_written += nbytes
+
+    def record_read_failure(self):
+        with self._lock:
+            self.read_failures += 1
+
+    def record_write_failure(self):
+        with self._lock:
+            self.write_failures += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of accesses served from the local cache or the backend store, ``0`` if there is no access."""
+
+        total = self.local_hits + self.hits + self.misses
+        return (self.local_hits + self.hits) / total if total > 0 else 0.0
+
+    def shard_keys(self) -> List[int]:
+        """Returns the number of keys in each shard of the backend store, empty if :attr:`store` is not set."""
+
+        if self.store is None:
+            return []
+        return [s.num_keys() for s in getattr(self.store, "stores", [self.store])]
+
+    def to_dict(self) -> Dict:
+        """Returns the statistics as a dict. Histograms hold cumulative counts keyed by the bucket upper bounds."""
+
+        with self._lock:
+            ret = {
+                "local_hits": self.local_hits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hit_ratio,
+                "rejections": self.rejections,
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "read_failures": self.read_failures,
+                "write_failures": self.write_failures,
+                "load_seconds": self.load_seconds.to_dict(),
+                "store_get_seconds": self.store_get_seconds.to_dict(),
+                "store_mset_seconds": self.store_mset_seconds.to_dict(),
+            }
+
+        ret["shard_keys"] = self.shard_keys()
+        return ret
+
+    def collect(self):
+        from prometheus_client.core import (
+            CounterMetricFamily,
+            GaugeMetricFamily,
+            HistogramMetricFamily,
+        )
+        from prometheus_client.utils import floatToGoString
+
+        d = self.to_dict()
+
+        accesses = CounterMetricFamily(
+            "bagua_cache_accesses",
+            "Number of cache accesses by result.",
+            labels=["result"],
+        )
+        for result, key in [
+            ("local_hit", "local_hits"),
+            ("hit", "hits"),
+            ("miss", "misses"),
+        ]:
+            accesses.add_metric([result], d[key])
+        yield accesses
+
+        for name, doc in [
+            ("rejections", "Number of loaded values rejected by the admission policy."),
+            ("bytes_read", "Bytes read from the backend store."),
+            ("bytes_written", "Bytes written to the backend store."),
+            ("read_failures", "Number of failed reads from the backend store."),
+            ("write_failures", "Number of failed batched writes to the backend store."),
+        ]:
+            yield CounterMetricFamily("bagua_cache_" + name, doc, value=d[name])
+
+        for name, doc in [
+            ("load_seconds", "Time spent computing values on cache misses."),
+            ("store_get_seconds", "Latency of reads from the backend store."),
+            ("store_mset_seconds", "Latency of batched writes to the backend store."),
+        ]:
+            yield HistogramMetricFamily(
+                "bagua_cache_" + name,
+                doc,
+                buckets=[
+                    (floatToGoString(k), v) for k, v in d[name]["buckets"].items()
+                ],
+                sum_value=d[name]["sum"],
+            )
+
+        shard_keys = GaugeMetricFamily(
+            "bagua_cache_shard_keys",
+            "Number of keys in each shard of the backend store.",
+            labels=["shard"],
+        )
+        for i, n in enumerate(d["shard_keys"]):
+            shard_keys.add_metric([str(i)], n)
+        yield shard_keys
+
+    def to_prometheus(self) -> str:
+        """Returns the statistics in the Prometheus text exposition format."""
+
+        from prometheus_client import CollectorRegistry, generate_latest
+
+        registry = CollectorRegistry()
+        registry.register(self)
+        return generate_latest(registry).decode()
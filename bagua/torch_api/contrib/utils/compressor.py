@@ -0,0 +1,188 @@
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+
+
+__all__ = ["Compressor"]
+
+_MAGIC = b"BGZ"
+_CODEC_IDS = {"zlib": 1, "lz4": 2, "zstd": 3}
+
+
+class _ZlibCodec:
+    def __init__(self, level: Optional[int]):
+        self.level = level if level is not None else 1
+
+    def compress(self, buf) -> bytes:
+        return zlib.compress(buf, self.level)
+
+    def decompress(self, buf) -> bytes:
+        return zlib.decompress(buf)
+
+
+class _Lz4Codec:
+    def __init__(self, level: Optional[int]):
+        try:
+            import lz4.frame
+        except ImportError:
+            print(
+                "DEBUG: did not find lz4. To install it, run `pip install lz4` or follow instructions on its website(https://github.com/python-lz4/python-lz4)."
+            )
+            raise
+
+        self.lz4 = lz4.frame
+        self.level = level if level is not None else 0
+
+    def compress(self, buf) -> bytes:
+        return self.lz4.compress(buf, compression_level=self.level)
+
+    def decompress(self, buf) -> bytes:
+        return self.lz4.decompress(buf)
+
+
+class _ZstdCodec:
+    def __init__(self, level: Optional[int]):
+        try:
+            import zstandard
+        except ImportError:
+            print(
+                "DEBUG: did not find zstandard. To install it, run `pip install zstandard` or follow instructions on its website(https://github.com/indygreg/python-zstandard)."
+            )
+            raise
+
+        self.zstd = zstandard
+        self.level = level if level is not None else 3
+        # zstandard compressors and decompressors are not thread safe
+        self.local = threading.local()
+
+    def compress(self, buf) -> bytes:
+        if not hasattr(self.local, "compressor"):
+            self.local.compressor = self.zstd.ZstdCompressor(level=self.level)
+        return self.local.compressor.compress(buf)
+
+    def decompress(self, buf) -> bytes:
+        if not hasattr(self.local, "decompressor"):
+            self.local.decompressor = self.zstd.ZstdDecompressor()
+        return self.local.decompressor.decompress(buf)
+
+
+_CODECS = {"zlib": _ZlibCodec, "lz4": _Lz4Codec, "zstd": _ZstdCodec}
+
+
+class Compressor:
+    """
+    Compresses values before they are written to a key-value store and decompresses them after they are read.
+
+    Each compressed value is tagged with the codec it was compressed with, so values compressed with any supported
+    codec, as well as values stored uncompressed, can be decompressed by any compressor.
+
+    Args:
+        codec (str): Compression codec. Can be ``"zstd"``, ``"lz4"`` or ``"zlib"``. ``"zstd"`` and ``"lz4"``
+            require the `zstandard <https://github.com/indygreg/python-zstandard>`_ and
+            `lz4 <https://github.com/python-lz4/python-lz4>`_ package respectively. Default ``"zstd"``.
+        level (int, optional): Compression level of the codec. The codec's default level is used if not set.
+        threshold (int): Values smaller than :attr:`threshold` bytes are stored uncompressed. Values which do not
+            get smaller after compression are stored uncompressed as well. Default ``1024``.
+        num_threads (int): Number of threads to compress or decompress multiple values in parallel with
+            :meth:`compress_many` and :meth:`decompress_many`. Default ``0``, which compresses values on the calling
+            thread.
+    """
+
+    def __init__(
+        self,
+        codec: str = "zstd",
+        level: Optional[int] = None,
+        threshold: int = 1024,
+        num_threads: int = 0,
+    ):
+        if codec not in _CODECS:
+            raise ValueError(
+                "Invalid codec {}, should be one of {}".format(codec, list(_CODECS))
+            )
+
+        self.codec = codec
+        self.level = level
+        self.threshold = threshold
+        self.num_threads = num_threads
+
+        self._tag = _MAGIC + bytes([_CODEC_IDS[codec]])
+        self._codecs = {_CODEC_IDS[codec]: _CODECS[codec](level)}
+        self._executor = None
+        self._executor_pid = None
+
+    def __getstate__(self):
+        return (self.codec, self.level, self.threshold, self.num_threads)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def _get_executor(self) -> Optional[ThreadPoolExecutor]:
+        if self.num_threads <= 0:
+            return None
+
+        # threads do not survive forking, e.g. into DataLoader workers
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _get_codec(self, codec_id: int):
+        if codec_id not in self._codecs:
+            names = [k for k, v in _CODEC_IDS.items() if v == codec_id]
+            if len(names) == 0:
+                raise ValueError(
+                    "Unknown codec id {} of a compressed value, should be one of {}".format(
+                        codec_id, list(_CODEC_IDS.values())
+                    )
+                )
+            self._codecs[codec_id] = _CODECS[names[0]](None)
+        return self._codecs[codec_id]
+
+    def compress(self, buf: bytes) -> bytes:
+        """Returns the compressed value of :attr:`buf`, or :attr:`buf` itself if it is not worth compressing."""
+
+        if len(buf) < self.threshold:
+            return buf
+
+        compressed = self._codecs[_CODEC_IDS[self.codec]].compress(buf)
+        if len(compressed) + len(self._tag) >= len(buf):
+            return buf
+        return self._tag + compressed
+
+    def decompress(self, buf: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+        """Returns the decompressed value of :attr:`buf`, or :attr:`buf` itself if it is not compressed."""
+
+        if buf[: len(_MAGIC)] != _MAGIC:
+            return buf
+
+        if len(buf) <= len(_MAGIC):
+            raise ValueError("Truncated compressed value of {} bytes".format(len(buf)))
+
+        codec = self._get_codec(buf[len(_MAGIC)])
+        return codec.decompress(memoryview(buf)[len(_MAGIC) + 1 :])
+
+    def compress_many(self, bufs: List[bytes]) -> List[bytes]:
+        """Compresses multiple values, in parallel if :attr:`num_threads` is positive."""
+
+        executor = self._get_executor()
+        if executor is None or len(bufs) <= 1:
+            return [self.compress(buf) for buf in bufs]
+        return list(executor.map(self.compress, bufs))
+
+    def decompress_many(
+        self, bufs: List[Optional[bytes]]
+    ) -> List[Optional[Union[bytes, memoryview]]]:
+        """
+        Decompresses multiple values, in parallel if :attr:`num_threads` is positive. ``None`` values are kept
+        as they are.
+        """
+
+        def decompress(buf):
+            return self.decompress(buf) if buf is not None else None
+
+        executor = self._get_executor()
+        if executor is None or len(bufs) <= 1:
+            return [decompress(buf) for buf in bufs]
+        return list(executor.map(decompress, bufs))
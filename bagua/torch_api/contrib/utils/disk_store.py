@@ -0,0 +1,310 @@
+import contextlib
+import errno
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import List, Dict, Optional, Union
+from .store import Store
+
+
+__all__ = ["DiskStore"]
+
+# File layout:
+#
+#   header (one page) | index (num_slots * 16 bytes) | data
+#
+# The header holds ``magic, num_slots, capacity, tail, num_keys, allocated``. Each index slot holds
+# the 64-bit hash of a key and the offset of its entry in the file, a zero hash marks an empty slot.
+# Entries are appended to the data region as ``key_len, value_len, key, value``, with values aligned
+# to 16 bytes.
+_MAGIC = b"BGDSK001"
+_HEADER_FORMAT = "<8sQQQQQ"
+_HEADER_SIZE = 4096
+_SLOT_FORMAT = "<QQ"
+_SLOT_SIZE = 16
+_ENTRY_FORMAT = "<IIQ"
+_ENTRY_HEADER_SIZE = 16
+_ALIGNMENT = 16
+_ALLOCATION_CHUNK = 64 * 1024 * 1024
+
+
+def _align(n: int) -> int:
+    return n + (-n % _ALIGNMENT)
+
+
+class DiskStore(Store):
+    """
+    A persistent key-value store implementation keeping its entries in a memory-mapped file, with
+    :meth:`~bagua.torch_api.contrib.utils.store.Store.set` and :meth:`~bagua.torch_api.contrib.utils.store.Store.get`
+    API exposed.
+
+    The file consists of a hash index of the keys and an append-only data region holding the entries. It is
+    kept after the job exits, so that a store opened later at the same :attr:`path` serves the entries written
+    by previous jobs. Reads go through the page cache, which keeps the frequently read part of a store larger
+    than the memory in memory.
+
+    All processes on a node opening a store with the same :attr:`path`, including all local ranks and their
+    DataLoader workers, share the same entries. Values are returned as ``bytearray`` objects copied from the
+    mapped file.
+
+    Args:
+        path (str): Path of the file of the store. It is created if it does not exist.
+        capacity (int): Maximum size in bytes of the entries. New entries are dropped once the limit is reached,
+            or once the file system is full. Default is ``1TB``.
+        max_keys (int): Number of keys the index of the store is sized for. New keys are dropped once the index is
+            full. Default ``2097152``.
+        zero_copy (bool): If ``True``, values are returned as read-only ``memoryview`` objects pointing into the
+            mapped file instead, without being copied. Default ``False``.
+
+    .. note::
+        Entries are never evicted. Setting an existing key appends a new entry, the space of the old one is only
+        reclaimed by :meth:`clear`. With :attr:`zero_copy=True`, values returned before :meth:`clear` is called
+        must not be used after it.
+
+    .. note::
+        The :attr:`capacity` and :attr:`max_keys` only affect newly created stores, and have no effect on
+        existing ones.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 1_099_511_627_776,
+        max_keys: int = 2_097_152,
+        zero_copy: bool = False,
+    ):
+        self.path = path
+        self.zero_copy = zero_copy
+
+        num_slots = _HEADER_SIZE // _SLOT_SIZE
+        while num_slots * 3 < max_keys * 4:
+            num_slots *= 2
+
+        self._open(num_slots, capacity)
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def _open(self, num_slots: int = 0, capacity: int = 0):
+        """Opens the store, creating it with :attr:`num_slots` and :attr:`capacity` if it does not exist and
+        :attr:`num_slots` is not ``0``."""
+
+        import xxhash
+
+        self._xxh64 = xxhash.xxh64
+        self._thread_lock = threading.RLock()
+        flags = os.O_RDWR | os.O_CREAT if num_slots != 0 else os.O_RDWR
+        self._fd = os.open(self.path, flags, 0o600)
+        self._pid = os.getpid()
+
+        with self._locked(exclusive=True):
+            self._created = os.fstat(self._fd).st_size == 0
+            if self._created:
+                if num_slots == 0:
+                    raise RuntimeError("Store {} does not exist".format(self.path))
+
+                data_offset = _HEADER_SIZE + num_slots * _SLOT_SIZE
+                os.ftruncate(self._fd, data_offset + capacity)
+                if not self._reserve(0, data_offset):
+                    # leave the file empty, for the store to be created again
+                    os.ftruncate(self._fd, 0)
+                    raise RuntimeError(
+                        "Not enough space to create store {}".format(self.path)
+                    )
+                header = struct.pack(
+                    _HEADER_FORMAT,
+                    _MAGIC,
+                    num_slots,
+                    capacity,
+                    data_offset,
+                    0,
+                    data_offset,
+                )
+                os.pwrite(self._fd, header, 0)
+
+            self._mmap = mmap.mmap(self._fd, 0)
+            self._buf = memoryview(self._mmap)
+
+            magic, self.num_slots, self.capacity, _, _, _ = struct.unpack_from(
+                _HEADER_FORMAT, self._buf, 0
+            )
+            assert magic == _MAGIC, "{} is not a store file".format(self.path)
+            self._data_offset = _HEADER_SIZE + self.num_slots * _SLOT_SIZE
+
+        if self._created:
+            logging.debug("Created store at {}".format(self.path))
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool):
+        with self._thread_lock:
+            if self._pid != os.getpid():
+                # file locks are shared with the parent process after forking, reopen the file to get its own
+                self._fd = os.open(self.path, os.O_RDWR)
+                self._pid = os.getpid()
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reserve(self, offset: int, size: int) -> bool:
+        try:
+            os.posix_fallocate(self._fd, offset, size)
+        except OSError as e:
+            # the file system does not support reserving space
+            return e.errno in (errno.EOPNOTSUPP, errno.EINVAL)
+        return True
+
+    def _hash(self, key: bytes) -> int:
+        return self._xxh64(key).intdigest() or 1
+
+    def _find_slot(self, key: bytes, hash_code: int) -> int:
+        """Returns the index of the slot holding :attr:`key`, or of the empty slot where it would be inserted."""
+
+        mask = self.num_slots - 1
+        index = hash_code & mask
+        while True:
+            slot_hash, offset = struct.unpack_from(
+                _SLOT_FORMAT, self._buf, _HEADER_SIZE + index * _SLOT_SIZE
+            )
+            if slot_hash == 0:
+                return index
+
+            if slot_hash == hash_code:
+                key_len, _, _ = struct.unpack_from(_ENTRY_FORMAT, self._buf, offset)
+                start = offset + _ENTRY_HEADER_SIZE
+                if self._buf[start : start + key_len] == key:
+                    return index
+
+            index = (index + 1) & mask
+
+    def _get(self, key: str) -> Optional[Union[bytearray, memoryview]]:
+        key_bytes = key.encode()
+        index = self._find_slot(key_bytes, self._hash(key_bytes))
+        _, offset = struct.unpack_from(
+            _SLOT_FORMAT, self._buf, _HEADER_SIZE + index * _SLOT_SIZE
+        )
+        if offset == 0:
+            return None
+
+        key_len, _, value_len = struct.unpack_from(_ENTRY_FORMAT, self._buf, offset)
+        start = offset + _align(_ENTRY_HEADER_SIZE + key_len)
+        value = self._buf[start : start + value_len]
+        return value.toreadonly() if self.zero_copy else bytearray(value)
+
+    def _set(self, key: str, value: Union[str, bytes]) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+
+        _, _, _, tail, num_keys, allocated = struct.unpack_from(
+            _HEADER_FORMAT, self._buf, 0
+        )
+
+        key_bytes = key.encode()
+        hash_code = self._hash(key_bytes)
+        index = self._find_slot(key_bytes, hash_code)
+        slot_offset = _HEADER_SIZE + index * _SLOT_SIZE
+        _, old_offset = struct.unpack_from(_SLOT_FORMAT, self._buf, slot_offset)
+        if old_offset == 0 and (num_keys + 1) * 4 > self.num_slots * 3:
+            return False
+
+        value_offset = tail + _align(_ENTRY_HEADER_SIZE + len(key_bytes))
+        end = _align(value_offset + len(value))
+        if end > self._data_offset + self.capacity:
+            return False
+
+        if end > allocated:
+            # reserve the space ahead, as writing to a full file system through the mapping crashes the process
+            size = max(end - allocated, _ALLOCATION_CHUNK)
+            size = min(size, self._data_offset + self.capacity - allocated)
+            if not self._reserve(allocated, size):
+                return False
+            allocated += size
+
+        struct.pack_into(_ENTRY_FORMAT, self._buf, tail, len(key_bytes), 0, len(value))
+        start = tail + _ENTRY_HEADER_SIZE
+        self._buf[start : start + len(key_bytes)] = key_bytes
+        self._buf[value_offset : value_offset + len(value)] = value
+
+        struct.pack_into(_SLOT_FORMAT, self._buf, slot_offset, hash_code, tail)
+        if old_offset == 0:
+            num_keys += 1
+        struct.pack_into(
+            _HEADER_FORMAT,
+            self._buf,
+            0,
+            _MAGIC,
+            self.num_slots,
+            self.capacity,
+            end,
+            num_keys,
+            allocated,
+        )
+        return True
+
+    def set(self, key: str, value: Union[str, bytes]):
+        with self._locked(exclusive=True):
+            if not self._set(key, value):
+                logging.debug("Store {} is full".format(self.path))
+
+    def get(self, key: str) -> Optional[Union[bytearray, memoryview]]:
+        with self._locked(exclusive=False):
+            return self._get(key)
+
+    def num_keys(self) -> int:
+        with self._locked(exclusive=False):
+            return struct.unpack_from(_HEADER_FORMAT, self._buf, 0)[4]
+
+    def clear(self):
+        with self._locked(exclusive=True):
+            allocated = struct.unpack_from(_HEADER_FORMAT, self._buf, 0)[5]
+            try:
+                # release the space of the index and the entries
+                self._mmap.madvise(
+                    mmap.MADV_REMOVE, _HEADER_SIZE, len(self._mmap) - _HEADER_SIZE
+                )
+            except (AttributeError, OSError):
+                self._buf[_HEADER_SIZE : self._data_offset] = bytes(
+                    self._data_offset - _HEADER_SIZE
+                )
+            else:
+                allocated = self._data_offset
+                self._reserve(0, allocated)
+
+            struct.pack_into(
+                _HEADER_FORMAT,
+                self._buf,
+                0,
+                _MAGIC,
+                self.num_slots,
+                self.capacity,
+                self._data_offset,
+                0,
+                allocated,
+            )
+
+    def mset(self, dictionary: Dict[str, Union[str, bytes]]):
+        with self._locked(exclusive=True):
+            for key, value in dictionary.items():
+                if not self._set(key, value):
+                    logging.debug("Store {} is full".format(self.path))
+                    break
+
+    def mget(self, keys: List[str]) -> List[Optional[Union[bytearray, memoryview]]]:
+        with self._locked(exclusive=False):
+            return [self._get(key) for key in keys]
+
+    def status(self) -> bool:
+        return not self._mmap.closed
+
+    def shutdown(self):
+        with self._locked(exclusive=False):
+            self._mmap.flush()
@@ -1,5 +1,7 @@
+import os
 import socket
 import subprocess
+import tempfile
 import time
 from bagua.torch_api.env import (
     get_local_rank,
@@ -10,7 +12,7 @@ from bagua.torch_api.env import (
 from bagua.torch_api.communication import _get_rank_mappings
 
 try:
-    from redis import Redis
+    from redis import ConnectionPool, Redis, UnixDomainSocketConnection
 except ImportError:
     print(
         "DEBUG: did not find redis-py. To install it, run `pip install redis` or follow instructions on its website(https://github.com/andymccurdy/redis-py)."
@@ -42,6 +44,9 @@ _host_ip = None
 
 _global_redis_servers = []
 
+# maximum number of keys per command sent in a pipeline
+_MAX_KEYS_PER_COMMAND = 1000
+
 
 class RedisStore(ClusterStore):
     """
@@ -56,6 +61,22 @@ class RedisStore(ClusterStore):
             Redis instances, the workers on the :math:`n`-th node will use the :math:`n % m`-th Redis instance.
         capacity_per_node (int): Maximum memory limit in bytes when spawning new Redis instances. Old values will be evicted when the limit is reached.
             Default is ``100GB``.
+        routing (str): How keys are mapped to Redis instances if :attr:`cluster_mode=True`. Can be ``"modulo"`` or
+            ``"consistent"``. With ``"consistent"``, adding or removing a Redis instance only moves the keys of that
+            instance, which is useful when the number of nodes changes across runs. A ``"weight"`` can be given to
+            each host in :attr:`hosts` to control its relative share of keys. Default ``"modulo"``. See also
+            :class:`~bagua.torch_api.contrib.utils.store.ClusterStore`.
+        placement (str): Where keys are written if :attr:`cluster_mode=True`. Can be ``"hash"`` or ``"local"``.
+            With ``"hash"``, a key is written to the Redis instance it is routed to. With ``"local"``, a key is
+            written to the Redis instance on the node of the process writing it, which is the process reading it if
+            each process reads a stable subset of keys, so that reads are mostly node-local. Keys missing on the
+            local instance are only looked up in the instance they are routed to by their hashes, so keys written
+            to the local instance of another node are missed. If the keys read by each process change across
+            epochs, e.g. with a sampler reshuffling the dataset over all processes every epoch, the same keys end
+            up written to the instances of several nodes, which shrinks the number of distinct keys the cluster
+            can hold. The local instance is the one of :attr:`hosts` whose ``"node"`` is the node rank of the
+            current process, or whose ``"host"`` is the IP address of the current node. Keys are routed by their
+            hashes if there is no local instance. Default ``"hash"``.
 
     .. note::
         All Bagua jobs within the same node will share the same local Redis instance if :attr:`hosts=None`. The :attr:`capacity_per_node` only affects
@@ -67,6 +88,8 @@ class RedisStore(ClusterStore):
         hosts: Optional[List[Dict[str, str]]] = None,
         cluster_mode: bool = True,
         capacity_per_node: int = 107_374_182_400,
+        routing: str = "modulo",
+        placement: str = "hash",
     ):
 
         if hosts is None:
@@ -87,7 +110,38 @@ class RedisStore(ClusterStore):
             store = _RedisStore(host=h["host"], port=h["port"])
             stores.append(store)
 
-        super(RedisStore, self).__init__(stores)
+        if placement not in ["hash", "local"]:
+            raise ValueError(
+                'Invalid placement {}, should be "hash" or "local"'.format(placement)
+            )
+
+        local_store = None
+        if placement == "local":
+            local_store = _find_local_host(to_connect)
+            if local_store is None:
+                logging.info(
+                    "No local redis server found, routing keys by their hashes."
+                )
+
+        super(RedisStore, self).__init__(
+            stores,
+            routing=routing,
+            weights=[float(h.get("weight", 1.0)) for h in to_connect],
+            store_names=["{}:{}".format(h["host"], h["port"]) for h in to_connect],
+            local_store=local_store,
+        )
+
+
+def _find_local_host(hosts: List[Dict[str, str]]) -> Optional[int]:
+    for i, h in enumerate(hosts):
+        if "node" in h and int(h["node"]) == get_node_rank():
+            return i
+
+    for i, h in enumerate(hosts):
+        if h["host"] == get_host_ip():
+            return i
+
+    return None
 
 
 def _is_bootstrapped():
@@ -113,7 +167,7 @@ def bootstrap_redis_server(capacity_per_node):
         return _global_redis_servers
 
     host, port = get_host_ip(), find_free_network_port()
-    hostinfo = {"host": host, "port": port}
+    hostinfo = {"host": host, "port": port, "node": get_node_rank()}
     if get_local_rank() == 0:
         start_redis_server_cli(port, capacity_per_node)
         atexit.register(shutdown_redis_server)
@@ -138,14 +192,31 @@ def bootstrap_redis_server(capacity_per_node):
 
 class _RedisStore(Store):
     def __init__(self, host, port):
-        self.client = create_redis_client(host=host, port=port)
         self.host = host
         self.port = port
+        self._client = None
+        self._client_pid = None
 
         assert self._connect_with_retry(
             retry_times=3
         ), "Could not connect to redis server {}:{}".format(host, port)
 
+    def __getstate__(self):
+        return {"host": self.host, "port": self.port}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._client = None
+        self._client_pid = None
+
+    @property
+    def client(self) -> Redis:
+        # connections must not be shared with the parent process, e.g. by DataLoader workers
+        if self._client_pid != os.getpid():
+            self._client = create_redis_client(host=self.host, port=self.port)
+            self._client_pid = os.getpid()
+        return self._client
+
     def _connect_with_retry(self, retry_times=3):
         for i in range(retry_times):
             try:
@@ -173,10 +244,24 @@ class _RedisStore(Store):
         self.client.flushdb()
 
     def mset(self, dictionary: Dict[str, Union[str, bytes]]):
-        self.client.mset(dictionary)
+        if len(dictionary) <= _MAX_KEYS_PER_COMMAND:
+            self.client.mset(dictionary)
+            return
+
+        items = list(dictionary.items())
+        pipe = self.client.pipeline(transaction=False)
+        for i in range(0, len(items), _MAX_KEYS_PER_COMMAND):
+            pipe.mset(dict(items[i : i + _MAX_KEYS_PER_COMMAND]))
+        pipe.execute()
 
     def mget(self, keys: List[str]) -> List[Optional[Union[str, bytes]]]:
-        return self.client.mget(keys)
+        if len(keys) <= _MAX_KEYS_PER_COMMAND:
+            return self.client.mget(keys)
+
+        pipe = self.client.pipeline(transaction=False)
+        for i in range(0, len(keys), _MAX_KEYS_PER_COMMAND):
+            pipe.mget(keys[i : i + _MAX_KEYS_PER_COMMAND])
+        return [v for ret in pipe.execute() for v in ret]
 
     def status(self) -> bool:
         return self.client.ping()
@@ -191,9 +276,26 @@ class _RedisStore(Store):
             self.client.shutdown(nosave=True)  # pytype: disable=wrong-keyword-args
 
 
+def get_unix_socket_path(port):
+    return os.path.join(tempfile.gettempdir(), "bagua_redis_{}.sock".format(port))
+
+
 def create_redis_client(host, port):
-    logging.debug(f"{get_host_ip()} connect to redis server: {host}:{port}")
-    return Redis(port=port) if host == get_host_ip() else Redis(host=host, port=port)
+    if host == get_host_ip() and os.path.exists(get_unix_socket_path(port)):
+        logging.debug(
+            f"{get_host_ip()} connect to redis server: {get_unix_socket_path(port)}"
+        )
+        pool = ConnectionPool(
+            connection_class=UnixDomainSocketConnection,
+            path=get_unix_socket_path(port),
+        )
+    else:
+        logging.debug(f"{get_host_ip()} connect to redis server: {host}:{port}")
+        pool = ConnectionPool(
+            host="localhost" if host == get_host_ip() else host, port=port
+        )
+
+    return Redis(connection_pool=pool)
 
 
 def start_redis_server_cli(port, capacity, *args):
@@ -201,6 +303,8 @@ def start_redis_server_cli(port, capacity, *args):
         "redis-server",
         "--daemonize yes",
         "--port {}".format(port),
+        "--unixsocket {}".format(get_unix_socket_path(port)),
+        "--unixsocketperm 700",
         "--maxmemory {}".format(capacity),
         "--maxmemory-policy allkeys-random",  # use random eviction by default
         "--appendonly no",  # disable persistence by default
@@ -0,0 +1,157 @@
+import io
+import pickle
+import struct
+from typing import Any, List, Union
+
+import numpy as np
+import torch
+
+
+__all__ = ["Serializer", "PickleSerializer", "TensorSerializer"]
+
+
+class Serializer:
+    """
+    Base class for serializer implementations, which convert values to bytes with :meth:`serialize` to be saved in
+    a key-value store, and convert them back with :meth:`deserialize`.
+    """
+
+    def serialize(self, value: Any) -> bytes:
+        """Returns the serialized bytes of :attr:`value`."""
+        pass  # type: ignore
+
+    def deserialize(self, buf: Union[bytes, memoryview]) -> Any:
+        """Returns the value serialized in :attr:`buf`."""
+        pass  # type: ignore
+
+
+class PickleSerializer(Serializer):
+    """
+    A serializer pickling every value.
+    """
+
+    def serialize(self, value: Any) -> bytes:
+        return pickle.dumps(value)
+
+    def deserialize(self, buf: Union[bytes, memoryview]) -> Any:
+        return pickle.loads(buf)
+
+
+_MAGIC = b"BGT\x01"
+_ALIGNMENT = 16
+
+
+class _TensorPickler(pickle.Pickler):
+    def __init__(self, file, buffers: List[memoryview]):
+        super(_TensorPickler, self).__init__(
+            file, protocol=5, buffer_callback=self._add_buffer
+        )
+        self.buffers = buffers
+
+    def _add_buffer(self, pickle_buffer: pickle.PickleBuffer):
+        try:
+            self.buffers.append(pickle_buffer.raw())
+        except BufferError:
+            # not contiguous, serialize it in-band
+            return True
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, torch.Tensor) or obj.device.type != "cpu":
+            return None
+        if obj.requires_grad or obj.is_sparse or obj.is_quantized:
+            return None
+
+        try:
+            array = obj.contiguous().numpy()
+        except (TypeError, RuntimeError):
+            # dtype not supported by numpy, e.g. bfloat16
+            return None
+
+        self.buffers.append(memoryview(array.reshape(-1).view(np.uint8)))
+        return ("tensor", array.dtype.str, tuple(obj.shape), len(self.buffers) - 1)
+
+
+class _TensorUnpickler(pickle.Unpickler):
+    def __init__(self, file, buffers: List[memoryview]):
+        self.tensor_buffers = buffers
+        self.tensor_indices = set()
+        super(_TensorUnpickler, self).__init__(
+            file, buffers=self._out_of_band_buffers()
+        )
+
+    def _out_of_band_buffers(self):
+        # buffers of tensors and out-of-band buffers are numbered together, in the order they appear in the stream,
+        # skip those of the tensors loaded so far
+        for index, buf in enumerate(self.tensor_buffers):
+            if index not in self.tensor_indices:
+                yield buf
+
+    def persistent_load(self, pid):
+        _, dtype, shape, index = pid
+        self.tensor_indices.add(index)
+        array = np.frombuffer(self.tensor_buffers[index], dtype=np.dtype(dtype))
+        return torch.from_numpy(array).reshape(shape)
+
+
+class TensorSerializer(Serializer):
+    """
+    A serializer writing the memory of tensors and numpy arrays as raw buffers, so that they are neither copied
+    into nor parsed from a pickle stream.
+
+    A serialized value consists of a small header holding the sizes of the buffers, a pickle stream of
+    the value in which each CPU tensor and numpy array is replaced by its dtype, shape and the index of its buffer,
+    followed by the contiguous buffers. On deserialization, tensors and numpy arrays are created on top of
+    the retrieved bytes without copying. Other objects are pickled as usual.
+
+    Values serialized by :class:`PickleSerializer` can also be deserialized.
+
+    Args:
+        zero_copy (bool): If ``True``, tensors and numpy arrays returned by :meth:`deserialize` share the memory of
+            the input buffer even if it is read-only, e.g. a ``bytes`` object, in which case they are read-only
+            too, and PyTorch warns about it. Otherwise, a read-only input buffer is copied first. Default ``False``.
+
+    .. note::
+        Tensors and numpy arrays returned by :meth:`deserialize` share the memory of a writable input buffer.
+    """
+
+    def __init__(self, zero_copy: bool = False):
+        self.zero_copy = zero_copy
+
+    def serialize(self, value: Any) -> bytes:
+        buffers = []  # type: List[memoryview]
+        f = io.BytesIO()
+        _TensorPickler(f, buffers).dump(value)
+        payload = f.getbuffer()
+
+        sizes = [len(payload)] + [b.nbytes for b in buffers]
+        header = _MAGIC + struct.pack("<I{}Q".format(len(sizes)), len(sizes), *sizes)
+
+        parts = [header]
+        offset = len(header)
+        for b in [payload] + buffers:
+            padding = -offset % _ALIGNMENT
+            parts.extend([b"\0" * padding, b])
+            offset += padding + b.nbytes
+        return b"".join(parts)
+
+    def deserialize(self, buf: Union[bytes, memoryview]) -> Any:
+        buf = memoryview(buf)
+        if buf[: len(_MAGIC)] != _MAGIC:
+            return pickle.loads(buf)
+
+        if buf.readonly and not self.zero_copy:
+            buf = memoryview(bytearray(buf))
+
+        offset = len(_MAGIC)
+        (n,) = struct.unpack_from("<I", buf, offset)
+        offset += 4
+        sizes = struct.unpack_from("<{}Q".format(n), buf, offset)
+        offset += 8 * n
+
+        segments = []
+        for size in sizes:
+            offset += -offset % _ALIGNMENT
+            segments.append(buf[offset : offset + size])
+            offset += size
+
+        return _TensorUnpickler(io.BytesIO(segments[0]), segments[1:]).load()
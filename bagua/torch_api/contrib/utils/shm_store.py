@@ -0,0 +1,64 @@
+import atexit
+import logging
+import os
+from .disk_store import DiskStore
+
+
+__all__ = ["SharedMemoryStore"]
+
+
+class SharedMemoryStore(DiskStore):
+    """
+    A node-local key-value store implementation keeping its entries in a memory-mapped file in shared memory,
+    with :meth:`~bagua.torch_api.contrib.utils.store.Store.set` and :meth:`~bagua.torch_api.contrib.utils.store.Store.get`
+    API exposed.
+
+    All processes on a node opening a store with the same :attr:`name`, including all local ranks and their
+    DataLoader workers, share the same entries. Values are returned as ``bytearray`` objects copied from the
+    shared memory.
+
+    Args:
+        name (str): Name of the store, identifying the file ``"{shm_dir}/bagua_shm_store_{name}"``. Default ``"bagua"``.
+        capacity_per_node (int): Maximum memory limit in bytes of the entries. New entries are dropped once the limit
+            is reached, or once the shared memory file system is full. Default is ``100GB``.
+        max_keys (int): Number of keys the index of the store is sized for. New keys are dropped once the index is
+            full. Default ``2097152``.
+        shm_dir (str): Directory of the shared memory file system. Default ``"/dev/shm"``.
+        zero_copy (bool): If ``True``, values are returned as read-only ``memoryview`` objects pointing into the
+            shared memory instead, without being copied. Default ``False``.
+
+    .. note::
+        Entries are never evicted. Setting an existing key appends a new entry, the space of the old one is only
+        reclaimed by :meth:`clear`. With :attr:`zero_copy=True`, values returned before :meth:`clear` is called
+        must not be used after it.
+
+    .. note::
+        The :attr:`capacity_per_node` and :attr:`max_keys` only affect newly created stores, and have no effect
+        on existing ones. The process creating the store removes it when it exits.
+    """
+
+    def __init__(
+        self,
+        name: str = "bagua",
+        capacity_per_node: int = 107_374_182_400,
+        max_keys: int = 2_097_152,
+        shm_dir: str = "/dev/shm",
+        zero_copy: bool = False,
+    ):
+        self.name = name
+        super(SharedMemoryStore, self).__init__(
+            os.path.join(shm_dir, "bagua_shm_store_{}".format(name)),
+            capacity_per_node,
+            max_keys,
+            zero_copy,
+        )
+
+        if self._created:
+            atexit.register(self.shutdown)
+
+    def shutdown(self):
+        logging.debug(f"CLEANUP: removing shared memory store {self.path}.")
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -1,3 +1,6 @@
+import bisect
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Union
 from collections import defaultdict
 
@@ -61,13 +64,48 @@ class ClusterStore(Store):
 
     Args:
         stores(List[Store]): A list of stores to shard entries on.
+        routing(str): How keys are mapped to stores. Can be ``"modulo"`` or ``"consistent"``. With ``"modulo"``,
+            a key goes to the store indexed by its hash modulo the number of stores. With ``"consistent"``, stores
+            are placed on a consistent hash ring, so that adding or removing a store only moves the keys of that
+            store. Default ``"modulo"``.
+        weights(List[float], optional): Relative share of keys of each store if :attr:`routing="consistent"`.
+            Default is equal weights.
+        store_names(List[str], optional): Names identifying the stores on the consistent hash ring. A store keeps
+            its keys across clusters as long as its name is unchanged. Default is the indices of the stores.
+        num_virtual_nodes(int): Number of points on the consistent hash ring per store of weight ``1``. Default ``160``.
+        num_threads(int, optional): Number of threads accessing the stores concurrently in :meth:`mset` and
+            :meth:`mget`, so that their latency is that of the slowest store instead of the sum over all stores.
+            ``0`` accesses the stores one after another. Default is the number of stores, at most ``32``.
+        local_store(int, optional): Index of the store on the current node. If set, keys are written to this store
+            instead of the one they are routed to, and read from it first. Keys missing in it are looked up in the
+            store they are routed to, so keys written to the local store of another node are missed. This keeps the
+            reads of processes reading a stable subset of keys node-local. Default ``None``, which routes every key
+            by its hash.
 
     """
 
-    def __init__(self, stores: List[Store]):
+    def __init__(
+        self,
+        stores: List[Store],
+        routing: str = "modulo",
+        weights: Optional[List[float]] = None,
+        store_names: Optional[List[str]] = None,
+        num_virtual_nodes: int = 160,
+        num_threads: Optional[int] = None,
+        local_store: Optional[int] = None,
+    ):
 
         self.stores = stores
         self.num_stores = len(stores)
+        self.routing = routing
+        self.num_threads = (
+            num_threads if num_threads is not None else min(self.num_stores, 32)
+        )
+        self._executor = None
+        self._executor_pid = None
+
+        assert local_store is None or 0 <= local_store < self.num_stores
+        self.local_store = local_store if self.num_stores > 1 else None
 
         import xxhash
 
@@ -76,8 +114,34 @@ class ClusterStore(Store):
 
         self.hash_fn = xxh64
 
+        if routing == "consistent":
+            if weights is None:
+                weights = [1.0] * self.num_stores
+            if store_names is None:
+                store_names = [str(i) for i in range(self.num_stores)]
+            assert (
+                len(weights) == self.num_stores and len(store_names) == self.num_stores
+            )
+
+            ring = []
+            for sid, (name, weight) in enumerate(zip(store_names, weights)):
+                for v in range(max(1, int(round(num_virtual_nodes * weight)))):
+                    ring.append((self.hash_fn("{}#{}".format(name, v).encode()), sid))
+            ring.sort()
+
+            self._ring_hashes = [h for h, _ in ring]
+            self._ring_stores = [sid for _, sid in ring]
+        elif routing != "modulo":
+            raise ValueError(
+                'Invalid routing {}, should be "modulo" or "consistent"'.format(routing)
+            )
+
     def _hash_key(self, key: str) -> int:
         hash_code = self.hash_fn(key.encode())
+        if self.routing == "consistent":
+            # the first point on the ring clockwise from the key
+            idx = bisect.bisect(self._ring_hashes, hash_code)
+            return self._ring_stores[idx % len(self._ring_stores)]
         return hash_code % self.num_stores
 
     def route(self, key: str) -> Store:
@@ -88,12 +152,20 @@ class ClusterStore(Store):
     def set(self, key: str, value: Union[str, bytes]):
         if self.num_stores == 1:
             return self.stores[0].set(key, value)
+        if self.local_store is not None:
+            return self.stores[self.local_store].set(key, value)
 
         self.route(key).set(key, value)
 
     def get(self, key: str) -> Optional[Union[str, bytes]]:
         if self.num_stores == 1:
             return self.stores[0].get(key)
+        if self.local_store is not None:
+            value = self.stores[self.local_store].get(key)
+            sid = self._hash_key(key)
+            if value is None and sid != self.local_store:
+                value = self.stores[sid].get(key)
+            return value
 
         return self.route(key).get(key)
 
@@ -104,38 +176,75 @@ class ClusterStore(Store):
         for store in self.stores:
             store.clear()
 
+    def _get_executor(self) -> Optional[ThreadPoolExecutor]:
+        if self.num_threads <= 0:
+            return None
+
+        # threads do not survive forking, e.g. into DataLoader workers
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _fan_out(self, fn, args_list):
+        executor = self._get_executor()
+        if executor is None or len(args_list) <= 1:
+            return [fn(*args) for args in args_list]
+
+        futures = [executor.submit(fn, *args) for args in args_list]
+        return [f.result() for f in futures]
+
     def mset(self, dictionary: Dict[str, Union[str, bytes]]):
         if self.num_stores == 1:
             return self.stores[0].mset(dictionary)
+        if self.local_store is not None:
+            return self.stores[self.local_store].mset(dictionary)
 
-        route_table = {}
+        route_table = defaultdict(dict)
         for k, v in dictionary.items():
-            sid = self._hash_key(k)
-            m = route_table.get(sid, defaultdict(dict))
-            m[k] = v
-            route_table[sid] = m
+            route_table[self._hash_key(k)][k] = v
 
-        for sid, m in route_table.items():
-            self.stores[sid].mset(m)
+        self._fan_out(
+            lambda sid, m: self.stores[sid].mset(m), list(route_table.items())
+        )
 
     def mget(self, keys: List[str]) -> List[Optional[Union[str, bytes]]]:
         if self.num_stores == 1:
             return self.stores[0].mget(keys)
+        if self.local_store is not None:
+            return self._local_first_mget(keys)
+
+        return self._routed_mget(keys, range(len(keys)), [None] * len(keys))
+
+    def _routed_mget(self, keys, indices, result):
+        # fill result[i] for i in indices from the store keys[i] is routed to
+        route_table = defaultdict(lambda: ([], []))
+        for i in indices:
+            positions, shard_keys = route_table[self._hash_key(keys[i])]
+            positions.append(i)
+            shard_keys.append(keys[i])
+
+        shards = list(route_table.items())
+        rets = self._fan_out(
+            lambda sid, shard_keys: self.stores[sid].mget(shard_keys),
+            [(sid, shard_keys) for sid, (_, shard_keys) in shards],
+        )
 
-        route_table = {}
-        for k in keys:
-            sid = self._hash_key(k)
-            ll = route_table.get(sid, [])
-            ll.append(k)
-            route_table[sid] = ll
-
-        result_map = {}
-        for sid, ll in route_table.items():
-            ret = self.stores[sid].mget(ll)
-            m = {k: v for k, v in zip(ll, ret)}
-            result_map = {**result_map, **m}
-
-        return list(map(lambda x: result_map.get(x, None), keys))
+        for (_, (positions, _)), ret in zip(shards, rets):
+            for i, v in zip(positions, ret):
+                result[i] = v
+        return result
+
+    def _local_first_mget(self, keys: List[str]) -> List[Optional[Union[str, bytes]]]:
+        result = self.stores[self.local_store].mget(keys)
+
+        # written without a local store, look up the store each key is routed to
+        missing = [
+            i
+            for i, v in enumerate(result)
+            if v is None and self._hash_key(keys[i]) != self.local_store
+        ]
+        return self._routed_mget(keys, missing, result)
 
     def status(self) -> bool:
         return all([store.status() for store in self.stores])
@@ -5,6 +5,7 @@ import io
 import pickle
 import collections
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Tuple, Optional, Dict
 from torch.nn.modules import Module
 
@@ -67,6 +68,10 @@ class BaguaDistributedDataParallel:
         """
         self._bagua_autotune_last_report_time = time.time()
         self._bagua_autotune_completed = False
+        self._bagua_autotune_version = 0
+        # the autotune service is queried on a background thread, so that training does not wait for it
+        self._bagua_autotune_executor: Optional[ThreadPoolExecutor] = None
+        self._bagua_autotune_pending: Optional[Future] = None
 
         class BaguaDistributedDataParallelStates:
             """Empty class whose instances are used for keeping track of BaguaDistributedDataParallel's internal states."""
@@ -323,6 +328,13 @@ class BaguaDistributedDataParallel:
             self._bagua_broadcast_optimizer_state(optimizer)
 
     def _bagua_autotune_step(self):
+        """
+        Reports the speed of the current hyperparameters and asks for new ones every ``CYCLE_STEP`` iterations.
+
+        The exchange with the autotune service runs on a background thread. Its recommendation is applied when the
+        next cycle starts, so that all ranks, asking at the same iteration, switch to the same hyperparameters at
+        the same iteration. The training thread only waits if the service took a whole cycle to answer.
+        """
         CYCLE_STEP = 100
         start_time = time.time()
 
@@ -330,26 +342,61 @@ class BaguaDistributedDataParallel:
             self.bagua_train_step_counter != 0
             and self.bagua_train_step_counter % CYCLE_STEP == 0
         ):
-            # get speed metrics
+            # get speed metrics, measured under the hyperparameters of the current version
             time_since_last_update = time.time() - self._bagua_autotune_last_report_time
             speed = self._speed_metrics.get(time_since_last_update)
-
-            # report metrics
-            rsp = self._bagua_autotune_client.report_metrics(
-                model_name=self.bagua_module_name,
-                rank=env.get_rank(),
-                train_iter=self.bagua_train_step_counter,
-                hyperparameters=self._bagua_hyperparameters.dict(),
-                speed=speed,
+            version = self._bagua_autotune_version
+
+            # apply the recommendation asked for in the last cycle
+            if self._bagua_autotune_pending is not None:
+                rsp_json = self._bagua_autotune_pending.result()
+                self._bagua_autotune_pending = None
+                raw_buckets = self._bagua_autotune_apply(rsp_json, compact=True)
+                if raw_buckets is not None:
+                    self._reset_buckets(raw_buckets)
+                    # the speed of the next cycle must not mix in the old buckets
+                    self._speed_metrics = StatisticalAverage(
+                        last_update_time=time.time(), records=[], record_tail=(0.0, 0.0)
+                    )
+                if self._bagua_autotune_completed:
+                    self._bagua_autotune_executor.shutdown(wait=False)
+                    self._bagua_autotune_executor = None
+                    return
+
+            if self._bagua_autotune_executor is None:
+                self._bagua_autotune_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="bagua_autotune"
+                )
+            self._bagua_autotune_pending = self._bagua_autotune_executor.submit(
+                self._bagua_autotune_exchange,
+                self.bagua_train_step_counter,
+                version,
+                speed,
             )
-            assert rsp.status_code == 200, "Unexpected rsp={}".format(rsp)
-
-            # update parameters
-            self._reset_buckets()
             self._bagua_autotune_last_report_time = time.time()
 
         logging.debug("autotune overhead=%s", time.time() - start_time)
 
+    def _bagua_autotune_exchange(
+        self, train_iter: int, version: int, speed: float
+    ) -> dict:
+        # runs on the autotune thread, must not touch buckets nor hyperparameters
+        rsp = self._bagua_autotune_client.report_and_ask(
+            model_name=self.bagua_module_name,
+            rank=env.get_rank(),
+            train_iter=train_iter,
+            speed=speed,
+            version=version,
+        )
+        assert rsp.status_code == 200, "Unexpected rsp={}".format(rsp)
+        return rsp.json()
+
+    def _bagua_autotune_wait_pending(self):
+        # a pending recommendation refers to the tensors it was asked for, drop it
+        if self._bagua_autotune_pending is not None:
+            self._bagua_autotune_pending.result()
+            self._bagua_autotune_pending = None
+
     def _bagua_autotune_register_tensors(self):
         """
         Register tensors on autotune server, and return first bucketing suggestions
@@ -370,27 +417,52 @@ class BaguaDistributedDataParallel:
             tensor_list=autotune_tensor_list,
         )
         assert rsp.status_code == 200, "Unexpected rsp={}".format(rsp)
+        self._bagua_autotune_tensor_list = autotune_tensor_list
 
-    def _bagua_autotune_get_buckets(self):
+    def _bagua_autotune_ask(self, train_iter: int) -> dict:
         rsp = self._bagua_autotune_client.ask_hyperparameters(
             model_name=self.bagua_module_name,
             rank=env.get_rank(),
-            train_iter=self.bagua_train_step_counter,
+            train_iter=train_iter,
         )
         assert rsp.status_code == 200, "Unexpected rsp={}".format(rsp)
-        recommended_hyperparameters = rsp.json()["recommended_hyperparameters"]
-        is_autotune_completed = rsp.json()["is_autotune_completed"]
+        return rsp.json()
 
-        self._bagua_hyperparameters.update(recommended_hyperparameters)
+    def _bagua_autotune_apply(self, rsp_json: dict, compact: bool = False):
+        """
+        Updates hyperparameters with the recommendation of the autotune service, returns the new buckets, or
+        ``None`` if the recommendation did not change. In a :attr:`compact` recommendation, tensors in buckets are
+        given by their position in the registered tensor list.
+        """
+        recommended_hyperparameters = rsp_json["recommended_hyperparameters"]
+        is_autotune_completed = rsp_json["is_autotune_completed"]
 
+        self._bagua_autotune_version = rsp_json["version"]
         self._bagua_autotune_completed = is_autotune_completed
-        recommended_buckets = map(
-            lambda x: list(map(lambda y: self._bagua_tensor_map[y["name"]], x)),
-            recommended_hyperparameters["buckets"],
+        if recommended_hyperparameters is None:
+            return None
+
+        if compact:
+            recommended_hyperparameters["buckets"] = [
+                [self._bagua_autotune_tensor_list[i] for i in bucket]
+                for bucket in recommended_hyperparameters["buckets"]
+            ]
+        self._bagua_hyperparameters.update(recommended_hyperparameters)
+        return self._bagua_autotune_current_buckets()
+
+    def _bagua_autotune_current_buckets(self):
+        return [
+            [self._bagua_tensor_map[td["name"]] for td in bucket]
+            for bucket in self._bagua_hyperparameters.buckets
+        ]
+
+    def _bagua_autotune_get_buckets(self):
+        return self._bagua_autotune_apply(
+            self._bagua_autotune_ask(self.bagua_train_step_counter)
         )
-        return list(recommended_buckets)
 
     def _bagua_init_algorithm(self):
+        self._bagua_autotune_wait_pending()
         self._bagua_broadcast_parameters()
 
         self._bagua_tensors = self.bagua_algorithm.init_tensors(self)
@@ -442,7 +514,9 @@ class BaguaDistributedDataParallel:
                                 set(self.autograd_graph_params.keys())
                                 != self.params_in_use
                             ):
-                                self._reset_buckets()
+                                self._reset_buckets(
+                                    self._bagua_autotune_current_buckets()
+                                )
                                 self._delay_allreduce()
 
                     if not self._is_post_backward_callback_queued:
@@ -480,8 +554,9 @@ class BaguaDistributedDataParallel:
 
             optimizer.step = new_step_factory(optimizer)
 
-    def _reset_buckets(self):
-        raw_buckets = self._bagua_autotune_get_buckets()
+    def _reset_buckets(self, raw_buckets=None):
+        if raw_buckets is None:
+            raw_buckets = self._bagua_autotune_get_buckets()
         self.bagua_buckets = self.bagua_algorithm.tensors_to_buckets(
             raw_buckets, self.gradient_as_bucket_view
         )
@@ -124,6 +124,30 @@ def get_autotune_server_wait_time() -> int:
     return int(os.environ.get("BAGUA_AUTOTUNE_SERVER_WAIT_TIME", 300))
 
 
+def get_autotune_cache_path() -> str:
+    """Get the path of the file keeping autotune results across jobs, empty if disabled."""
+    return os.environ.get("BAGUA_AUTOTUNE_CACHE_PATH", "")
+
+
+def get_skip_autotune_if_cached() -> bool:
+    return int(os.environ.get("BAGUA_SKIP_AUTOTUNE_IF_CACHED", 0)) == 1
+
+
+def get_autotune_service_mode() -> str:
+    """Get how the autotune service is run.
+
+    Returns:
+        ``"fork"`` (default) if the service runs in a process forked from rank 0, ``"spawn"`` if rank 0 starts it
+        in a new interpreter, or ``"external"`` if it is started beforehand, e.g. by the launcher, at the address
+        given by the ``BAGUA_AUTOTUNE_SERVICE_ADDR`` environment variable.
+    """
+    return os.environ.get("BAGUA_AUTOTUNE_SERVICE_MODE", "fork")
+
+
+def get_autotune_service_addr() -> str:
+    return os.environ.get("BAGUA_AUTOTUNE_SERVICE_ADDR", "")
+
+
 def find_free_network_port() -> int:
     """Finds a free port on localhost."""
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -0,0 +1,125 @@
+import unittest
+from bagua.torch_api.contrib.cache_loader import CacheLoader
+from bagua.torch_api.contrib.utils.admission import (
+    AdmissionPolicy,
+    CostAwareAdmissionPolicy,
+)
+from bagua.torch_api.contrib.utils.store import Store
+
+
+class TestCostAwareAdmissionPolicy(unittest.TestCase):
+    def test_sketch(self):
+        policy = CostAwareAdmissionPolicy(capacity=1 << 20, num_counters=1024)
+        sketch = policy.sketch
+
+        for _ in range(3):
+            sketch.increment("a")
+        for _ in range(100):
+            sketch.increment("b")
+
+        self.assertEqual(sketch.estimate("a"), 3)
+        self.assertEqual(sketch.estimate("b"), 15)
+        self.assertEqual(sketch.estimate("c"), 0)
+
+        sketch._age()
+        self.assertEqual(sketch.estimate("a"), 1)
+        self.assertEqual(sketch.estimate("b"), 7)
+
+    def test_admit(self):
+        policy = CostAwareAdmissionPolicy(capacity=100 * 1000)
+
+        # values are admitted while the cache has room for them
+        for i in range(100):
+            key = str(i)
+            policy.record_access(key)
+            self.assertTrue(policy.admit(key, 0.1, 1000))
+        self.assertEqual(policy.used_bytes, policy.capacity)
+
+        # once it is full, values slower to load are still admitted, evicting faster ones
+        policy.record_access("slow")
+        self.assertTrue(policy.admit("slow", 1.0, 1000))
+        self.assertEqual(policy.used_bytes, policy.capacity)
+        self.assertEqual(len(policy.residents), 100)
+
+        policy.record_access("fast")
+        self.assertFalse(policy.admit("fast", 0.1, 1000))
+
+        # as are values accessed more often
+        for _ in range(10):
+            policy.record_access("frequent")
+        self.assertTrue(policy.admit("frequent", 0.1, 1000))
+
+    def test_admit_epochs(self):
+        policy = CostAwareAdmissionPolicy(capacity=100 * 1000)
+
+        for epoch in range(5):
+            for i in range(1000):
+                key = str(i)
+                policy.record_access(key)
+                if key in policy.residents:
+                    continue
+                load_seconds = 1.0 if i % 4 == 0 else 0.1
+                policy.admit(key, load_seconds, 1000)
+
+            self.assertLessEqual(policy.used_bytes, policy.capacity)
+
+        # mostly values slow to load are kept
+        self.assertGreater(sum(int(key) % 4 == 0 for key in policy.residents), 90)
+
+    def test_admit_full_store(self):
+        store = KeyCountStore(100)
+        policy = CostAwareAdmissionPolicy(capacity=100 * 1000, probe_interval=1)
+        policy.attach(store)
+
+        # the store was filled by other processes, there is no victim to compare with
+        policy.record_access("fast")
+        self.assertTrue(policy.admit("fast", 0.1, 1000))
+        store.count += 1
+
+        policy.record_access("slow")
+        self.assertTrue(policy.admit("slow", 1.0, 1000))
+        self.assertNotIn("fast", policy.residents)
+
+        # values evicted from the store make room for new ones
+        store.count = 50
+        policy.record_access("other")
+        self.assertTrue(policy.admit("other", 0.01, 1000))
+        self.assertIn("slow", policy.residents)
+
+
+class KeyCountStore(Store):
+    def __init__(self, count):
+        self.count = count
+
+    def num_keys(self):
+        return self.count
+
+
+class RejectOddKeys(AdmissionPolicy):
+    def admit(self, key, load_seconds, nbytes):
+        return int(key.split("_")[-1]) % 2 == 0
+
+
+class TestCacheLoaderAdmission(unittest.TestCase):
+    def test_admission(self):
+        loader = CacheLoader(
+            backend="shm",
+            dataset_name="d8",
+            name="test_admission",
+            admission_policy=RejectOddKeys(),
+        )
+        loader.store.clear()
+
+        for _ in range(2):
+            for i in range(100):
+                self.assertEqual(loader.get(i, lambda x: x * 2), i * 2)
+        loader.flush()
+
+        self.assertEqual(loader.num_keys(), 50)
+        self.assertEqual(loader.stats.rejections, 100)
+        self.assertEqual(loader.stats.hits, 50)
+        loader.store.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from bagua.torch_api.contrib.utils.cache_stats import CacheStats
+
+
+class TestCacheStats(unittest.TestCase):
+    def test_to_dict(self):
+        stats = CacheStats()
+        stats.record_local_hit()
+        stats.record_hit()
+        stats.record_hit()
+        stats.record_miss(0.3)
+        stats.record_get(0.0002, 100)
+        stats.record_get(20.0, 50)
+        stats.record_mset(0.001, 200)
+        stats.record_write_failure()
+
+        d = stats.to_dict()
+        self.assertEqual((d["local_hits"], d["hits"], d["misses"]), (1, 2, 1))
+        self.assertEqual(d["hit_ratio"], 0.75)
+        self.assertEqual((d["bytes_read"], d["bytes_written"]), (150, 200))
+        self.assertEqual((d["read_failures"], d["write_failures"]), (0, 1))
+        self.assertEqual(d["store_get_seconds"]["count"], 2)
+        self.assertAlmostEqual(d["store_get_seconds"]["sum"], 20.0002)
+        self.assertEqual(d["store_get_seconds"]["buckets"][0.0001], 0)
+        self.assertEqual(d["store_get_seconds"]["buckets"][0.00025], 1)
+        self.assertEqual(d["store_get_seconds"]["buckets"][10.0], 1)
+        self.assertEqual(d["store_get_seconds"]["buckets"][float("inf")], 2)
+        self.assertEqual(d["load_seconds"]["buckets"][0.5], 1)
+        self.assertEqual(d["shard_keys"], [])
+
+        stats.reset()
+        self.assertEqual(stats.to_dict()["hit_ratio"], 0.0)
+        self.assertEqual(stats.to_dict()["store_get_seconds"]["count"], 0)
+
+    def test_to_prometheus(self):
+        stats = CacheStats()
+        stats.record_miss(0.3)
+        stats.record_hit()
+
+        text = stats.to_prometheus()
+        self.assertIn('bagua_cache_accesses_total{result="miss"} 1.0', text)
+        self.assertIn('bagua_cache_accesses_total{result="hit"} 1.0', text)
+        self.assertIn('bagua_cache_load_seconds_bucket{le="+Inf"} 1.0', text)
+        self.assertIn("bagua_cache_load_seconds_count 1.0", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from bagua.torch_api.contrib.cached_dataset import CachedDataset
+from bagua.torch_api.contrib.cache_warmup import warm_up, _split
+from tests.contrib.test_cached_dataset import MyDataset
+
+
+class CountingDataset(MyDataset):
+    def __init__(self, size):
+        super(CountingDataset, self).__init__(size)
+        self.loaded = 0
+
+    def __getitem__(self, item):
+        self.loaded += 1
+        return super(CountingDataset, self).__getitem__(item)
+
+
+class TestCacheWarmUp(unittest.TestCase):
+    def test_split(self):
+        indices = list(range(10))
+        parts = [_split(indices, 3, i) for i in range(3)]
+        self.assertEqual(parts, [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        self.assertEqual(_split(indices[:2], 3, 2), [])
+
+    def test_warm_up(self):
+        dataset = CountingDataset(1000)
+        cache_dataset = CachedDataset(
+            dataset, backend="shm", dataset_name="d7", name="test_cache_warmup"
+        )
+        store = cache_dataset.cache_loader.store
+        store.clear()
+
+        # the first of two ranks
+        ret = warm_up(cache_dataset, num_workers=3, batch_size=64, world_size=2, rank=0)
+        self.assertEqual(ret, {"loaded": 500, "skipped": 0})
+        self.assertEqual(store.num_keys(), 500)
+
+        # resumed on the whole dataset
+        ret = warm_up(cache_dataset, num_workers=0, batch_size=64, world_size=1, rank=0)
+        self.assertEqual(ret, {"loaded": 500, "skipped": 500})
+        self.assertEqual(store.num_keys(), 1000)
+
+        dataset.loaded = 0
+        for i in range(len(dataset)):
+            self.assertTrue((cache_dataset[i][0] == dataset.dataset[i][0]).all())
+        self.assertEqual(dataset.loaded, 0)
+        store.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
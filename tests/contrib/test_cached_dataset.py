@@ -1,6 +1,9 @@
 from bagua.torch_api.contrib.cached_dataset import CachedDataset
+from bagua.torch_api.contrib.cache_loader import CacheLoader, LRUCache
+from bagua.torch_api.contrib.utils.compressor import Compressor
 from torch.utils.data.dataset import Dataset
 import numpy as np
+import torch
 import logging
 import unittest
 from tests import skip_if_cuda_available
@@ -55,6 +58,145 @@ class TestCacheDataset(unittest.TestCase):
             cache_dataset2.cache_loader.num_keys(), len(dataset1) + len(dataset2)
         )
 
+    @skip_if_cuda_available()
+    def test_redis_with_local_cache(self):
+        dataset = MyDataset(102)
+        cache_dataset = CachedDataset(
+            dataset,
+            backend="redis",
+            dataset_name="d3",
+            local_cache_capacity=10000,
+        )
+
+        cache_dataset.cache_loader.store.clear()
+
+        self.check_dataset(dataset, cache_dataset)
+        self.assertEqual(cache_dataset.cache_loader.num_keys(), len(dataset))
+        self.assertLessEqual(cache_dataset.cache_loader.local_cache.size, 10000)
+        self.assertGreater(len(cache_dataset.cache_loader.local_cache), 0)
+
+    @skip_if_cuda_available()
+    def test_redis_prefetch(self):
+        dataset = MyDataset(102)
+        cache_dataset = CachedDataset(
+            dataset,
+            backend="redis",
+            dataset_name="d4",
+            reader_buffer_size=8,
+        )
+
+        cache_dataset.cache_loader.store.clear()
+
+        dataloader = torch.utils.data.DataLoader(cache_dataset, batch_size=10)
+        for _ in range(10):
+            for i, (x, y) in enumerate(dataloader):
+                for j in range(x.shape[0]):
+                    self.assertTrue((dataset[i * 10 + j][0] == x[j].numpy()).all())
+                    self.assertTrue((dataset[i * 10 + j][1] == y[j].numpy()).all())
+
+        self.assertEqual(cache_dataset.cache_loader.num_keys(), len(dataset))
+
+    def test_shm(self):
+        dataset = MyDataset(102)
+        cache_dataset = CachedDataset(
+            dataset,
+            backend="shm",
+            dataset_name="d5",
+            name="test_cached_dataset",
+        )
+
+        cache_dataset.cache_loader.store.clear()
+
+        self.check_dataset(dataset, cache_dataset)
+        self.assertEqual(cache_dataset.cache_loader.num_keys(), len(dataset))
+
+        stats = cache_dataset.cache_loader.stats.to_dict()
+        self.assertGreaterEqual(stats["misses"], len(dataset))
+        self.assertEqual(stats["hits"] + stats["misses"], 12 * len(dataset))
+        self.assertEqual(stats["load_seconds"]["count"], stats["misses"])
+        self.assertGreater(stats["bytes_read"], 0)
+        self.assertGreater(stats["bytes_written"], 0)
+        self.assertEqual(stats["shard_keys"], [len(dataset)])
+        cache_dataset.cache_loader.store.shutdown()
+
+    def test_shm_write_behind(self):
+        dataset = MyDataset(102)
+        cache_dataset = CachedDataset(
+            dataset,
+            backend="shm",
+            dataset_name="d6",
+            name="test_write_behind",
+            write_behind=True,
+            max_pending_writes=30,
+        )
+
+        cache_dataset.cache_loader.store.clear()
+
+        dataloader = torch.utils.data.DataLoader(
+            cache_dataset, batch_size=10, num_workers=2
+        )
+        for _ in range(3):
+            for i, (x, y) in enumerate(dataloader):
+                for j in range(x.shape[0]):
+                    self.assertTrue((dataset[i * 10 + j][0] == x[j].numpy()).all())
+
+        # pending writes are flushed when workers exit
+        self.assertEqual(cache_dataset.cache_loader.num_keys(), len(dataset))
+
+        self.check_dataset(dataset, cache_dataset)
+        cache_dataset.cache_loader.flush()
+        self.assertEqual(cache_dataset.cache_loader.num_keys(), len(dataset))
+        cache_dataset.cache_loader.store.shutdown()
+
+    def test_write_behind_compress_error(self):
+        loader = CacheLoader(
+            backend="shm",
+            dataset_name="d9",
+            name="test_compress_error",
+            write_behind=True,
+            compressor=FailingCompressor("zlib"),
+        )
+        loader.store.clear()
+
+        for i in range(10):
+            self.assertEqual(loader.get(i, lambda x: x * 2), i * 2)
+        with self.assertRaises(RuntimeError):
+            loader.flush()
+
+        # the background thread is still alive
+        self.assertEqual(loader.get(10, lambda x: x * 2), 20)
+        with self.assertRaises(RuntimeError):
+            loader.flush()
+        loader.flush()
+        loader.fetcher.close()
+        self.assertEqual(loader.num_keys(), 0)
+        loader.store.shutdown()
+
+
+class FailingCompressor(Compressor):
+    def compress_many(self, bufs):
+        raise RuntimeError("failed to compress")
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_lru_cache(self):
+        cache = LRUCache(capacity=10)
+        cache.set("a", 1, 4)
+        cache.set("b", 2, 4)
+        self.assertEqual(cache.get("a"), 1)
+
+        # "b" is the least recently used entry
+        cache.set("c", 3, 4)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.size, 8)
+
+        # entries larger than the capacity are not cached
+        cache.set("d", 4, 11)
+        self.assertEqual(cache.get("d"), None)
+        self.assertEqual(len(cache), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,164 @@
+import threading
+import unittest
+from bagua.torch_api.contrib.utils.store import Store, ClusterStore
+
+
+class DictStore(Store):
+    def __init__(self):
+        self.entries = {}
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def num_keys(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def mset(self, dictionary):
+        self.entries.update(dictionary)
+
+    def mget(self, keys):
+        return [self.entries.get(k) for k in keys]
+
+    def status(self):
+        return True
+
+
+class CountingStore(DictStore):
+    def __init__(self):
+        super().__init__()
+        self.num_get_keys = 0
+        self.num_mget_keys = 0
+
+    def get(self, key):
+        self.num_get_keys += 1
+        return super().get(key)
+
+    def mget(self, keys):
+        self.num_mget_keys += len(keys)
+        return super().mget(keys)
+
+
+class TestClusterStore(unittest.TestCase):
+    def check(self, store):
+        store.clear()
+        store.set("0", b"0")
+        store.mset({str(i): str(i).encode() for i in range(1, 1000)})
+
+        self.assertEqual(store.num_keys(), 1000)
+        self.assertEqual(store.get("10"), b"10")
+        self.assertEqual(
+            store.mget([str(i) for i in range(1005)]),
+            [str(i).encode() for i in range(1000)] + [None] * 5,
+        )
+        for s in store.stores:
+            self.assertGreater(s.num_keys(), 0)
+
+    def test_modulo_routing(self):
+        self.check(ClusterStore([DictStore() for _ in range(4)]))
+
+    def test_consistent_routing(self):
+        names = ["node{}".format(i) for i in range(4)]
+        store = ClusterStore(
+            [DictStore() for _ in range(4)], routing="consistent", store_names=names
+        )
+        self.check(store)
+
+        # adding a store only moves keys to the new store
+        new_store = ClusterStore(
+            [DictStore() for _ in range(5)],
+            routing="consistent",
+            store_names=names + ["node4"],
+        )
+        keys = [str(i) for i in range(10000)]
+        moved = [k for k in keys if store._hash_key(k) != new_store._hash_key(k)]
+        self.assertLess(len(moved), len(keys) * 0.35)
+        self.assertTrue(all(new_store._hash_key(k) == 4 for k in moved))
+
+    def test_consistent_routing_weights(self):
+        store = ClusterStore(
+            [DictStore() for _ in range(2)], routing="consistent", weights=[1.0, 3.0]
+        )
+        self.check(store)
+        self.assertGreater(store.stores[1].num_keys(), store.stores[0].num_keys() * 2)
+
+    def test_sequential_access(self):
+        self.check(ClusterStore([DictStore() for _ in range(4)], num_threads=0))
+
+    def test_concurrent_access(self):
+        num_stores = 4
+        barrier = threading.Barrier(num_stores, timeout=10)
+
+        class BarrierStore(DictStore):
+            # only passes if all stores are accessed at the same time
+            def mset(self, dictionary):
+                barrier.wait()
+                super(BarrierStore, self).mset(dictionary)
+
+            def mget(self, keys):
+                barrier.wait()
+                return super(BarrierStore, self).mget(keys)
+
+        store = ClusterStore([BarrierStore() for _ in range(num_stores)])
+        store.mset({str(i): str(i).encode() for i in range(1000)})
+
+        keys = [str(i) for i in range(1000)] * 2 + ["1000"]
+        self.assertEqual(
+            store.mget(keys),
+            [str(i).encode() for i in range(1000)] * 2 + [None],
+        )
+
+    def test_local_placement(self):
+        stores = [CountingStore() for _ in range(4)]
+        node0 = ClusterStore(stores, local_store=0)
+        node1 = ClusterStore(stores, local_store=1)
+        hashed = ClusterStore(stores)
+
+        node0.mset({str(i): str(i).encode() for i in range(100)})
+        node0.set("100", b"100")
+        self.assertEqual(stores[0].num_keys(), 101)
+        self.assertEqual(stores[1].num_keys(), 0)
+
+        # written without a local store
+        hashed.mset({str(i): str(i).encode() for i in range(100, 200)})
+
+        keys = [str(i) for i in range(205)]
+        self.assertEqual(
+            node0.mget(keys), [str(i).encode() for i in range(200)] + [None] * 5
+        )
+        # keys in the local store of another node are only found if routed to it
+        self.assertEqual(
+            node1.mget(keys),
+            [
+                k.encode() if 100 <= int(k) < 200 or node1._hash_key(k) == 0 else None
+                for k in keys[:200]
+            ]
+            + [None] * 5,
+        )
+        for store in [node0, node1]:
+            self.assertEqual(store.get("150"), b"150")
+            self.assertEqual(store.get("205"), None)
+
+        # local misses are only looked up in the store they are routed to
+        for store in stores:
+            store.num_mget_keys = 0
+        node1.mget(keys)
+        self.assertEqual(stores[1].num_mget_keys, len(keys))
+        self.assertEqual(
+            sum(store.num_mget_keys for store in stores),
+            len(keys) + sum(node1._hash_key(k) != 1 for k in keys),
+        )
+
+        for store in stores:
+            store.num_get_keys = 0
+        node1.get("0")
+        self.assertEqual(sum(store.num_get_keys for store in stores), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import unittest
+import pickle
+import numpy as np
+from bagua.torch_api.contrib.utils.compressor import Compressor
+
+
+class TestCompressor(unittest.TestCase):
+    def check(self, compressor):
+        compressible = np.zeros(10000).tobytes()
+        incompressible = os.urandom(8000)
+        small = b"0" * 100
+
+        compressed = compressor.compress(compressible)
+        self.assertLess(len(compressed), len(compressible))
+        self.assertEqual(bytes(compressor.decompress(compressed)), compressible)
+
+        self.assertEqual(compressor.compress(incompressible), incompressible)
+        self.assertEqual(compressor.compress(small), small)
+        self.assertEqual(compressor.decompress(small), small)
+
+        bufs = [compressible, incompressible, small, None]
+        ret = compressor.decompress_many(compressor.compress_many(bufs[:3]) + [None])
+        self.assertEqual([bytes(b) if b is not None else None for b in ret], bufs)
+
+    def test_zlib(self):
+        self.check(Compressor("zlib"))
+        self.check(Compressor("zlib", num_threads=2))
+
+    def test_mixed_codecs(self):
+        buf = np.zeros(10000).tobytes()
+        compressed = Compressor("zlib").compress(buf)
+
+        compressor = pickle.loads(pickle.dumps(Compressor("zlib", level=9)))
+        self.assertEqual(bytes(compressor.decompress(compressed)), buf)
+
+    def test_invalid_codec(self):
+        with self.assertRaises(ValueError):
+            Compressor("snappy")
+
+    def test_unknown_codec_id(self):
+        compressor = Compressor("zlib")
+        with self.assertRaisesRegex(ValueError, "codec id 9"):
+            compressor.decompress(b"BGZ\x09" + b"0" * 100)
+        with self.assertRaises(ValueError):
+            compressor.decompress(b"BGZ")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import errno
+import unittest
+import multiprocessing as mp
+import os
+import pickle
+import tempfile
+from unittest import mock
+from bagua.torch_api.contrib.utils.disk_store import DiskStore
+
+
+def read_entries(store, n):
+    assert store.num_keys() == n
+    for i in range(n):
+        assert pickle.loads(store.get(str(i))) == i
+
+
+class TestDiskStore(unittest.TestCase):
+    def test_disk_store(self):
+        n = 100
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "test.cache")
+            store = DiskStore(path, capacity=10000000, max_keys=n)
+            store.mset({str(i): pickle.dumps(i) for i in range(n)})
+            self.assertEqual(store.get(str(n)), None)
+            store.shutdown()
+
+            # reopen the store written before
+            store = DiskStore(path)
+            self.assertEqual(store.num_keys(), n)
+            ret = store.mget([str(i) for i in range(n)])
+            self.assertEqual([pickle.loads(v) for v in ret], list(range(n)))
+
+            # open the store in a spawned process
+            p = mp.get_context("spawn").Process(target=read_entries, args=(store, n))
+            p.start()
+            p.join()
+            self.assertTrue(p.exitcode == 0)
+
+            store.clear()
+            self.assertEqual(store.num_keys(), 0)
+            self.assertEqual(store.get("0"), None)
+
+    def test_open(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "test.cache")
+            store = DiskStore(path, capacity=10000000)
+            state = pickle.dumps(store)
+
+            # unpickling does not create the store
+            os.unlink(path)
+            with self.assertRaises(FileNotFoundError):
+                pickle.loads(state)
+            self.assertFalse(os.path.exists(path))
+
+            with mock.patch(
+                "os.posix_fallocate", side_effect=OSError(errno.ENOSPC, "No space")
+            ):
+                with self.assertRaises(RuntimeError):
+                    DiskStore(path, capacity=10000000)
+            self.assertEqual(os.path.getsize(path), 0)
+
+            store = DiskStore(path, capacity=10000000)
+            store.set("0", b"0")
+            self.assertEqual(pickle.loads(pickle.dumps(store)).get("0"), b"0")
+
+    def test_zero_copy(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "test.cache")
+            store = DiskStore(path, capacity=10000000)
+            store.set("0", b"value")
+
+            # a copy by default, unaffected by later writes
+            value = store.get("0")
+            self.assertIsInstance(value, bytearray)
+            value[0] = ord("V")
+            self.assertEqual(store.get("0"), b"value")
+
+            store = DiskStore(path, zero_copy=True)
+            value = store.get("0")
+            self.assertIsInstance(value, memoryview)
+            self.assertTrue(value.readonly)
+            self.assertEqual(value, b"value")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,45 @@
+import os
+import tempfile
 import unittest
+import multiprocessing as mp
+import numpy as np
 import torch
+import torch.distributed as dist
 from torch.utils.data import TensorDataset, DataLoader
 from bagua.torch_api.contrib import (
     LoadBalancingDistributedSampler,
     LoadBalancingDistributedBatchSampler,
 )
 from tests import skip_if_cuda_available
+from tests.internal.common_utils import find_free_port
+
+
+def _fail_complexity_fn(x):
+    raise AssertionError("complexities should be loaded from the index")
+
+
+def load_complexity_index(rank, world_size, port, tmpdir, dataset, shared):
+    dist.init_process_group(
+        "gloo",
+        init_method="tcp://127.0.0.1:{}".format(port),
+        rank=rank,
+        world_size=world_size,
+    )
+
+    # if not shared, the index is only visible to rank 0
+    sampler = LoadBalancingDistributedSampler(
+        dataset,
+        complexity_fn=_fail_complexity_fn,
+        num_replicas=world_size,
+        rank=rank,
+        complexity_index_path=os.path.join(
+            tmpdir, "0" if shared else str(rank), "complexities.npy"
+        ),
+        num_workers=2,
+    )
+    assert list(sampler.item_complexities) == dataset
+    assert isinstance(sampler.item_complexities, np.memmap) == (shared or rank == 0)
+    dist.destroy_process_group()
 
 
 class TestLoadBalancingDataLoader(unittest.TestCase):
@@ -27,6 +61,76 @@ class TestLoadBalancingDataLoader(unittest.TestCase):
         for i, data in enumerate(dataloader):
             self.assertTrue(i == data[1].item())
 
+    def test_load_balancing_distributed_sampler_shuffle(self):
+        dataset = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5]
+        expected = [[0, 6, 2, 7], [3, 9, 8, 5], [1, 4, 10, 0]]
+
+        for rank in range(3):
+            sampler = LoadBalancingDistributedSampler(
+                dataset,
+                complexity_fn=lambda x: x,
+                num_replicas=3,
+                rank=rank,
+                seed=7,
+                random_level=0.5,
+            )
+            sampler.set_epoch(2)
+            self.assertEqual(list(sampler), expected[rank])
+
+    def test_complexity_index(self):
+        dataset = list(np.random.randint(0, 100, 1000))
+        calls = []
+
+        def complexity_fn(x):
+            calls.append(x)
+            return x
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "complexities.npy")
+            samplers = []
+            for num_workers in [4, 0]:
+                samplers.append(
+                    LoadBalancingDistributedSampler(
+                        dataset,
+                        complexity_fn=complexity_fn,
+                        num_replicas=2,
+                        rank=0,
+                        complexity_index_path=path,
+                        num_workers=num_workers,
+                    )
+                )
+
+            # built by worker processes, then loaded from the file
+            self.assertEqual(len(calls), 0)
+            self.assertIsInstance(samplers[1].item_complexities, np.memmap)
+            self.assertEqual(list(samplers[1].item_complexities), dataset)
+            self.assertEqual(list(samplers[0]), list(samplers[1]))
+
+    def test_complexity_index_distributed(self):
+        dataset = [int(x) for x in np.random.randint(0, 100, 1000)]
+        world_size = 2
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for rank in range(world_size):
+                os.makedirs(os.path.join(tmpdir, str(rank)))
+            np.save(os.path.join(tmpdir, "0", "complexities.npy"), np.asarray(dataset))
+
+            ctx = mp.get_context("spawn")
+            for shared in [True, False]:
+                port = find_free_port(8000, 8100)
+                processes = [
+                    ctx.Process(
+                        target=load_complexity_index,
+                        args=(rank, world_size, port, tmpdir, dataset, shared),
+                    )
+                    for rank in range(world_size)
+                ]
+                for p in processes:
+                    p.start()
+                for p in processes:
+                    p.join(timeout=60)
+                    self.assertEqual(p.exitcode, 0)
+
     @skip_if_cuda_available()
     def test_load_balancing_distributed_batch_sampler(self):
         num_replicas = 1
@@ -70,6 +174,136 @@ class TestLoadBalancingDataLoader(unittest.TestCase):
 
             cur_idx += batch_size * num_replicas
 
+    def test_token_budget_batches(self):
+        num_replicas = 4
+        lengths = np.random.RandomState(0).randint(1, 200, 1000)
+
+        for padded in [True, False]:
+            batches = []
+            for rank in range(num_replicas):
+                sampler = LoadBalancingDistributedSampler(
+                    lengths,
+                    complexity_fn=lambda x: x,
+                    num_replicas=num_replicas,
+                    rank=rank,
+                )
+                batch_sampler = LoadBalancingDistributedBatchSampler(
+                    sampler, max_tokens=1024, padded=padded
+                )
+                batch_sampler.set_epoch(1)
+                batches.append(list(batch_sampler))
+
+            # the same number of batches on all replicas, each sample sampled once
+            self.assertTrue(all(len(b) == len(batches[0]) for b in batches))
+            sampled = [i for b in batches for batch in b for i in batch]
+            self.assertEqual(sorted(sampled), list(range(1000)))
+
+            for step in zip(*batches):
+                self.assertTrue(all(len(batch) == len(step[0]) for batch in step))
+                for batch in step:
+                    cost = (
+                        len(batch) * lengths[batch].max()
+                        if padded
+                        else lengths[batch].sum()
+                    )
+                    self.assertLessEqual(cost, 1024)
+
+    def test_cost_feedback(self):
+        lengths = np.random.RandomState(0).randint(1, 100, 1000)
+        sampler = LoadBalancingDistributedSampler(
+            lengths,
+            complexity_fn=lambda x: x,
+            num_replicas=2,
+            rank=0,
+            random_level=0.1,
+            cost_feedback=True,
+        )
+
+        # quadratic in the complexity, with a per-sample overhead
+        def cost(batch):
+            c = lengths[batch].astype(np.float64)
+            return (0.5 + 0.01 * c * c).sum()
+
+        indices = list(sampler)
+        for i in range(0, len(indices), 10):
+            batch = indices[i : i + 10]
+            sampler.record_batch_time(batch, cost(batch))
+
+        sampler.set_epoch(1)
+        np.testing.assert_allclose(
+            sampler.cost_coefficients, [0.5, 0.0, 0.01], atol=1e-6
+        )
+        self.assertEqual(sorted(list(sampler)), sorted(set(list(sampler))))
+        self.assertEqual(len(list(sampler)), 500)
+
+    def test_sampler_state_dict(self):
+        lengths = list(np.random.RandomState(0).randint(1, 100, 100))
+
+        def make_sampler():
+            return LoadBalancingDistributedSampler(
+                lengths, complexity_fn=lambda x: x, num_replicas=2, rank=1, seed=3
+            )
+
+        sampler = make_sampler()
+        sampler.set_epoch(2)
+        expected = list(sampler)
+
+        it = iter(sampler)
+        consumed = [next(it) for _ in range(20)]
+        state = sampler.state_dict()
+        self.assertEqual(state["consumed"], 20)
+
+        resumed = make_sampler()
+        resumed.load_state_dict(state)
+        resumed.set_epoch(2)
+        self.assertEqual(len(resumed), 30)
+        it = iter(resumed)
+        # the length holds for the whole resumed epoch
+        self.assertEqual(len(resumed), 30)
+        self.assertEqual(consumed + list(it), expected)
+        self.assertEqual(len(resumed), 30)
+
+        # the next epoch starts from the beginning
+        resumed.set_epoch(3)
+        sampler.set_epoch(3)
+        self.assertEqual(len(resumed), 50)
+        self.assertEqual(list(resumed), list(sampler))
+
+    def test_batch_sampler_state_dict(self):
+        lengths = list(np.random.RandomState(0).randint(1, 100, 100))
+
+        def make_batch_sampler():
+            sampler = LoadBalancingDistributedSampler(
+                lengths, complexity_fn=lambda x: x, num_replicas=2, rank=0
+            )
+            return LoadBalancingDistributedBatchSampler(sampler, max_tokens=500)
+
+        batch_sampler = make_batch_sampler()
+        batch_sampler.set_epoch(1)
+        expected = list(batch_sampler)
+
+        it = iter(batch_sampler)
+        consumed = [next(it) for _ in range(3)]
+
+        resumed = make_batch_sampler()
+        resumed.load_state_dict(batch_sampler.state_dict())
+        resumed.set_epoch(1)
+        self.assertEqual(len(resumed), len(expected) - 3)
+        it = iter(resumed)
+        self.assertEqual(len(resumed), len(expected) - 3)
+        self.assertEqual(consumed + list(it), expected)
+
+    def test_batch_sampler_arguments(self):
+        sampler = LoadBalancingDistributedSampler(
+            [1, 2, 3], complexity_fn=lambda x: x, num_replicas=1, rank=0
+        )
+        with self.assertRaises(ValueError):
+            LoadBalancingDistributedBatchSampler(sampler)
+        with self.assertRaises(ValueError):
+            LoadBalancingDistributedBatchSampler(
+                sampler, batch_fn=lambda x: [x], max_tokens=10
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
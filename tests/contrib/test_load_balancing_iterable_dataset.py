@@ -0,0 +1,109 @@
+import collections
+import unittest
+import numpy as np
+from torch.utils.data import DataLoader
+from bagua.torch_api.contrib import LoadBalancingDistributedIterableDataset
+
+
+def make_shards(num_shards, seed=0):
+    rs = np.random.RandomState(seed)
+    sizes = rs.randint(5, 50, num_shards).tolist()
+    shards = []
+    start = 0
+    for size in sizes:
+        shards.append(list(range(start, start + size)))
+        start += size
+    return shards
+
+
+class TestLoadBalancingDistributedIterableDataset(unittest.TestCase):
+    def make_datasets(self, shards, num_replicas, **kwargs):
+        return [
+            LoadBalancingDistributedIterableDataset(
+                shards=list(range(len(shards))),
+                read_fn=lambda i: iter(shards[i]),
+                shard_complexities=[sum(s) for s in shards],
+                shard_num_samples=[len(s) for s in shards],
+                num_replicas=num_replicas,
+                rank=rank,
+                **kwargs
+            )
+            for rank in range(num_replicas)
+        ]
+
+    def test_balance(self):
+        shards = make_shards(40)
+        datasets = self.make_datasets(shards, 4, shuffle_buffer_size=16)
+
+        for epoch in range(2):
+            samples = []
+            for dataset in datasets:
+                dataset.set_epoch(epoch)
+                samples.append(list(dataset))
+
+            # the same number of samples on all replicas, all samples covered
+            self.assertTrue(all(len(s) == len(datasets[0]) for s in samples))
+            self.assertEqual(
+                set(i for s in samples for i in s), set(i for s in shards for i in s)
+            )
+
+            complexities = [
+                sum(sum(shards[i]) for i in d.assigned_shards[d.rank]) for d in datasets
+            ]
+            self.assertLess(max(complexities) / min(complexities), 1.1)
+
+    def test_drop_last(self):
+        shards = make_shards(10)
+        datasets = self.make_datasets(shards, 3, drop_last=True, shuffle=False)
+
+        samples = [list(d) for d in datasets]
+        self.assertTrue(all(len(s) == len(datasets[0]) for s in samples))
+        self.assertEqual(len(set(i for s in samples for i in s)), 3 * len(datasets[0]))
+
+        # streamed shard by shard without shuffling
+        for d, s in zip(datasets, samples):
+            expected = [i for shard in d.assigned_shards[d.rank] for i in shards[shard]]
+            self.assertEqual(s, expected[: len(s)])
+
+    def test_workers(self):
+        shards = make_shards(5)
+        for num_workers in [2, 8]:
+            datasets = self.make_datasets(shards, 2)
+            num_batches = []
+            for dataset in datasets:
+                loader = DataLoader(dataset, batch_size=4, num_workers=num_workers)
+                samples = [i for batch in loader for i in batch.tolist()]
+                self.assertEqual(len(samples), len(dataset))
+                num_batches.append(len(list(loader)))
+
+                # all samples of the replica, the replica with fewer samples streams its shards again
+                expected = [
+                    i for s in dataset.assigned_shards[dataset.rank] for i in shards[s]
+                ]
+                counts = collections.Counter(samples)
+                self.assertEqual(set(counts), set(expected))
+                self.assertLessEqual(max(counts.values()) - min(counts.values()), 1)
+
+            self.assertEqual(num_batches[0], num_batches[1])
+
+    def test_workers_uneven_shards(self):
+        shards = [
+            list(range(100)),
+            list(range(100, 110)),
+            list(range(110, 120)),
+            list(range(120, 130)),
+        ]
+        for shuffle in [False, True]:
+            for num_workers in [2, 3, 8]:
+                (dataset,) = self.make_datasets(
+                    shards, 1, shuffle=shuffle, shuffle_buffer_size=16
+                )
+                loader = DataLoader(dataset, batch_size=4, num_workers=num_workers)
+                samples = [i for batch in loader for i in batch.tolist()]
+
+                # every sample exactly once
+                self.assertEqual(sorted(samples), list(range(130)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import pickle
+import warnings
+import numpy as np
+import torch
+from bagua.torch_api.contrib.utils.serializer import (
+    PickleSerializer,
+    TensorSerializer,
+)
+
+
+class TestSerializer(unittest.TestCase):
+    def check_equal(self, a, b):
+        self.assertEqual(type(a), type(b))
+        if isinstance(a, torch.Tensor):
+            self.assertEqual(a.dtype, b.dtype)
+            self.assertTrue(torch.equal(a, b))
+        elif isinstance(a, np.ndarray):
+            self.assertEqual(a.dtype, b.dtype)
+            self.assertTrue((a == b).all())
+        elif isinstance(a, (list, tuple)):
+            self.assertEqual(len(a), len(b))
+            for x, y in zip(a, b):
+                self.check_equal(x, y)
+        elif isinstance(a, dict):
+            self.assertEqual(a.keys(), b.keys())
+            for k in a:
+                self.check_equal(a[k], b[k])
+        else:
+            self.assertEqual(a, b)
+
+    def test_tensor_serializer(self):
+        values = [
+            np.random.rand(5, 2),
+            (np.random.rand(3, 4).astype(np.float16), np.random.rand(1)),
+            np.random.rand(6, 6)[::2],
+            torch.randn(3, 4),
+            torch.randn(4, 3).t(),
+            torch.empty(0, 3),
+            torch.tensor(2),
+            torch.randn(3).to(torch.bfloat16),
+            {"x": torch.arange(5), "y": [1, "label"]},
+            [torch.arange(3), np.arange(4), torch.ones(2), np.zeros(5)],
+            "text",
+            None,
+        ]
+
+        serializer = TensorSerializer()
+        for value in values:
+            self.check_equal(value, serializer.deserialize(serializer.serialize(value)))
+
+    def test_read_only_buffer(self):
+        buf = TensorSerializer().serialize({"x": torch.arange(5), "y": np.arange(5)})
+
+        # copied, without warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            ret = TensorSerializer().deserialize(buf)
+        ret["x"] += 1
+        ret["y"] += 1
+        self.assertTrue(torch.equal(ret["x"], torch.arange(1, 6)))
+        self.assertTrue((ret["y"] == np.arange(1, 6)).all())
+
+        ret = TensorSerializer(zero_copy=True).deserialize(buf)
+        self.assertFalse(ret["y"].flags.writeable)
+
+    def test_pickle_compatibility(self):
+        value = (np.random.rand(3, 4), 1)
+
+        ret = TensorSerializer().deserialize(PickleSerializer().serialize(value))
+        self.check_equal(value, ret)
+
+        ret = PickleSerializer().deserialize(pickle.dumps(value))
+        self.check_equal(value, ret)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import multiprocessing as mp
+import logging
+import numpy as np
+import pickle
+from bagua.torch_api.contrib.utils.shm_store import SharedMemoryStore
+
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def write_entries(name, rank, n):
+    store = SharedMemoryStore(name=name)
+    store.mset({"{}_{}".format(rank, i): pickle.dumps(i) for i in range(n)})
+
+
+class TestSharedMemoryStore(unittest.TestCase):
+    def test_shm_store(self):
+        store = SharedMemoryStore(name="test", capacity_per_node=10000000)
+        store.clear()
+        self.assertEqual(store.num_keys(), 0)
+
+        generated_data = [np.random.rand(10) for _ in range(5)]
+        store.set("1", pickle.dumps(generated_data[1]))
+
+        store.mset(
+            {
+                "2": pickle.dumps(generated_data[2]),
+                "3": pickle.dumps(generated_data[3]),
+                "4": pickle.dumps(generated_data[4]),
+            }
+        )
+        ret = store.mget(["1", "2", "5"])
+        self.assertTrue((pickle.loads(ret[0]) == generated_data[1]).all())
+        self.assertTrue((pickle.loads(ret[1]) == generated_data[2]).all())
+        self.assertEqual(ret[2], None)
+
+        r1 = store.get("4")
+        r2 = store.get("6")
+        self.assertTrue((pickle.loads(r1) == generated_data[4]).all())
+        self.assertEqual(r2, None)
+
+        store.set("4", pickle.dumps(generated_data[0]))
+        self.assertTrue((pickle.loads(store.get("4")) == generated_data[0]).all())
+
+        cnt = store.num_keys()
+        self.assertEqual(cnt, 4)
+
+        self.assertTrue(store.status())
+        store.shutdown()
+
+    def test_shm_store_capacity(self):
+        store = SharedMemoryStore(name="test_capacity", capacity_per_node=1000)
+        store.clear()
+
+        store.mset({str(i): b"0" * 100 for i in range(20)})
+        self.assertGreater(store.num_keys(), 0)
+        self.assertLess(store.num_keys(), 20)
+        store.shutdown()
+
+    def test_shm_store_multi_process(self):
+        nprocs, n = 4, 100
+        store = SharedMemoryStore(name="test_multi_process")
+        store.clear()
+
+        processes = []
+        for rank in range(nprocs):
+            p = mp.Process(target=write_entries, args=("test_multi_process", rank, n))
+            p.start()
+            processes.append(p)
+
+        for p in processes:
+            p.join()
+            self.assertTrue(p.exitcode == 0)
+
+        self.assertEqual(store.num_keys(), nprocs * n)
+        for rank in range(nprocs):
+            ret = store.mget(["{}_{}".format(rank, i) for i in range(n)])
+            self.assertEqual([pickle.loads(v) for v in ret], list(range(n)))
+        store.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
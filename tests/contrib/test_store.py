@@ -45,6 +45,17 @@ class TestRedisStore(unittest.TestCase):
 
         self.assertTrue(store.status())
 
+        # pipelined in multiple commands
+        store.mset({str(i): str(i).encode() for i in range(10, 2510)})
+        self.assertEqual(
+            store.mget([str(i) for i in range(10, 2515)]),
+            [str(i).encode() for i in range(10, 2510)] + [None] * 5,
+        )
+
+        # reconnects after being sent to another process
+        shards = [pickle.loads(pickle.dumps(s)) for s in store.stores]
+        self.assertEqual(sum(s.num_keys() for s in shards), 2504)
+
     @skip_if_cuda_available()
     def test_redis_store(self):
         store = RedisStore(hosts=None, cluster_mode=False, capacity_per_node=10000000)
@@ -2,6 +2,11 @@ import unittest
 import logging
 import multiprocessing
 import socket
+import math
+import os
+import subprocess
+import sys
+import tempfile
 import time
 import torch.distributed as dist
 from flask import Flask
@@ -347,6 +352,208 @@ class TestAutotuneService(unittest.TestCase):
         server.terminate()
         server.join()
 
+    def test_report_and_ask(self):
+        autotune_service = AutotuneService(1, default_bucket_size=4096)
+        app = autotune_service.setup_app(Flask(__name__))
+        client = app.test_client()
+
+        tensor_list = [
+            TensorDeclaration(
+                {"name": "compact.{}".format(i), "num_elements": 1024, "dtype": "f32"}
+            )
+            for i in range(3)
+        ]
+        rsp = client.post(
+            "/api/v1/register_tensors",
+            json={
+                "model_name": "compact",
+                "tensor_list": tensor_list,
+                "whether_to_bucket": True,
+            },
+        )
+        self.assertEqual(rsp.status_code, 200)
+        version = rsp.get_json(force=True)["version"]
+
+        def report_and_ask(train_iter, version):
+            return client.post(
+                "/api/v1/report_and_ask",
+                json={
+                    "model_name": "compact",
+                    "rank": 0,
+                    "train_iter": train_iter,
+                    "speed": 1.0,
+                    "version": version,
+                },
+            )
+
+        # unchanged recommendation
+        rsp = report_and_ask(100, version)
+        self.assertEqual(rsp.status_code, 200)
+        rsp = rsp.get_json(force=True)
+        self.assertIsNone(rsp["recommended_hyperparameters"])
+        self.assertEqual(rsp["version"], version)
+
+        hp_manager = autotune_service.model_dict["compact"]
+        hp_manager.set_hyperparameter(
+            BaguaHyperparameter(
+                buckets=[[tensor_list[2]], [tensor_list[0], tensor_list[1]]],
+                bucket_size=8192,
+            )
+        )
+        rsp = report_and_ask(200, version).get_json(force=True)
+        self.assertEqual(rsp["version"], version + 1)
+        self.assertEqual(rsp["recommended_hyperparameters"]["buckets"], [[2], [0, 1]])
+        self.assertEqual(rsp["recommended_hyperparameters"]["bucket_size"], 8192)
+
+        # metrics are recorded with the hyperparameters of the reported version
+        report_and_ask(300, version + 1)
+        train_iter, hp, _ = hp_manager.inner.tail_record()
+        self.assertEqual(train_iter, 300)
+        self.assertEqual(hp.bucket_size, 8192)
+
+        self.assertEqual(report_and_ask(400, version + 2).status_code, 400)
+
+    def test_tensor_ready_times(self):
+        autotune_service = AutotuneService(1)
+        client = autotune_service.setup_app(Flask(__name__)).test_client()
+
+        # three iterations, 10ms apart, tensor B being ready 4ms after A, then 6ms after A
+        spans = []
+        for i, b_ready_time in enumerate([4, 4, 6]):
+            for name, ready_time in [("A", 0), ("B", b_ready_time)]:
+                spans.append(
+                    {
+                        "trace_id": len(spans),
+                        "action": "tensor_ready",
+                        "tensor_name": name,
+                        "start_time": 1000 + 10 * i + ready_time,
+                        "end_time": 1000 + 10 * i + ready_time + 1,
+                    }
+                )
+
+        rsp = client.post(
+            "/api/v1/report_tensor_execution_order", json={"spans": spans}
+        )
+        self.assertEqual(rsp.status_code, 200)
+        # only the middle iteration is known to be complete
+        self.assertEqual(autotune_service.tensor_ready_times, {"A": 0.0, "B": 0.004})
+
+        rsp = client.post(
+            "/api/v1/report_tensor_execution_order", json={"spans": spans[::-1]}
+        )
+        self.assertAlmostEqual(autotune_service.tensor_ready_times["B"], 0.004)
+
+    def test_autotune_cache(self):
+        tensor_list = [
+            TensorDeclaration(
+                {"name": "cached.{}".format(i), "num_elements": 1024 ** 2, "dtype": "f32"}
+            )
+            for i in range(8)
+        ]
+
+        def run(cache_path, skip_autotune_if_cached=False, num_iters=8):
+            autotune_service = AutotuneService(
+                1,
+                autotune_level=1,
+                warmup_time_s=0.0,
+                sampling_confidence_time_s=0.0,
+                autotune_cache_path=cache_path,
+                skip_autotune_if_cached=skip_autotune_if_cached,
+            )
+            client = autotune_service.setup_app(Flask(__name__)).test_client()
+            rsp = client.post(
+                "/api/v1/register_tensors",
+                json={
+                    "model_name": "cached",
+                    "tensor_list": tensor_list,
+                    "whether_to_bucket": True,
+                },
+            ).get_json(force=True)
+            registered_hp = BaguaHyperparameter().update(
+                rsp["recommended_hyperparameters"]
+            )
+
+            hp_manager = autotune_service.model_dict["cached"]
+            version = rsp["version"]
+            completed = False
+            for train_iter in range(1, num_iters + 1):
+                # best bucket size is 8MB
+                bucket_size = hp_manager.hyperparameter_versions[version].bucket_size
+                speed = -abs(math.log(bucket_size, 2) - 23)
+                rsp = client.post(
+                    "/api/v1/report_and_ask",
+                    json={
+                        "model_name": "cached",
+                        "rank": 0,
+                        "train_iter": train_iter,
+                        "speed": speed,
+                        "version": version,
+                    },
+                ).get_json(force=True)
+                version = rsp["version"]
+                completed = rsp["is_autotune_completed"]
+
+            return registered_hp, hp_manager, completed
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_path = os.path.join(tmpdir, "autotune_cache.json")
+
+            registered_hp, hp_manager, completed = run(cache_path)
+            self.assertEqual(registered_hp.bucket_size, 10 * 1024 ** 2)
+            self.assertFalse(completed)
+            self.assertTrue(os.path.exists(cache_path))
+            history = hp_manager.inner.bayesian_optimizer.history
+            self.assertGreater(len(history), 0)
+            best_hp = max(hp_manager.inner.record_deque, key=lambda r: r[2])[1]
+
+            # warm start from the cached results
+            registered_hp, hp_manager, completed = run(cache_path, num_iters=0)
+            self.assertEqual(registered_hp.dict(), best_hp.dict())
+            self.assertEqual(hp_manager.inner.bayesian_optimizer.history, history)
+
+            # skip tuning
+            registered_hp, hp_manager, completed = run(
+                cache_path, skip_autotune_if_cached=True, num_iters=1
+            )
+            self.assertEqual(registered_hp.dict(), best_hp.dict())
+            self.assertTrue(completed)
+
+    def test_standalone_service(self):
+        service_port = pick_n_free_ports(1)[0]
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "bagua.service.autotune_service",
+                "--nprocs=1",
+                "--port={}".format(service_port),
+            ]
+        )
+
+        try:
+            client = AutotuneClient("127.0.0.1", service_port)
+            start = time.time()
+            while not client.health_check():
+                self.assertIsNone(server.poll(), "autotune service exited")
+                self.assertLess(time.time() - start, 60)
+                time.sleep(0.1)
+
+            tensor_list = [
+                TensorDeclaration(
+                    {"name": "standalone.A", "num_elements": 1024, "dtype": "f32"}
+                )
+            ]
+            rsp = client.register_tensors("standalone", tensor_list)
+            self.assertEqual(rsp.status_code, 200)
+            rsp = client.ask_hyperparameters("standalone", 0, 0)
+            self.assertEqual(rsp.status_code, 200)
+            self.assertEqual(
+                rsp.json()["recommended_hyperparameters"]["buckets"], [tensor_list]
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
 
 if __name__ == "__main__":
     logging.basicConfig(
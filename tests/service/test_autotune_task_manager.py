@@ -0,0 +1,78 @@
+import itertools
+import random
+import unittest
+from bagua.bagua_define import TensorDeclaration
+from bagua.service.autotune_task_manager import (
+    AutotuneTaskManager,
+    partition_by_cost_model,
+)
+
+
+def finish_time(ready_times, sizes, latency, bandwidth, ends):
+    finish = float("-inf")
+    begin = 0
+    for end in ends:
+        finish = (
+            max(finish, ready_times[end - 1])
+            + latency
+            + sum(sizes[begin:end]) / bandwidth
+        )
+        begin = end
+    return finish
+
+
+class TestPartitionByCostModel(unittest.TestCase):
+    def test_no_overlap(self):
+        # all tensors ready at once, every bucket only adds latency
+        ends = partition_by_cost_model([0.0] * 5, [100] * 5, 1e-3, 1e6)
+        self.assertEqual(ends, [5])
+
+    def test_full_overlap(self):
+        # each tensor is communicated before the next one is ready
+        ends = partition_by_cost_model([0.0, 0.01, 0.02, 0.03], [1000] * 4, 1e-4, 1e6)
+        self.assertEqual(ends, [1, 2, 3, 4])
+
+    def test_optimal(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            n = rng.randint(1, 8)
+            ready_times = sorted(rng.uniform(0, 0.01) for _ in range(n))
+            sizes = [rng.randint(1, 10000) for _ in range(n)]
+            latency = 10 ** rng.uniform(-5, -3)
+            bandwidth = 10 ** rng.uniform(5, 7)
+
+            best = min(
+                finish_time(ready_times, sizes, latency, bandwidth, list(cuts) + [n])
+                for k in range(n)
+                for cuts in itertools.combinations(range(1, n), k)
+            )
+            ends = partition_by_cost_model(ready_times, sizes, latency, bandwidth)
+            self.assertAlmostEqual(
+                finish_time(ready_times, sizes, latency, bandwidth, ends), best
+            )
+
+    def test_split_bucket_by_cost_model(self):
+        tensor_list = [
+            TensorDeclaration(
+                {"name": "t{}".format(i), "num_elements": 250, "dtype": dtype}
+            )
+            for i, dtype in enumerate(["f32", "f16", "f32", "f16", "f32"])
+        ]
+        ready_times = {"t{}".format(i): 0.01 * (4 - i) for i in range(5)}
+
+        buckets = AutotuneTaskManager.split_bucket_by_cost_model(
+            tensor_list, ready_times, 1e-4, 1e6
+        )
+        buckets = [[td["name"] for td in bucket] for bucket in buckets]
+        self.assertEqual(buckets, [["t4"], ["t3"], ["t2"], ["t1"], ["t0"]])
+
+        # ready at once, one bucket per dtype
+        buckets = AutotuneTaskManager.split_bucket_by_cost_model(
+            tensor_list, {}, 1e-4, 1e6
+        )
+        buckets = [[td["name"] for td in bucket] for bucket in buckets]
+        self.assertEqual(sorted(buckets), [["t0", "t2", "t4"], ["t1", "t3"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
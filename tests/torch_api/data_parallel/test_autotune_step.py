@@ -0,0 +1,95 @@
+import time
+import unittest
+from unittest import mock
+
+from bagua.bagua_define import BaguaHyperparameter
+from bagua.torch_api.data_parallel import bagua_distributed
+from bagua.torch_api.data_parallel.bagua_distributed import (
+    BaguaDistributedDataParallel,
+)
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, json):
+        self._json = json
+
+    def json(self):
+        return self._json
+
+
+class Client:
+    """Recommends new buckets, under a new version, on every report."""
+
+    def __init__(self):
+        self.version = 1
+        self.reports = []
+
+    def report_and_ask(self, train_iter, version, speed, **kwargs):
+        self.reports.append((train_iter, version, speed))
+        self.version += 1
+        return Response(
+            {
+                "recommended_hyperparameters": {
+                    "buckets": [[0], [1]] if self.version % 2 else [[1], [0]]
+                },
+                "version": self.version,
+                "is_autotune_completed": False,
+            }
+        )
+
+
+class SpeedMetrics:
+    """Reports the autotune version active when the speed window was opened as its speed."""
+
+    def __init__(self, ddp):
+        self.version = ddp._bagua_autotune_version
+
+    def get(self, last_n_seconds):
+        return float(self.version)
+
+
+def make_ddp():
+    ddp = object.__new__(BaguaDistributedDataParallel)
+    ddp.bagua_module_name = "test"
+    ddp.bagua_train_step_counter = 0
+    ddp._bagua_autotune_client = Client()
+    ddp._bagua_autotune_completed = False
+    ddp._bagua_autotune_version = 1
+    ddp._bagua_autotune_executor = None
+    ddp._bagua_autotune_pending = None
+    ddp._bagua_autotune_last_report_time = time.time()
+    ddp._bagua_autotune_tensor_list = [{"name": "a"}, {"name": "b"}]
+    ddp._bagua_tensor_map = {"a": "a", "b": "b"}
+    ddp._bagua_hyperparameters = BaguaHyperparameter()
+    ddp._speed_metrics = SpeedMetrics(ddp)
+    ddp._reset_buckets = mock.MagicMock()
+    return ddp
+
+
+class TestAutotuneStep(unittest.TestCase):
+    def test_speed_attribution(self):
+        ddp = make_ddp()
+        with mock.patch.object(
+            bagua_distributed, "StatisticalAverage", lambda **kwargs: SpeedMetrics(ddp)
+        ), mock.patch.object(bagua_distributed.env, "get_rank", lambda: 0):
+            for step in range(1, 501):
+                ddp.bagua_train_step_counter = step
+                ddp._bagua_autotune_step()
+            ddp._bagua_autotune_wait_pending()
+
+        reports = ddp._bagua_autotune_client.reports
+        self.assertEqual(
+            [train_iter for train_iter, _, _ in reports], [100, 200, 300, 400, 500]
+        )
+        # each speed is reported with the version it was measured under
+        for _, version, speed in reports:
+            self.assertEqual(speed, float(version))
+        # a recommendation is applied one cycle after it is asked for
+        self.assertEqual([version for _, version, _ in reports], [1, 1, 2, 3, 4])
+        self.assertEqual(ddp._reset_buckets.call_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()